@@ -12,6 +12,15 @@ from .util import (
 from .storage import (
     DuckTable,
     DuckPQ,
+    AsyncDuckPQ,
+    PartitionTransform,
+    year,
+    month,
+    day,
+    bucket,
+    StorageMetrics,
+    add_hook,
+    remove_hook,
 )
 
 from .agent import (
@@ -0,0 +1,514 @@
+import datetime as dt
+import json
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+)
+
+import duckdb
+import numpy as np
+import pandas as pd
+
+from .storage import DuckPQ, _available_cpus
+
+
+# Dataset sizes of the --scale presets: symbols x trading days x bars per day.
+SCALES = {
+    "tiny": {"symbols": 20, "days": 5, "bars": 60},
+    "small": {"symbols": 100, "days": 20, "bars": 240},
+    "medium": {"symbols": 500, "days": 60, "bars": 240},
+    "large": {"symbols": 2000, "days": 250, "bars": 240},
+}
+
+TABLE = "quotes_min"
+KEYS = ["symbol", "ts"]
+PARTITION_BY = ["trade_date"]
+
+
+def generate_quotes(
+    symbols: int = 100,
+    days: int = 20,
+    bars: int = 240,
+    start: str = "2024-01-02",
+    seed: int = 0,
+) -> pd.DataFrame:
+    """Generate synthetic minute bars shaped like market data.
+
+    Prices follow a per-symbol geometric random walk, so the data compresses
+    and sorts like real quotes rather than uniform noise. The same arguments
+    always produce the same frame.
+
+    Args:
+        symbols: Number of symbols.
+        days: Number of business days starting at `start`.
+        bars: Minute bars per day, starting at 09:30.
+        start: First trade date.
+        seed: Random seed.
+
+    Returns:
+        pd.DataFrame: Columns symbol, trade_date, ts, open, high, low, close,
+            volume and amount, ordered by trade_date, symbol and ts.
+    """
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(start, periods=days)
+    names = np.array([f"S{i:05d}" for i in range(symbols)])
+    offsets = pd.to_timedelta(np.arange(bars) + 9 * 60 + 30, unit="min")
+
+    n = days * symbols * bars
+    date_idx = np.repeat(np.arange(days), symbols * bars)
+    sym_idx = np.tile(np.repeat(np.arange(symbols), bars), days)
+    bar_idx = np.tile(np.arange(bars), days * symbols)
+
+    # Random walk per symbol across all days, ordered (symbol, date, bar).
+    steps = rng.normal(0.0, 0.001, size=(symbols, days * bars))
+    base = rng.uniform(5.0, 200.0, size=(symbols, 1))
+    walk = base * np.exp(np.cumsum(steps, axis=1))
+    close = walk.reshape(symbols, days, bars).transpose(1, 0, 2).reshape(n)
+    spread = np.abs(rng.normal(0.0, 0.0005, size=n)) * close
+    volume = rng.integers(100, 100_000, size=n)
+
+    return pd.DataFrame(
+        {
+            "symbol": names[sym_idx],
+            "trade_date": dates[date_idx].date,
+            "ts": dates[date_idx] + offsets[bar_idx],
+            "open": np.round(close - spread / 2, 4),
+            "high": np.round(close + spread, 4),
+            "low": np.round(close - spread, 4),
+            "close": np.round(close, 4),
+            "volume": volume,
+            "amount": np.round(volume * close, 2),
+        }
+    )
+
+
+def _measure(
+    run: Callable[[], Any],
+    repeat: int,
+    setup: Optional[Callable[[], None]] = None,
+) -> Dict[str, Any]:
+    """Time `run` `repeat` times; `setup` runs untimed before each repeat."""
+    times, rows = [], None
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        result = run()
+        times.append(time.perf_counter() - start)
+        if isinstance(result, pd.DataFrame):
+            rows = len(result)
+        elif isinstance(result, (int, np.integer)):
+            rows = int(result)
+    return {
+        "seconds": times,
+        "min": min(times),
+        "median": statistics.median(times),
+        "mean": statistics.fmean(times),
+        "rows": rows,
+    }
+
+
+class _Bench:
+    """State shared by the scenarios of one benchmark run."""
+
+    def __init__(self, workdir: Path, data: pd.DataFrame, seed: int, db_kwargs: Dict[str, Any]):
+        self.workdir = workdir
+        self.data = data
+        self.seed = seed
+        self.db_kwargs = db_kwargs
+        self.base = workdir / "base"
+        self.scratch = workdir / "scratch"
+        self.dates = sorted(data["trade_date"].unique())
+        self.symbols = sorted(data["symbol"].unique())
+        self._db: Optional[DuckPQ] = None
+        self._scratch_db: Optional[DuckPQ] = None
+
+    def build(self) -> float:
+        """Write the base dataset one partition per day, like a daily load."""
+        start = time.perf_counter()
+        with DuckPQ(self.base, **self.db_kwargs) as db:
+            for _, day in self.data.groupby("trade_date", sort=True):
+                db.upsert(TABLE, day, keys=KEYS, partition_by=PARTITION_BY)
+        return time.perf_counter() - start
+
+    @property
+    def db(self) -> DuckPQ:
+        """A warm DuckPQ on the base dataset, opened once."""
+        if self._db is None:
+            self._db = DuckPQ(self.base, **self.db_kwargs)
+        return self._db
+
+    def fresh_copy(self) -> DuckPQ:
+        """Copy the base dataset to scratch and open it, for mutating scenarios."""
+        self.close_scratch()
+        shutil.copytree(self.base, self.scratch)
+        self._scratch_db = DuckPQ(self.scratch, **self.db_kwargs)
+        return self._scratch_db
+
+    def close_scratch(self) -> None:
+        if self._scratch_db is not None:
+            self._scratch_db.close()
+            self._scratch_db = None
+        shutil.rmtree(self.scratch, ignore_errors=True)
+
+    def updates(self, fraction: float, days: int) -> pd.DataFrame:
+        """Revised bars for the last `days` days: `fraction` of their rows."""
+        recent = self.data[self.data["trade_date"].isin(self.dates[-days:])]
+        sample = recent.sample(frac=fraction, random_state=self.seed).copy()
+        sample["close"] = sample["close"] * 1.001
+        return sample
+
+    def close(self) -> None:
+        self.close_scratch()
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+
+def _upsert_scenario(fraction: float, days: int) -> Callable[[_Bench, int], Dict[str, Any]]:
+    def scenario(bench: _Bench, repeat: int) -> Dict[str, Any]:
+        df = bench.updates(fraction, days)
+        state: Dict[str, DuckPQ] = {}
+
+        def setup() -> None:
+            state["db"] = bench.fresh_copy()
+
+        def run() -> int:
+            state["db"].upsert(TABLE, df, keys=KEYS, partition_by=PARTITION_BY)
+            return len(df)
+
+        return _measure(run, repeat, setup)
+
+    return scenario
+
+
+def _bench_read_point(bench: _Bench, repeat: int) -> Dict[str, Any]:
+    symbol, date = bench.symbols[len(bench.symbols) // 2], bench.dates[-1]
+    db = bench.db
+    return _measure(
+        lambda: db.select(
+            TABLE, where="symbol = ? AND trade_date = ?", params=[symbol, date]
+        ),
+        repeat,
+    )
+
+
+def _bench_read_range(bench: _Bench, repeat: int) -> Dict[str, Any]:
+    dates = bench.dates[len(bench.dates) // 4 : len(bench.dates) * 3 // 4 + 1]
+    symbols = bench.symbols[: max(1, len(bench.symbols) // 10)]
+    db = bench.db
+    return _measure(
+        lambda: db.select(
+            TABLE,
+            columns=["symbol", "ts", "close", "volume"],
+            where="trade_date BETWEEN ? AND ? AND symbol IN (SELECT unnest(?))",
+            params=[dates[0], dates[-1], symbols],
+        ),
+        repeat,
+    )
+
+
+def _bench_aggregate(bench: _Bench, repeat: int) -> Dict[str, Any]:
+    db = bench.db
+    return _measure(
+        lambda: db.select(
+            TABLE,
+            columns="trade_date, symbol, sum(amount) / sum(volume) AS vwap",
+            group_by=["trade_date", "symbol"],
+        ),
+        repeat,
+    )
+
+
+def _pivot_where(bench: _Bench) -> str:
+    return f"trade_date = DATE '{bench.dates[-1]}'"
+
+
+def _bench_dpivot(bench: _Bench, repeat: int) -> Dict[str, Any]:
+    dt_ = bench.db.tables[TABLE]
+    where = _pivot_where(bench)
+    return _measure(
+        lambda: dt_.dpivot(index="ts", columns="symbol", values="close", where=where),
+        repeat,
+    )
+
+
+def _bench_ppivot(bench: _Bench, repeat: int) -> Dict[str, Any]:
+    dt_ = bench.db.tables[TABLE]
+    where = _pivot_where(bench)
+    return _measure(
+        lambda: dt_.ppivot(index="ts", columns="symbol", values="close", where=where),
+        repeat,
+    )
+
+
+def _bench_compact(bench: _Bench, repeat: int) -> Dict[str, Any]:
+    # Each day receives several small appends, as from intraday loads.
+    chunks = 8
+    state: Dict[str, DuckPQ] = {}
+
+    def setup() -> None:
+        if "db" in state:
+            state.pop("db").close()
+        bench.close_scratch()
+        db = state["db"] = DuckPQ(bench.scratch, **bench.db_kwargs)
+        for i in range(chunks):
+            part = bench.data[bench.data["ts"].dt.minute % chunks == i]
+            db.append(TABLE, part, partition_by=PARTITION_BY)
+
+    def run() -> int:
+        return len(state["db"].compact(TABLE, engine="duckdb"))
+
+    result = _measure(run, repeat, setup)
+    result["partitions"] = result.pop("rows")
+    state["db"].close()
+    return result
+
+
+def _bench_open_cold(bench: _Bench, repeat: int) -> Dict[str, Any]:
+    symbol, date = bench.symbols[0], bench.dates[-1]
+
+    def run() -> pd.DataFrame:
+        with DuckPQ(bench.base, **bench.db_kwargs) as db:
+            return db.select(TABLE, where="symbol = ? AND trade_date = ?", params=[symbol, date])
+
+    return _measure(run, repeat)
+
+
+def _bench_open_warm(bench: _Bench, repeat: int) -> Dict[str, Any]:
+    symbol, date = bench.symbols[0], bench.dates[-1]
+    db = bench.db
+    db.select(TABLE, where="symbol = ? AND trade_date = ?", params=[symbol, date])
+    return _measure(
+        lambda: db.select(
+            TABLE, where="symbol = ? AND trade_date = ?", params=[symbol, date]
+        ),
+        repeat,
+    )
+
+
+# Scenario name -> (description, function(bench, repeat) -> result).
+SCENARIOS: Dict[str, tuple] = {
+    "upsert_small": ("Upsert 1% of the last day's rows", _upsert_scenario(0.01, 1)),
+    "upsert_large": ("Upsert 50% of the rows of the last 5 days", _upsert_scenario(0.5, 5)),
+    "read_point": ("Select one symbol on one day", _bench_read_point),
+    "read_range": ("Select 10% of symbols over half of the days", _bench_read_range),
+    "aggregate": ("Daily VWAP per symbol over the whole table", _bench_aggregate),
+    "dpivot": ("DuckDB PIVOT of one day's closes, ts x symbol", _bench_dpivot),
+    "ppivot": ("pandas pivot_table of one day's closes, ts x symbol", _bench_ppivot),
+    "compact": ("Compact 8 appended files per day (duckdb engine)", _bench_compact),
+    "open_cold": ("Open a new DuckPQ and run a point read", _bench_open_cold),
+    "open_warm": ("Point read on an already open DuckPQ", _bench_open_warm),
+}
+
+
+def _package_version() -> Optional[str]:
+    try:
+        from importlib.metadata import version
+
+        return version("parquool")
+    except Exception:
+        return None
+
+
+def run_benchmarks(
+    scale: str = "small",
+    scenarios: Optional[Sequence[str]] = None,
+    repeat: int = 3,
+    seed: int = 0,
+    workdir: Optional[str] = None,
+    threads: Optional[int] = None,
+    memory_limit: Optional[str] = None,
+    symbols: Optional[int] = None,
+    days: Optional[int] = None,
+    bars: Optional[int] = None,
+) -> Dict[str, Any]:
+    """Run storage benchmark scenarios on a synthetic dataset.
+
+    The dataset is generated from `seed` and written once per run as a
+    table partitioned by trade_date; mutating scenarios (upserts,
+    compaction) run on a fresh copy per repeat, and copying is not timed.
+    Cold opens still read parquet footers through the OS page cache.
+
+    Args:
+        scale: Dataset preset, one of SCALES.
+        scenarios: Names of the scenarios to run (default all, see SCENARIOS).
+        repeat: Timed repetitions per scenario.
+        seed: Random seed of the dataset and update samples.
+        workdir: Directory for the dataset; a temporary directory, removed
+            afterwards, if omitted.
+        threads: DuckDB threads (default: available CPUs).
+        memory_limit: DuckDB memory limit, e.g. '4GB'.
+        symbols: Override the number of symbols of the preset.
+        days: Override the number of days of the preset.
+        bars: Override the bars per day of the preset.
+
+    Returns:
+        Dict[str, Any]: JSON-serializable report with `environment`,
+            `dataset` and one entry per scenario in `results` (`seconds` of
+            each repeat, `min`, `median`, `mean`, `rows`).
+    """
+    if scale not in SCALES:
+        raise ValueError(f"Unknown scale {scale!r}, expected one of {sorted(SCALES)}")
+    names = list(scenarios or SCENARIOS)
+    unknown = [n for n in names if n not in SCENARIOS]
+    if unknown:
+        raise ValueError(f"Unknown scenarios {unknown}, expected {sorted(SCENARIOS)}")
+
+    shape = dict(SCALES[scale])
+    for key, value in (("symbols", symbols), ("days", days), ("bars", bars)):
+        if value is not None:
+            shape[key] = int(value)
+    db_kwargs: Dict[str, Any] = {"threads": threads}
+    if memory_limit is not None:
+        db_kwargs["memory_limit"] = memory_limit
+
+    own_dir = workdir is None
+    root = Path(tempfile.mkdtemp(prefix="parquool-bench-") if own_dir else workdir)
+    root.mkdir(parents=True, exist_ok=True)
+    if (root / "base").exists() or (root / "scratch").exists():
+        raise ValueError(f"{root} already holds a benchmark dataset")
+
+    bench = _Bench(root, generate_quotes(seed=seed, **shape), seed, db_kwargs)
+    try:
+        load_seconds = bench.build()
+        results = {}
+        for name in names:
+            description, scenario = SCENARIOS[name]
+            result = scenario(bench, int(repeat))
+            results[name] = {"description": description, **result}
+            bench.close_scratch()
+    finally:
+        bench.close()
+        if own_dir:
+            shutil.rmtree(root, ignore_errors=True)
+        else:
+            shutil.rmtree(root / "base", ignore_errors=True)
+
+    return {
+        "timestamp": dt.datetime.now(dt.timezone.utc).isoformat(timespec="seconds"),
+        "environment": {
+            "parquool": _package_version(),
+            "duckdb": duckdb.__version__,
+            "pandas": pd.__version__,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": _available_cpus(),
+        },
+        "dataset": {
+            "scale": scale,
+            **shape,
+            "rows": len(bench.data),
+            "seed": seed,
+            "load_seconds": load_seconds,
+        },
+        "config": {"repeat": int(repeat), "threads": threads, "memory_limit": memory_limit},
+        "results": results,
+    }
+
+
+def compare(
+    current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float = 0.2
+) -> pd.DataFrame:
+    """Compare the median times of two benchmark reports.
+
+    Args:
+        current: Report of the run under test.
+        baseline: Report to compare against, e.g. loaded from a saved JSON.
+        tolerance: Allowed relative slowdown before a scenario is flagged.
+
+    Returns:
+        pd.DataFrame: One row per scenario present in both reports with
+            baseline and current medians, their ratio and a `regression` flag.
+    """
+    rows = []
+    for name, result in current["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if base is None:
+            continue
+        ratio = result["median"] / base["median"] if base["median"] else float("nan")
+        rows.append(
+            {
+                "scenario": name,
+                "baseline": base["median"],
+                "current": result["median"],
+                "ratio": ratio,
+                "regression": ratio > 1.0 + tolerance,
+            }
+        )
+    return pd.DataFrame(rows, columns=["scenario", "baseline", "current", "ratio", "regression"])
+
+
+def run_bench(argv: Optional[List[str]] = None) -> int:
+    """CLI entry point for the storage benchmarks.
+
+    Examples:
+        $ python -m parquool.bench --scale small --output bench.json
+        $ python -m parquool.bench --scenarios upsert_small,read_point --baseline bench.json
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Parquool storage benchmarks")
+    parser.add_argument("--scale", default="small", choices=sorted(SCALES))
+    parser.add_argument(
+        "--scenarios", default=None, help=f"Comma separated subset of: {','.join(SCENARIOS)}"
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--symbols", type=int, default=None)
+    parser.add_argument("--days", type=int, default=None)
+    parser.add_argument("--bars", type=int, default=None)
+    parser.add_argument("--workdir", default=None, help="Directory for the dataset")
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--memory-limit", default=None)
+    parser.add_argument("--output", default=None, help="Write the JSON report here")
+    parser.add_argument("--baseline", default=None, help="JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--list", action="store_true", help="List scenarios and exit")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for name, (description, _) in SCENARIOS.items():
+            print(f"{name:<14}{description}")
+        return 0
+
+    report = run_benchmarks(
+        scale=args.scale,
+        scenarios=args.scenarios.split(",") if args.scenarios else None,
+        repeat=args.repeat,
+        seed=args.seed,
+        workdir=args.workdir,
+        threads=args.threads,
+        memory_limit=args.memory_limit,
+        symbols=args.symbols,
+        days=args.days,
+        bars=args.bars,
+    )
+    text = json.dumps(report, indent=2, default=str)
+    if args.output:
+        Path(args.output).write_text(text + "\n")
+    else:
+        print(text)
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        diff = compare(report, baseline, args.tolerance)
+        print(diff.to_string(index=False), file=sys.stderr)
+        if diff["regression"].any():
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(run_bench())
@@ -0,0 +1,376 @@
+import datetime as dt
+import json
+import os
+from decimal import Decimal
+from pathlib import Path
+from typing import (
+    Any,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Union,
+)
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.flight as flight
+except ImportError:
+    raise ImportError(
+        'pyarrow backend not found, please install with `pip install "parquool[server]"`'
+    )
+
+from .storage import DuckPQ, DuckTable, _TaskContext
+from .util import setup_logger
+
+
+def _encode_value(value: Any) -> Any:
+    """Encode a bind parameter as a JSON-compatible value."""
+    if isinstance(value, pd.Timestamp):
+        value = value.to_pydatetime()
+    if hasattr(value, "item") and not isinstance(value, (str, bytes)):
+        value = value.item()  # numpy scalars
+    if isinstance(value, dt.datetime):
+        return {"__type__": "datetime", "value": value.isoformat()}
+    if isinstance(value, dt.date):
+        return {"__type__": "date", "value": value.isoformat()}
+    if isinstance(value, dt.time):
+        return {"__type__": "time", "value": value.isoformat()}
+    if isinstance(value, Decimal):
+        return {"__type__": "decimal", "value": str(value)}
+    if isinstance(value, (list, tuple)):
+        return [_encode_value(v) for v in value]
+    return value
+
+
+def _decode_value(value: Any) -> Any:
+    """Decode a value produced by _encode_value."""
+    if isinstance(value, list):
+        return [_decode_value(v) for v in value]
+    if isinstance(value, dict) and "__type__" in value:
+        kind, raw = value["__type__"], value["value"]
+        if kind == "datetime":
+            return dt.datetime.fromisoformat(raw)
+        if kind == "date":
+            return dt.date.fromisoformat(raw)
+        if kind == "time":
+            return dt.time.fromisoformat(raw)
+        if kind == "decimal":
+            return Decimal(raw)
+    return value
+
+
+class DuckPQServer(flight.FlightServerBase):
+    """Arrow Flight server hosting one DuckPQ for many clients.
+
+    One warm process keeps the DuckDB connection, the registered views and
+    the cached metadata of all tables, and streams query results to clients
+    as Arrow record batches. Each request runs on its own cursor, so clients
+    are served concurrently; a client cancelling a stream interrupts its
+    query.
+
+    Requests are `do_get` tickets holding a JSON document:
+
+    - `{"method": "query", "sql": ..., "params": [...]}`
+    - `{"method": "select", "table": ..., <DuckPQ.select arguments>}`
+
+    Actions: `tables` (list table names), `refresh` (body: table name, or
+    empty for all tables) and `register` (rescan the root directory).
+
+    Attributes:
+        db (DuckPQ): The hosted database.
+        batch_size (int): Rows per streamed record batch.
+    """
+
+    def __init__(
+        self,
+        db: Union[DuckPQ, str, Path],
+        host: str = "127.0.0.1",
+        port: int = 8815,
+        batch_size: int = 100_000,
+        log_level: str = "INFO",
+        **kwargs: Any,
+    ):
+        """Initialize the server; call serve() to start serving.
+
+        Args:
+            db: A DuckPQ to host (not closed on shutdown), or a root path to
+                open one on.
+            host: Interface to listen on. Defaults to localhost only.
+            port: Port to listen on; 0 picks a free port (see `port`).
+            batch_size: Rows per streamed record batch.
+            log_level: Logging level name.
+            **kwargs: Passed to DuckPQ when db is a path.
+        """
+        super().__init__(f"grpc://{host}:{int(port)}")
+        if isinstance(db, DuckPQ):
+            self.db = db
+            self._own_db = False
+        else:
+            self.db = DuckPQ(db, **kwargs)
+            self._own_db = True
+        self.db.register()
+        self.host = host
+        self.batch_size = int(batch_size)
+        self.logger = setup_logger("DuckPQServer", level=log_level)
+
+    def _table(self, name: Any) -> DuckTable:
+        """Return a hosted table by name, never creating one.
+
+        Names not registered yet are only accepted for existing table
+        directories directly under the root, so a client can neither create
+        directories nor reach paths outside the served root.
+
+        Raises:
+            flight.FlightServerError: If the table is unknown.
+        """
+        if isinstance(name, str) and name in self.db.tables:
+            return self.db.tables[name]
+        valid = (
+            isinstance(name, str)
+            and name not in ("", ".", "..")
+            and not any(sep in name for sep in ("/", "\\", os.sep, os.altsep) if sep)
+            and not name.startswith(DuckTable._STAGING_PREFIXES + (".",))
+        )
+        if not valid or not (self.db.root_path / name).is_dir():
+            raise flight.FlightServerError(f"Unknown table: {name!r}")
+        return self.db._get_or_create_table(name)
+
+    def _request_sql(self, request: Dict[str, Any]) -> tuple:
+        """Translate a ticket into SQL and bind parameters."""
+        method = request.get("method")
+        params = _decode_value(request.get("params") or [])
+        if method == "query":
+            return request["sql"], params
+        if method == "select":
+            dp = self._table(request.get("table"))
+            return dp._select_sql(
+                columns=request.get("columns", "*"),
+                where=request.get("where"),
+                params=params,
+                group_by=request.get("group_by"),
+                having=request.get("having"),
+                order_by=request.get("order_by"),
+                limit=request.get("limit"),
+                offset=request.get("offset"),
+                distinct=bool(request.get("distinct", False)),
+            )
+        raise flight.FlightServerError(f"Unknown method: {method!r}")
+
+    def do_get(self, context, ticket):
+        """Run the query or select of a ticket and stream its result.
+
+        The statement runs on a private cursor; batches are fetched lazily,
+        and a client cancelling the stream interrupts the query.
+
+        Raises:
+            flight.FlightServerError: If the request is invalid or fails.
+        """
+        request = json.loads(ticket.ticket.decode("utf-8"))
+        ctx = _TaskContext(self.db.con)
+        try:
+            with ctx.bind():
+                sql, params = self._request_sql(request)
+                reader = ctx.cursor.execute(sql, params).fetch_record_batch(self.batch_size)
+        except Exception as e:
+            ctx.close()
+            self.logger.warning(f"{request.get('method')} failed: {e}")
+            raise flight.FlightServerError(str(e))
+
+        def _batches() -> Iterator[pa.RecordBatch]:
+            try:
+                for batch in reader:
+                    if context.is_cancelled():
+                        ctx.cancel()
+                        break
+                    yield batch
+            finally:
+                ctx.close()
+
+        return flight.GeneratorStream(reader.schema, _batches())
+
+    def list_actions(self, context):
+        """List the supported actions as (type, description) pairs."""
+        return [
+            ("tables", "List table names"),
+            ("refresh", "Refresh a table (body: table name) or all tables"),
+            ("register", "Register new table directories under the root"),
+        ]
+
+    def do_action(self, context, action):
+        """Run an action: `tables`, `refresh` or `register`.
+
+        Raises:
+            flight.FlightServerError: If the action or table is unknown.
+        """
+        body = action.body.to_pybytes().decode("utf-8") if action.body else ""
+        if action.type == "tables":
+            yield json.dumps(sorted(self.db.tables)).encode("utf-8")
+        elif action.type == "refresh":
+            names = [body] if body else list(self.db.tables)
+            for name in names:
+                if name not in self.db.tables:
+                    raise flight.FlightServerError(f"Unknown table: {name!r}")
+                self.db.tables[name].refresh()
+        elif action.type == "register":
+            self.db.register()
+        else:
+            raise flight.FlightServerError(f"Unknown action: {action.type!r}")
+
+    def shutdown(self):
+        """Stop serving and close an owned DuckPQ."""
+        super().shutdown()
+        if self._own_db:
+            self.db.close()
+
+
+class DuckPQClient:
+    """Client for DuckPQServer mirroring the read API of DuckPQ.
+
+    Examples:
+        >>> client = DuckPQClient("grpc://127.0.0.1:8815")
+        >>> df = client.select("quotes_min", where="trade_date = ?", params=["2025-01-02"])
+        >>> for chunk in client.iter_query("SELECT * FROM quotes_min"):
+        ...     handle(chunk)
+
+    Attributes:
+        location (str): Flight location of the server.
+    """
+
+    def __init__(self, location: str = "grpc://127.0.0.1:8815"):
+        """Connect to a DuckPQServer.
+
+        Args:
+            location: Flight location of the server.
+        """
+        self.location = location
+        self._client = flight.FlightClient(location)
+
+    def _reader(self, request: Dict[str, Any]) -> "flight.FlightStreamReader":
+        """Send a request as a do_get ticket and return the result stream."""
+        ticket = flight.Ticket(json.dumps(request).encode("utf-8"))
+        return self._client.do_get(ticket)
+
+    @staticmethod
+    def _query_request(sql: str, params: Optional[Sequence[Any]]) -> Dict[str, Any]:
+        """Build the ticket of a SQL query with encoded bind parameters."""
+        return {"method": "query", "sql": sql, "params": _encode_value(list(params or []))}
+
+    def query_arrow(self, sql: str, params: Optional[Sequence[Any]] = None) -> "pa.Table":
+        """Execute a SQL query on the server and return an Arrow table."""
+        return self._reader(self._query_request(sql, params)).read_all()
+
+    def query(self, sql: str, params: Optional[Sequence[Any]] = None) -> pd.DataFrame:
+        """Execute a SQL query on the server; see DuckPQ.query."""
+        return self.query_arrow(sql, params).to_pandas()
+
+    def iter_query(
+        self, sql: str, params: Optional[Sequence[Any]] = None
+    ) -> Iterator[pd.DataFrame]:
+        """Stream the result of a SQL query as DataFrame chunks.
+
+        Leaving the loop early cancels the query on the server.
+        """
+        reader = self._reader(self._query_request(sql, params))
+        try:
+            for chunk in reader:
+                yield chunk.data.to_pandas()
+        finally:
+            reader.cancel()
+
+    def select(
+        self,
+        table: str,
+        columns: Union[str, List[str]] = "*",
+        where: Optional[str] = None,
+        params: Optional[Sequence[Any]] = None,
+        group_by: Optional[Union[str, List[str]]] = None,
+        having: Optional[str] = None,
+        order_by: Optional[Union[str, List[str]]] = None,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+        distinct: bool = False,
+    ) -> pd.DataFrame:
+        """Select from a table on the server; see DuckPQ.select."""
+        request = {
+            "method": "select",
+            "table": table,
+            "columns": columns,
+            "where": where,
+            "params": _encode_value(list(params or [])),
+            "group_by": group_by,
+            "having": having,
+            "order_by": order_by,
+            "limit": limit,
+            "offset": offset,
+            "distinct": distinct,
+        }
+        return self._reader(request).read_all().to_pandas()
+
+    def _action(self, kind: str, body: str = "") -> List[bytes]:
+        """Run a server action and return the bodies of its results."""
+        action = flight.Action(kind, body.encode("utf-8"))
+        return [r.body.to_pybytes() for r in self._client.do_action(action)]
+
+    @property
+    def tables(self) -> List[str]:
+        """Names of the tables hosted by the server."""
+        return json.loads(self._action("tables")[0])
+
+    def refresh(self, table: Optional[str] = None) -> None:
+        """Refresh one table, or all tables, after external writes."""
+        self._action("refresh", table or "")
+
+    def register(self) -> None:
+        """Register new table directories on the server."""
+        self._action("register")
+
+    def close(self) -> None:
+        """Close the connection to the server."""
+        self._client.close()
+
+    def __enter__(self) -> "DuckPQClient":
+        """Enter context manager."""
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        """Exit context manager and close the connection."""
+        self.close()
+
+
+def run_server():
+    """CLI entry point for serving a DuckPQ over Arrow Flight.
+
+    Examples:
+        $ parquool-serve /data/warehouse --port 8815 --threads 8
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Parquool DuckPQ Flight Server")
+    parser.add_argument("root_path", help="Root directory of the Parquet database")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8815)
+    parser.add_argument("--database", default=None, help="DuckDB database file")
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=100_000)
+    parser.add_argument("--log-level", default="INFO")
+    args = parser.parse_args()
+
+    server = DuckPQServer(
+        args.root_path,
+        host=args.host,
+        port=args.port,
+        batch_size=args.batch_size,
+        log_level=args.log_level,
+        database=args.database,
+        threads=args.threads,
+    )
+    server.logger.info(f"Serving {server.db.root_path} on grpc://{args.host}:{server.port}")
+    server.serve()
+
+
+if __name__ == "__main__":
+    run_server()
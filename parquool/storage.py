@@ -1,20 +1,728 @@
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
 import re
 import shutil
+import threading
+import time
 import uuid
+import warnings
 from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import ExitStack, contextmanager
+from datetime import timedelta
+from itertools import chain
 from pathlib import Path
+from urllib.parse import unquote
 from typing import (
     Any,
+    AsyncIterator,
+    Callable,
+    ContextManager,
     Dict,
+    Iterable,
+    Iterator,
     List,
     Optional,
     Sequence,
+    Tuple,
     Union,
+    TYPE_CHECKING,
 )
 
 import duckdb
 import pandas as pd
 
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+if TYPE_CHECKING:
+    import polars as pl
+    import pyarrow as pa
+
+# Incoming rows accepted by the write and attach paths. Arrow and polars data
+# is registered on DuckDB without a pandas round-trip.
+_FrameLike = Union[
+    pd.DataFrame,
+    "pa.Table",
+    "pa.RecordBatchReader",
+    "pl.DataFrame",
+    Iterable["pa.RecordBatch"],
+]
+
+
+# Serializes overrides of database-wide DuckDB settings, see
+# DuckTable._resource_scope()
+_resource_lock = threading.RLock()
+
+
+def _cgroup_cpu_limit() -> Optional[int]:
+    """CPU limit imposed by a cgroup quota, rounded up; None if unlimited."""
+    # cgroup v2: "<quota> <period>" or "max <period>" in the process' cgroup.
+    v2 = [Path("/sys/fs/cgroup/cpu.max")]
+    try:
+        for line in Path("/proc/self/cgroup").read_text().splitlines():
+            if line.startswith("0::"):
+                v2.insert(0, Path("/sys/fs/cgroup") / line[3:].lstrip("/") / "cpu.max")
+    except OSError:
+        pass
+    for path in v2:
+        try:
+            quota, period = path.read_text().split()[:2]
+        except (OSError, ValueError):
+            continue
+        if quota == "max":
+            return None
+        return max(1, math.ceil(int(quota) / int(period)))
+    # cgroup v1: quota of -1 means unlimited.
+    for base in ("/sys/fs/cgroup/cpu", "/sys/fs/cgroup/cpu,cpuacct"):
+        try:
+            quota = int(Path(base, "cpu.cfs_quota_us").read_text())
+            period = int(Path(base, "cpu.cfs_period_us").read_text())
+        except (OSError, ValueError):
+            continue
+        if quota > 0 and period > 0:
+            return max(1, math.ceil(quota / period))
+        return None
+    return None
+
+
+def _available_cpus() -> int:
+    """Number of CPUs the process may run on.
+
+    Unlike os.cpu_count(), honors the CPU affinity mask and cgroup CPU
+    quotas, so containers limited to a few cores do not oversubscribe them.
+    """
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    limit = _cgroup_cpu_limit()
+    if limit is not None:
+        cpus = min(cpus, limit)
+    return max(1, cpus)
+
+
+# Cursor bound to the current thread by an AsyncDuckPQ task, see _TaskContext
+_task_context = threading.local()
+
+
+class _TaskContext:
+    """Private cursor and cancellation state of one AsyncDuckPQ task.
+
+    While bound to a thread, DuckTable and DuckPQ route every statement on
+    `con` through `cursor`. After cancel(), the running statement is
+    interrupted and every further statement of the task fails.
+    """
+
+    def __init__(self, con: duckdb.DuckDBPyConnection):
+        self.con = con
+        self.cursor = con.cursor()
+        self.cancelled = False
+
+    @staticmethod
+    def current(con: duckdb.DuckDBPyConnection) -> Optional[duckdb.DuckDBPyConnection]:
+        """Return the cursor bound to con on this thread, if any."""
+        ctx = getattr(_task_context, "ctx", None)
+        if ctx is None or ctx.con is not con:
+            return None
+        if ctx.cancelled:
+            raise duckdb.InterruptException("INTERRUPT Error: Interrupted!")
+        return ctx.cursor
+
+    @contextmanager
+    def bind(self):
+        """Bind the task cursor to the calling thread."""
+        prev = getattr(_task_context, "ctx", None)
+        _task_context.ctx = self
+        try:
+            yield self.cursor
+        finally:
+            _task_context.ctx = prev
+
+    def cancel(self) -> None:
+        """Interrupt the running statement and fail all following ones."""
+        self.cancelled = True
+        self.cursor.interrupt()
+
+    def close(self) -> None:
+        """Close the task cursor."""
+        try:
+            self.cursor.close()
+        except Exception:
+            pass
+
+
+class _FileLock:
+    """Advisory inter-process lock on a lock file.
+
+    Uses flock on POSIX (shared or exclusive) and msvcrt on Windows (always
+    exclusive). Acquisition polls until `timeout` seconds have passed and then
+    raises TimeoutError; `timeout=None` waits forever.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        shared: bool = False,
+        timeout: Optional[float] = None,
+        poll_interval: float = 0.05,
+    ):
+        """Initialize an unlocked lock on a lock file.
+
+        Args:
+            path (Union[str, Path]): Lock file, created on first acquisition.
+            shared (bool): Take a shared instead of an exclusive lock.
+            timeout (Optional[float]): Seconds to wait for the lock; None
+                waits forever.
+            poll_interval (float): Seconds between acquisition attempts.
+        """
+        self.path = Path(path)
+        self.shared = shared
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self._fd: Optional[int] = None
+
+    def _try_lock(self, fd: int) -> bool:
+        """Try to lock fd without blocking; return whether it succeeded."""
+        try:
+            if fcntl is not None:
+                mode = fcntl.LOCK_SH if self.shared else fcntl.LOCK_EX
+                fcntl.flock(fd, mode | fcntl.LOCK_NB)
+            else:
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:
+            return False
+
+    def acquire(self) -> None:
+        """Acquire the lock, polling until it is free.
+
+        Raises:
+            TimeoutError: If the lock is still held after `timeout` seconds.
+        """
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(str(self.path), os.O_RDWR | os.O_CREAT, 0o644)
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        while not self._try_lock(fd):
+            if deadline is not None and time.monotonic() >= deadline:
+                os.close(fd)
+                raise TimeoutError(f"Timed out waiting for lock {self.path}")
+            time.sleep(self.poll_interval)
+        self._fd = fd
+
+    def release(self) -> None:
+        """Release the lock and close the lock file; no-op if not held."""
+        if self._fd is None:
+            return
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+            else:
+                msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+        finally:
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self) -> "_FileLock":
+        """Acquire the lock on entering the context."""
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        """Release the lock on leaving the context."""
+        self.release()
+
+
+# Callables receiving an event for every storage operation, see add_hook()
+_hooks: List[Callable[[Dict[str, Any]], None]] = []
+_hooks_lock = threading.Lock()
+
+
+def add_hook(hook: Callable[[Dict[str, Any]], None]) -> Callable[[Dict[str, Any]], None]:
+    """Register a callable receiving an event for every storage operation.
+
+    Events are dicts describing one finished DuckTable/DuckPQ operation:
+
+    - `operation`: 'upsert', 'upsert_from_files', 'append', 'compact',
+      'batch', 'drop_partitions', 'repartition', 'vacuum', 'select' or
+      'query'.
+    - `table`: Table name ('' for database-level queries).
+    - `status`: 'ok' or 'error'; `error` holds the exception class name.
+    - `timestamp` (start, epoch seconds) and `seconds`.
+    - `rows`: rows returned by reads.
+    - For writes: `rows_written` (rows in the parquet files written,
+      including rewritten existing rows), `files_written`, `bytes_written`,
+      `files_removed`, `peak_memory_bytes`, `peak_spill_bytes`, `spilled`.
+
+    Hooks run synchronously in the thread of the operation; keep them cheap
+    (e.g. StorageMetrics) or hand events off to a queue. Exceptions raised
+    by hooks are turned into warnings. Without hooks, operations skip all
+    bookkeeping beyond `last_write`.
+
+    Args:
+        hook: Callable taking the event dict.
+
+    Returns:
+        The hook, so add_hook can be used as a decorator.
+    """
+    with _hooks_lock:
+        if hook not in _hooks:
+            _hooks.append(hook)
+    return hook
+
+
+def remove_hook(hook: Callable[[Dict[str, Any]], None]) -> None:
+    """Unregister a hook added with add_hook()."""
+    with _hooks_lock:
+        if hook in _hooks:
+            _hooks.remove(hook)
+
+
+def _emit(event: Dict[str, Any], table: Optional[str], error: Optional[BaseException]) -> None:
+    """Send an operation event to all hooks."""
+    event = {
+        **event,
+        "table": table or "",
+        "status": "ok" if error is None else "error",
+        "timestamp": time.time() - event["seconds"],
+    }
+    if error is not None:
+        event["error"] = type(error).__name__
+    for hook in list(_hooks):
+        try:
+            hook(event)
+        except Exception as e:
+            warnings.warn(f"Storage hook {hook!r} failed: {e!r}", RuntimeWarning)
+
+
+class StorageMetrics:
+    """In-memory aggregation of storage operation events.
+
+    Register it with add_hook() to collect operation counts, latency
+    histograms and write volumes per operation and table, and expose them in
+    the Prometheus text format (e.g. from an HTTP handler).
+
+    Examples:
+        >>> metrics = add_hook(StorageMetrics())
+        >>> db.upsert("quotes_min", df, keys=["symbol", "ts"])
+        >>> metrics.snapshot()
+        >>> print(metrics.to_prometheus())
+
+    Attributes:
+        buckets (Tuple[float, ...]): Upper bounds in seconds of the latency
+            histogram buckets.
+    """
+
+    # Summed event fields -> Prometheus counter name and help text.
+    _COUNTERS = {
+        "rows": ("rows_read_total", "Rows returned by reads."),
+        "rows_written": ("rows_written_total", "Rows in parquet files written."),
+        "bytes_written": ("bytes_written_total", "Bytes of parquet files written."),
+        "files_written": ("files_written_total", "Parquet files written."),
+        "files_removed": ("files_removed_total", "Parquet files replaced or removed."),
+        "peak_spill_bytes": ("spill_bytes_total", "Peak bytes spilled per operation, summed."),
+    }
+
+    # Default latency histogram buckets in seconds.
+    _BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+    def __init__(self, buckets: Sequence[float] = _BUCKETS):
+        """Initialize an empty collector.
+
+        Args:
+            buckets: Upper bounds in seconds of the latency histogram buckets.
+        """
+        self.buckets = tuple(sorted(float(b) for b in buckets))
+        self._lock = threading.Lock()
+        self._series: Dict[Tuple[str, str], Dict[str, Any]] = {}
+
+    def __call__(self, event: Dict[str, Any]) -> None:
+        key = (event["operation"], event.get("table", ""))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {
+                    "count": 0,
+                    "errors": 0,
+                    "seconds": 0.0,
+                    "buckets": [0] * len(self.buckets),
+                    **{name: 0 for name in self._COUNTERS},
+                }
+            series["count"] += 1
+            series["errors"] += event.get("status") == "error"
+            series["seconds"] += event["seconds"]
+            for i, bound in enumerate(self.buckets):
+                if event["seconds"] <= bound:
+                    series["buckets"][i] += 1
+            for name in self._COUNTERS:
+                series[name] += event.get(name) or 0
+
+    def reset(self) -> None:
+        """Drop all collected metrics."""
+        with self._lock:
+            self._series.clear()
+
+    def snapshot(self) -> pd.DataFrame:
+        """Return the metrics per operation and table as a DataFrame.
+
+        Columns: operation, table, count, errors, seconds (total),
+        mean_seconds, the summed counters (rows, rows_written,
+        bytes_written, files_written, files_removed, peak_spill_bytes) and
+        bytes_per_second (write throughput, e.g. of compaction).
+        """
+        with self._lock:
+            rows = [
+                {
+                    "operation": op,
+                    "table": table,
+                    **{k: v for k, v in series.items() if k != "buckets"},
+                }
+                for (op, table), series in sorted(self._series.items())
+            ]
+        columns = ["operation", "table", "count", "errors", "seconds", *self._COUNTERS]
+        df = pd.DataFrame(rows, columns=columns)
+        df["mean_seconds"] = df["seconds"] / df["count"]
+        df["bytes_per_second"] = (df["bytes_written"] / df["seconds"]).where(
+            df["seconds"] > 0
+        )
+        return df
+
+    @staticmethod
+    def _labels(**labels: Any) -> str:
+        """Render a Prometheus label set, escaping the values."""
+
+        def escape(value: Any) -> str:
+            return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+        return "{" + ",".join(f'{k}="{escape(v)}"' for k, v in labels.items()) + "}"
+
+    def to_prometheus(self, prefix: str = "parquool") -> str:
+        """Render the metrics in the Prometheus text exposition format."""
+        with self._lock:
+            items = sorted(
+                (key, {**series, "buckets": list(series["buckets"])})
+                for key, series in self._series.items()
+            )
+        lines: List[str] = []
+
+        def family(name: str, kind: str, help_text: str) -> str:
+            full = f"{prefix}_{name}"
+            lines.append(f"# HELP {full} {help_text}")
+            lines.append(f"# TYPE {full} {kind}")
+            return full
+
+        name = family("operations_total", "counter", "Storage operations by status.")
+        for (op, table), series in items:
+            ok = series["count"] - series["errors"]
+            lines.append(f"{name}{self._labels(operation=op, table=table, status='ok')} {ok}")
+            lines.append(
+                f"{name}{self._labels(operation=op, table=table, status='error')} {series['errors']}"
+            )
+
+        name = family("operation_duration_seconds", "histogram", "Storage operation latency.")
+        for (op, table), series in items:
+            for bound, count in zip(self.buckets, series["buckets"]):
+                labels = self._labels(operation=op, table=table, le=repr(bound))
+                lines.append(f"{name}_bucket{labels} {count}")
+            labels = self._labels(operation=op, table=table, le="+Inf")
+            lines.append(f"{name}_bucket{labels} {series['count']}")
+            labels = self._labels(operation=op, table=table)
+            lines.append(f"{name}_sum{labels} {series['seconds']}")
+            lines.append(f"{name}_count{labels} {series['count']}")
+
+        for field, (suffix, help_text) in self._COUNTERS.items():
+            name = family(suffix, "counter", help_text)
+            for (op, table), series in items:
+                lines.append(f"{name}{self._labels(operation=op, table=table)} {series[field]}")
+        return "\n".join(lines) + "\n"
+
+
+# Active profilers by id() of the connection they observe, see DuckProfile
+_profiles: Dict[int, List["DuckProfile"]] = {}
+_profiles_lock = threading.Lock()
+
+
+@contextmanager
+def _phase(
+    con: duckdb.DuckDBPyConnection, phase: str, **info: Any
+) -> Iterator[Optional[Dict[str, Any]]]:
+    """Time a block as a phase of the profilers observing con.
+
+    Yields the phase record for the block to add details to, or None when
+    nothing observes con (the common case, which costs a dict lookup).
+    """
+    profiles = _profiles.get(id(con))
+    if not profiles:
+        yield None
+        return
+    record: Dict[str, Any] = {"phase": phase, **info}
+    started = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record["seconds"] = time.perf_counter() - started
+        record["thread"] = threading.current_thread().name
+        for profile in list(profiles):
+            profile._record(record, started)
+
+
+def _fetch_df(
+    con: duckdb.DuckDBPyConnection,
+    cur: duckdb.DuckDBPyConnection,
+    sql: str,
+    params: Optional[Sequence[Any]] = None,
+    table: Optional[str] = None,
+    operation: str = "query",
+) -> pd.DataFrame:
+    """Run a query on cur and fetch it as a DataFrame.
+
+    The query is profiled when observed by a profiler and reported to
+    storage hooks, if any.
+    """
+    if not _hooks:
+        return _fetch_df_profiled(con, cur, sql, params, table)
+    started = time.perf_counter()
+    try:
+        df = _fetch_df_profiled(con, cur, sql, params, table)
+    except BaseException as e:
+        _emit({"operation": operation, "seconds": time.perf_counter() - started}, table, e)
+        raise
+    event = {"operation": operation, "seconds": time.perf_counter() - started, "rows": len(df)}
+    _emit(event, table, None)
+    return df
+
+
+def _fetch_df_profiled(
+    con: duckdb.DuckDBPyConnection,
+    cur: duckdb.DuckDBPyConnection,
+    sql: str,
+    params: Optional[Sequence[Any]],
+    table: Optional[str],
+) -> pd.DataFrame:
+    """Fetch a query as a DataFrame, as a profiler phase when observed."""
+    with _phase(con, "query", table=table) as record:
+        if record is None:
+            return cur.execute(sql, params or []).df()
+        with DuckProfile._statement(cur) as profile:
+            df = cur.execute(sql, params or []).df()
+            info = profile()
+        DuckProfile._annotate(record, sql, info)
+        return df
+
+
+class DuckProfile:
+    """Timings of DuckTable/DuckPQ calls collected by profiler().
+
+    Every phase of parquool's own work (file globbing, view refresh, table
+    registration, COPY statements, directory moves, queries including the
+    conversion to pandas) is recorded with its wall time. SQL phases carry
+    DuckDB's JSON profile of the statement, whose operator tree shows where
+    DuckDB spent its time (parquet scans and footer reads, filters, joins).
+
+    Examples:
+        >>> with dt.profiler() as prof:
+        ...     dt.select(where="ds = '2025-01-01'")
+        >>> prof.summary()
+        >>> prof.phases[-1]["duckdb"]["children"]
+
+    Attributes:
+        phases (List[Dict[str, Any]]): One record per phase in completion
+            order: `phase`, `table`, `start` (seconds since the profiler
+            started), `seconds` and `thread`. `query` and `copy` phases add
+            `sql`, `duckdb_seconds` (DuckDB's own latency), `rows` and
+            `duckdb` (the JSON profile); for `query`, `seconds` minus
+            `duckdb_seconds` is the result conversion.
+        seconds (Optional[float]): Wall time of the profiled block.
+    """
+
+    def __init__(self):
+        self.phases: List[Dict[str, Any]] = []
+        self.seconds: Optional[float] = None
+        self._started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    @contextmanager
+    def _observe(con: duckdb.DuckDBPyConnection) -> Iterator["DuckProfile"]:
+        """Collect the phases of all statements on con's database in a block."""
+        profile = DuckProfile()
+        with _profiles_lock:
+            _profiles.setdefault(id(con), []).append(profile)
+        try:
+            yield profile
+        finally:
+            with _profiles_lock:
+                observers = _profiles[id(con)]
+                observers.remove(profile)
+                if not observers:
+                    del _profiles[id(con)]
+            profile.seconds = time.perf_counter() - profile._started
+
+    @staticmethod
+    @contextmanager
+    def _statement(
+        cur: duckdb.DuckDBPyConnection,
+    ) -> Iterator[Callable[[], Dict[str, Any]]]:
+        """Enable DuckDB profiling on a cursor for a block.
+
+        Yields a function returning the JSON profile of the last statement.
+        Profiling already enabled by the caller is left untouched.
+        """
+        enabled = (
+            cur.execute("SELECT current_setting('enable_profiling')").fetchone()[0]
+            is not None
+        )
+        if not enabled:
+            cur.execute("PRAGMA enable_profiling='no_output'")
+        try:
+            yield lambda: json.loads(cur.get_profiling_information(format="json"))
+        finally:
+            if not enabled:
+                cur.execute("PRAGMA disable_profiling")
+
+    @staticmethod
+    def _annotate(record: Optional[Dict[str, Any]], sql: str, info: Dict[str, Any]) -> None:
+        """Attach a statement's DuckDB profile to a phase record."""
+        if record is None:
+            return
+        record["sql"] = sql
+        record["duckdb_seconds"] = float(info.get("latency") or 0.0)
+        record["rows"] = info.get("rows_returned")
+        record["duckdb"] = info
+
+    def _record(self, record: Dict[str, Any], started: float) -> None:
+        with self._lock:
+            self.phases.append({**record, "start": started - self._started})
+
+    def summary(self) -> pd.DataFrame:
+        """Aggregate phases: count and total seconds per phase and table."""
+        columns = ["phase", "table", "count", "seconds", "duckdb_seconds"]
+        if not self.phases:
+            return pd.DataFrame(columns=columns)
+        df = pd.DataFrame(self.phases)
+        for col in ("table", "duckdb_seconds"):
+            if col not in df:
+                df[col] = None
+        df["table"] = df["table"].fillna("")
+        return (
+            df.groupby(["phase", "table"], sort=False)
+            .agg(
+                count=("seconds", "size"),
+                seconds=("seconds", "sum"),
+                duckdb_seconds=("duckdb_seconds", lambda x: x.sum(min_count=1)),
+            )
+            .reset_index()[columns]
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the report as plain JSON-serializable data."""
+        return {"seconds": self.seconds, "phases": list(self.phases)}
+
+
+class PartitionTransform:
+    """Partition column derived from a source column when writing.
+
+    Pass transforms in `partition_by` of upsert()/append()/repartition()
+    instead of adding synthetic columns: the partition column (named
+    `<source>_<kind>`, e.g. `ts_month`) is computed from the source column
+    on write, the table records its layout, and select() adds the matching
+    partition filters to predicates on the source column, so queries prune
+    without knowing the layout. Create transforms with year(), month(),
+    day() and bucket().
+
+    Attributes:
+        kind (str): 'year', 'month', 'day' or 'bucket'.
+        source (str): Source column.
+        param (Optional[int]): Number of buckets of a bucket transform.
+    """
+
+    _KINDS = ("year", "month", "day", "bucket")
+
+    def __init__(self, kind: str, source: str, param: Optional[int] = None):
+        if kind not in self._KINDS:
+            raise ValueError(f"Unknown partition transform {kind!r}, expected {self._KINDS}")
+        if kind == "bucket" and (param is None or int(param) < 1):
+            raise ValueError("bucket() needs a positive number of buckets")
+        self.kind = kind
+        self.source = source
+        self.param = int(param) if kind == "bucket" else None
+
+    @property
+    def name(self) -> str:
+        """Name of the partition column."""
+        return f"{self.source}_{self.kind}"
+
+    @property
+    def monotonic(self) -> bool:
+        """Whether the transform preserves order, so ranges can be pruned."""
+        return self.kind != "bucket"
+
+    def sql(self, operand: Optional[str] = None) -> str:
+        """SQL expression computing the partition value of `operand`.
+
+        Args:
+            operand: SQL expression of the source value; defaults to the
+                source column.
+        """
+        x = operand or DuckTable._quote_ident(self.source)
+        if self.kind == "year":
+            return f"year({x})"
+        if self.kind == "month":
+            return f"(year({x}) * 100 + month({x}))"
+        if self.kind == "day":
+            return f"CAST({x} AS DATE)"
+        # md5 rather than hash(): bucket numbers must not change across
+        # DuckDB versions, or pruning would skip rows written earlier.
+        return f"(CAST(('0x' || md5(CAST({x} AS VARCHAR))[1:8]) AS UBIGINT) % {self.param})"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"kind": self.kind, "source": self.source, "param": self.param}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "PartitionTransform":
+        return cls(data["kind"], data["source"], data.get("param"))
+
+    def __eq__(self, other: Any) -> bool:
+        return isinstance(other, PartitionTransform) and self.to_dict() == other.to_dict()
+
+    def __hash__(self) -> int:
+        return hash((self.kind, self.source, self.param))
+
+    def __repr__(self) -> str:
+        if self.kind == "bucket":
+            return f"bucket({self.param}, {self.source!r})"
+        return f"{self.kind}({self.source!r})"
+
+
+def year(column: str) -> PartitionTransform:
+    """Partition by the year of a date/timestamp column (`<column>_year=2025`)."""
+    return PartitionTransform("year", column)
+
+
+def month(column: str) -> PartitionTransform:
+    """Partition by the month of a date/timestamp column (`<column>_month=202501`)."""
+    return PartitionTransform("month", column)
+
+
+def day(column: str) -> PartitionTransform:
+    """Partition by the date of a timestamp column (`<column>_day=2025-01-02`)."""
+    return PartitionTransform("day", column)
+
+
+def bucket(n: int, column: str) -> PartitionTransform:
+    """Partition by a stable hash of a column into `n` buckets (`<column>_bucket=0..n-1`).
+
+    Bounds the number of partitions of high-cardinality keys such as
+    symbols; equality and IN predicates on the column are pruned.
+    """
+    return PartitionTransform("bucket", column, n)
+
 
 class DuckTable:
     """Manage a directory of Parquet files through a DuckDB-backed view.
@@ -43,6 +751,14 @@ class DuckTable:
             - Path to DuckDB database file, or
             - None (in-memory DB, internally managed).
         threads (Optional[int]): Number of threads used for operations.
+        recover (bool): If True, clean up after interrupted writes on open.
+        locking (bool): If True, coordinate writers across processes with
+            per-table/per-partition advisory file locks.
+        lock_timeout (Optional[float]): Seconds to wait for a write lock.
+        resources (Dict[str, str]): DuckDB memory/spill settings applied on
+            open (memory_limit, temp_directory, max_temp_directory_size).
+        last_write (Optional[Dict[str, Any]]): Peak memory and spill of the
+            last write, see upsert().
 
     Examples:
         >>> dp = DuckTable("/path/to/parquet_dir")
@@ -52,6 +768,44 @@ class DuckTable:
         >>> dp.close()
     """
 
+    # Rolling aggregate name -> DuckDB window aggregate.
+    _ROLLING_FUNCS = {
+        "mean": "avg",
+        "std": "stddev_samp",
+        "var": "var_samp",
+        "sum": "sum",
+        "min": "min",
+        "max": "max",
+        "median": "median",
+        "count": "count",
+    }
+
+    # DuckDB settings governing memory use and spilling to disk.
+    _RESOURCE_SETTINGS = ("memory_limit", "temp_directory", "max_temp_directory_size")
+
+    # Prefixes of staging directories created by write and compaction paths.
+    _STAGING_PREFIXES = ("__parquet_rewrite_", "__compact_", "__parquet_trash_")
+
+    # File in the table directory recording the partition transforms.
+    _LAYOUT_FILE = ".parquool.json"
+
+    # Source file format -> DuckDB reader used by upsert_from_files().
+    _FILE_READERS = {
+        "csv": "read_csv_auto",
+        "json": "read_json_auto",
+        "parquet": "read_parquet",
+    }
+    _FILE_FORMATS = {
+        ".csv": "csv",
+        ".tsv": "csv",
+        ".txt": "csv",
+        ".json": "json",
+        ".jsonl": "json",
+        ".ndjson": "json",
+        ".parquet": "parquet",
+        ".pq": "parquet",
+    }
+
     def __init__(
         self,
         root_path: str,
@@ -59,6 +813,12 @@ class DuckTable:
         create: bool = False,
         database: Optional[Union[str, duckdb.DuckDBPyConnection]] = None,
         threads: Optional[int] = None,
+        recover: bool = True,
+        locking: bool = True,
+        lock_timeout: Optional[float] = 300.0,
+        memory_limit: Optional[Union[str, int]] = None,
+        temp_directory: Optional[str] = None,
+        max_temp_directory_size: Optional[Union[str, int]] = None,
     ):
         """Initialize a DuckTable for querying a directory of Parquet files.
 
@@ -70,7 +830,27 @@ class DuckTable:
                 - DuckDB connection object (externally managed), or
                 - Path to DuckDB database file, or
                 - None (in-memory DB, internally managed).
-            threads (Optional[int]): Number of threads used for operations.
+            threads (Optional[int]): Number of DuckDB threads. Defaults to the
+                CPUs available to the process (affinity mask and cgroup quota),
+                or to the current setting of an external connection.
+            recover (bool): If True, run vacuum() on open to clean up after
+                writes interrupted by a crash.
+            locking (bool): If True, coordinate writers across processes with
+                advisory file locks stored in a ``.parquool_locks`` directory
+                next to the table. Reads never take locks.
+            lock_timeout (Optional[float]): Seconds to wait for a lock before
+                raising TimeoutError. None waits forever.
+            memory_limit (Optional[Union[str, int]]): DuckDB memory limit,
+                e.g. '4GB' (ints are bytes). Operations exceeding it spill to
+                temp_directory instead of growing the process.
+            temp_directory (Optional[str]): Directory DuckDB spills to.
+            max_temp_directory_size (Optional[Union[str, int]]): Cap on the
+                spilled data; operations exceeding it fail instead of filling
+                the disk.
+
+        Notes:
+            DuckDB applies these settings to the whole database, so on a
+            shared connection they also affect its other users.
         """
         self.root_path = Path(root_path)
         if not self.root_path.exists():
@@ -83,17 +863,19 @@ class DuckTable:
 
         self.view_name = name or self._default_view_name(self.root_path)
 
-        config: Dict[str, Any] = {}
-        self.threads = threads or 1
-        config["threads"] = self.threads
-
         # Distinguish whether the DuckDB connection is owned by this instance.
         if isinstance(database, duckdb.DuckDBPyConnection):
             # External connection: do NOT close it in close()
             self.con = database
             self._own_connection = False
+            if threads is None:
+                # Keep the thread setting chosen by the connection's owner.
+                threads = self.con.execute("SELECT current_setting('threads')").fetchone()[0]
+            self.threads = int(threads)
         else:
             # Internal connection: this DuckTable owns it
+            self.threads = int(threads or _available_cpus())
+            config: Dict[str, Any] = {"threads": self.threads}
             self.con = duckdb.connect(database=database or ":memory:", config=config)
             self._own_connection = True
 
@@ -101,8 +883,43 @@ class DuckTable:
             self.con.execute(f"SET threads={int(self.threads)}")
         except Exception:
             pass
+        self.resources = self._resource_settings(
+            memory_limit=memory_limit,
+            temp_directory=temp_directory,
+            max_temp_directory_size=max_temp_directory_size,
+        )
+        self._apply_resources(self.con, self.resources)
+        # Counters of the statements and commits of the current write, see
+        # _write_report(), summarized into last_write.
+        self._write_log: List[Dict[str, int]] = []
+        self.last_write: Optional[Dict[str, Any]] = None
+
+        # Other threads (background maintenance, thread pools) get their own
+        # cursor on the same database, see _cursor().
+        self._owner_thread = threading.get_ident()
+        self._local = threading.local()
+        # Held by foreground writes; background maintenance only proceeds
+        # when it can take the lock without waiting.
+        self._write_lock = threading.RLock()
+        # Cross-process writer coordination, see _file_locks().
+        self.locking = locking
+        self.lock_timeout = lock_timeout
+        self._lock_dir = self.root_path.parent / ".parquool_locks" / self.root_path.name
+
+        # Bumped on every refresh; caches derived from the data are only valid
+        # for the version they were computed against.
+        self._version = 0
+        self._cache: Dict[Any, Any] = {}
+
+        # Hot tier, see set_hot(): partitions mirrored in a native DuckDB table
+        # and the file signatures they were loaded from.
+        self._hot: Optional[Dict[str, Any]] = None
+        self._hot_sigs: Optional[Dict[str, tuple]] = None
+        self._hot_table = f"__hot_{self.view_name}"
 
         self.scan_pattern = self._infer_scan_pattern(self.root_path)
+        if recover:
+            self.vacuum()
         if self._parquet_files_exist():
             self._create_or_replace_view()
 
@@ -120,6 +937,11 @@ class DuckTable:
             return name
         return '"' + name.replace('"', '""') + '"'
 
+    @staticmethod
+    def _quote_literal(value: Any) -> str:
+        """Render a python value as a DuckDB string literal."""
+        return "'" + str(value).replace("'", "''") + "'"
+
     @staticmethod
     def _default_view_name(path: Path) -> str:
         """Generate a default DuckDB view name from file/directory name."""
@@ -136,188 +958,1044 @@ class DuckTable:
             return str(path / "**/*.parquet")
         return str(path)
 
+    def _cursor(self) -> duckdb.DuckDBPyConnection:
+        """Return the DuckDB connection to use from the calling thread.
+
+        DuckDB connections must not be used from several threads at once, so
+        threads other than the creating one get a thread-local cursor on the
+        same database. Inside an AsyncDuckPQ task, the task's cursor is used.
+        """
+        cur = _TaskContext.current(self.con)
+        if cur is not None:
+            return cur
+        if threading.get_ident() == self._owner_thread:
+            return self.con
+        cur = getattr(self._local, "con", None)
+        if cur is None:
+            cur = self._local.con = self.con.cursor()
+        return cur
+
     @staticmethod
-    def _local_tempdir(target_dir, prefix="__parquet_rewrite_"):
-        """Generate a temporary directory for atomic operations under target_dir."""
-        tmpdir = Path(target_dir) / f"{prefix}{uuid.uuid4().hex[:8]}"
-        tmpdir.mkdir(exist_ok=True, parents=True)
-        return tmpdir
+    def _resource_settings(**settings: Any) -> Dict[str, str]:
+        """Normalize memory/spill/thread settings, dropping unset ones.
 
-    def _parquet_files_exist(self) -> bool:
-        """Check if there are any parquet files under the dataset path."""
-        for _ in self.root_path.rglob("*.parquet"):
-            return True
-        return False
+        Sizes given as ints are bytes; threads <= 0 means all available CPUs.
+        """
+        unknown = set(settings) - set(DuckTable._RESOURCE_SETTINGS) - {"threads"}
+        if unknown:
+            raise ValueError(f"Unknown resource settings: {sorted(unknown)}")
+        normalized = {}
+        for name, value in settings.items():
+            if value is None:
+                continue
+            if name == "threads":
+                value = int(value) if int(value) > 0 else _available_cpus()
+                normalized[name] = str(value)
+            elif isinstance(value, int):
+                normalized[name] = f"{value}B"
+            else:
+                normalized[name] = str(value)
+        return normalized
 
-    def _create_or_replace_view(self):
-        """Create or replace the DuckDB view for current dataset."""
-        view_ident = DuckTable._quote_ident(self.view_name)
-        sql = (
-            "CREATE OR REPLACE VIEW "
-            f"{view_ident} AS "
-            f"SELECT * FROM parquet_scan('{self.scan_pattern}', HIVE_PARTITIONING=1)"
-        )
-        self.con.execute(sql)
+    @staticmethod
+    def _apply_resources(con: duckdb.DuckDBPyConnection, settings: Dict[str, str]) -> None:
+        """SET memory/spill settings on a connection."""
+        for name, value in settings.items():
+            if name == "temp_directory":
+                # DuckDB refuses to switch (even to itself) once it spilled.
+                current = con.execute("SELECT current_setting('temp_directory')").fetchone()[0]
+                if current == value:
+                    continue
+            con.execute(f"SET {name} = {DuckTable._quote_literal(value)}")
 
-    def _copy_select_to_dir(
+    @staticmethod
+    @contextmanager
+    def _resource_scope(
+        con: duckdb.DuckDBPyConnection,
+        settings: Dict[str, str],
+        base: Dict[str, str],
+    ) -> Iterator[None]:
+        """Override memory/spill settings for a block, then restore them.
+
+        Settings are restored to their configured `base` value, or reset to
+        DuckDB's default (current_setting() reports rounded sizes, which
+        would drift). They are database-wide, so scopes are serialized.
+        """
+        if not settings:
+            yield
+            return
+        with _resource_lock:
+            DuckTable._apply_resources(con, settings)
+            try:
+                yield
+            finally:
+                for name in settings:
+                    if name in base:
+                        DuckTable._apply_resources(con, {name: base[name]})
+                    else:
+                        con.execute(f"RESET {name}")
+
+    def _execute_write(
         self,
-        select_sql: str,
-        target_dir: str,
-        partition_by: Optional[List[str]] = None,
+        sql: str,
         params: Optional[Sequence[Any]] = None,
-        compression: str = "zstd",
-    ):
-        """Dump SELECT query result to parquet files under target_dir."""
-        opts = ["FORMAT 'parquet'"]
-        if compression:
-            opts.append(f"COMPRESSION '{compression}'")
-        if partition_by:
-            cols = ", ".join(DuckTable._quote_ident(c) for c in partition_by)
-            opts.append(f"PARTITION_BY ({cols})")
-        options_sql = ", ".join(opts)
-        sql = f"COPY ({select_sql}) TO '{target_dir}' ({options_sql})"
-        self.con.execute(sql, params)
+        con: Optional[duckdb.DuckDBPyConnection] = None,
+    ) -> None:
+        """Run a COPY statement, recording rows written, peak memory and spill.
 
-    def _copy_df_to_dir(
+        DuckDB's profiler reports the peak buffer memory and temp directory
+        size of a statement; it is enabled on the cursor for the statement
+        unless the caller already profiles it.
+        """
+        cur = con or self._cursor()
+        with _phase(self.con, "copy", table=self.view_name) as record:
+            with DuckProfile._statement(cur) as profile:
+                result = cur.execute(sql, params).fetchone()
+                info = profile()
+            DuckProfile._annotate(record, sql, info)
+        self._write_log.append(
+            {
+                "rows_written": int(result[0]) if result else 0,
+                "peak_memory_bytes": int(info.get("system_peak_buffer_memory") or 0),
+                "peak_spill_bytes": int(info.get("system_peak_temp_dir_size") or 0),
+            }
+        )
+
+    @contextmanager
+    def _operation_cursor(self) -> Iterator[None]:
+        """Run the statements of one write on a fresh cursor.
+
+        DuckDB's peak memory and spill metrics accumulate per connection, so
+        a fresh cursor scopes them to the operation. Inside an AsyncDuckPQ
+        task, the task's own cursor is kept.
+        """
+        if _TaskContext.current(self.con) is not None:
+            yield
+            return
+        ctx = _TaskContext(self.con)
+        try:
+            with ctx.bind():
+                yield
+        finally:
+            ctx.close()
+
+    @contextmanager
+    def _write_report(self, operation: str) -> Iterator[None]:
+        """Summarize a write into last_write (on success) and storage hooks."""
+        self._write_log = []
+        started = time.perf_counter()
+        error = None
+        try:
+            yield
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            log = self._write_log
+            report: Dict[str, Any] = {
+                "operation": operation,
+                "seconds": time.perf_counter() - started,
+                "rows_written": sum(e.get("rows_written", 0) for e in log),
+            }
+            for key in ("peak_memory_bytes", "peak_spill_bytes"):
+                report[key] = max((e.get(key, 0) for e in log), default=0)
+            report["spilled"] = report["peak_spill_bytes"] > 0
+            if error is None:
+                self.last_write = report
+            if _hooks:
+                event = dict(report)
+                for key in ("files_written", "bytes_written", "files_removed"):
+                    event[key] = sum(e.get(key, 0) for e in log)
+                _emit(event, self.view_name, error)
+
+    def _record_files(self, written: Sequence[Path], removed: Sequence[Path]) -> None:
+        """Count files written and replaced by a write, for storage hooks."""
+        if not _hooks:
+            return
+        sizes = [f.stat().st_size for f in written if f.exists()]
+        self._write_log.append(
+            {
+                "files_written": len(sizes),
+                "bytes_written": sum(sizes),
+                "files_removed": len(removed),
+            }
+        )
+
+    def _staging_dir(self, prefix: str = "__parquet_rewrite_") -> Path:
+        """Create a staging directory for this table next to the table root."""
+        return self._local_tempdir(
+            self.root_path.parent, prefix=f"{prefix}{self.root_path.name}_"
+        )
+
+    def _owns_staging(self, path: Path) -> bool:
+        """Check whether a staging directory was created by this table."""
+        return any(
+            re.fullmatch(re.escape(f"{prefix}{self.root_path.name}_") + "[0-9a-f]{8}", path.name)
+            for prefix in DuckTable._STAGING_PREFIXES
+        )
+
+    @contextmanager
+    def _file_locks(
         self,
-        df: pd.DataFrame,
-        target: str,
-        partition_by: Optional[List[str]] = None,
-        compression: str = "zstd",
+        partitions: Optional[Sequence[str]] = None,
+        timeout: Optional[float] = -1,
     ):
-        """Write pandas DataFrame into partitioned parquet files."""
-        reg_name = f"incoming_{uuid.uuid4().hex[:8]}"
-        self.con.register(reg_name, df)
-        opts = ["FORMAT 'parquet'"]
-        if compression:
-            opts.append(f"COMPRESSION '{compression}'")
-        if partition_by:
-            cols = ", ".join(DuckTable._quote_ident(c) for c in partition_by)
-            opts.append(f"PARTITION_BY ({cols})")
-        options_sql = ", ".join(opts)
-        if partition_by:
-            sql = (
-                f"COPY (SELECT * FROM {DuckTable._quote_ident(reg_name)}) "
-                f"TO '{target}' ({options_sql})"
+        """Hold cross-process write locks for the duration of the block.
+
+        Args:
+            partitions: None takes the table lock exclusively (whole-table
+                rewrites). Otherwise the table lock is taken shared and each
+                listed partition (relative hive path such as
+                ``trade_date=2025-01-02``) exclusively, so writers touching
+                different partitions run concurrently.
+            timeout: Seconds to wait; defaults to `lock_timeout`.
+        """
+        if not self.locking:
+            yield
+            return
+        if timeout == -1:
+            timeout = self.lock_timeout
+        with ExitStack() as stack:
+            stack.enter_context(
+                _FileLock(
+                    self._lock_dir / "table.lock",
+                    shared=partitions is not None,
+                    timeout=timeout,
+                )
             )
-        else:
-            sql = (
-                f"COPY (SELECT * FROM {DuckTable._quote_ident(reg_name)}) "
-                f"TO '{target}/data_0.parquet' ({options_sql})"
+            names = sorted(
+                {hashlib.sha1(p.encode()).hexdigest()[:16] for p in partitions or []}
             )
-        self.con.execute(sql)
-        self.con.unregister(reg_name)
+            for name in names:
+                stack.enter_context(
+                    _FileLock(self._lock_dir / "partitions" / f"{name}.lock", timeout=timeout)
+                )
+            yield
 
-    def _atomic_replace_dir(self, new_dir: Union[Path, str], old_dir: Union[Path, str]):
-        """Atomically replace a directory's contents."""
-        new_dir = Path(new_dir)
-        old_dir = Path(old_dir)
-        if old_dir.exists():
-            shutil.rmtree(str(old_dir))
-        new_dir.replace(old_dir)
+    @staticmethod
+    def _normalize_partition(rel: str) -> str:
+        """Normalize a relative hive partition path for lock naming."""
+        return "/".join(unquote(seg) for seg in rel.split("/") if seg)
 
-    # ----------------- Upsert Internal Logic -----------------
+    def _affected_partitions(
+        self, df: Union[_FrameLike, str], partition_by: List[str]
+    ) -> List[str]:
+        """Relative hive paths of the partitions incoming rows write into."""
+        with self._source(df) as src:
+            cols = ", ".join(
+                f"COALESCE(CAST({DuckTable._quote_ident(c)} AS VARCHAR), 'NULL')"
+                for c in partition_by
+            )
+            rows = self._cursor().execute(f"SELECT DISTINCT {cols} FROM {src}").fetchall()
+        return [
+            "/".join(f"{c}={v}" for c, v in zip(partition_by, row)) for row in rows
+        ]
 
-    def _upsert_no_exist(self, df: pd.DataFrame, partition_by: Optional[list]) -> None:
-        """Upsert logic branch if no existing parquet files."""
-        tmpdir = self._local_tempdir(self.root_path.parent)
+    @staticmethod
+    def _as_stream(df: Any) -> Optional["pa.RecordBatchReader"]:
+        """Return df as a RecordBatchReader if it can only be scanned once."""
+        if isinstance(df, (pd.DataFrame, str)):
+            return None
+        cls = type(df)
+        if cls.__module__.startswith("pyarrow"):
+            return df if cls.__name__ == "RecordBatchReader" else None
+        if cls.__module__.startswith("polars") or not isinstance(df, Iterable):
+            return None
+        import pyarrow as pa
+
+        batches = (
+            b for item in df for b in (item.to_batches() if isinstance(item, pa.Table) else [item])
+        )
+        first = next(batches, None)
+        if first is None:
+            raise ValueError("No record batches to write.")
+        return pa.RecordBatchReader.from_batches(first.schema, chain([first], batches))
+
+    @contextmanager
+    def _temp_table(self, select_sql: str) -> Iterator[str]:
+        """Materialize a query into a temp table on the cursor for the block."""
+        name = f"incoming_{uuid.uuid4().hex[:8]}"
+        self._cursor().execute(f"CREATE TEMP TABLE {name} AS {select_sql}")
         try:
-            self._copy_df_to_dir(
-                df,
-                target=str(tmpdir),
-                partition_by=partition_by,
-            )
-            self._atomic_replace_dir(tmpdir, self.root_path)
+            yield name
         finally:
-            if tmpdir.exists():
-                shutil.rmtree(tmpdir, ignore_errors=True)
-        self.refresh()
+            self._cursor().execute(f"DROP TABLE IF EXISTS {name}")
 
-    def _upsert_existing(
-        self, df: pd.DataFrame, keys: list, partition_by: Optional[list]
-    ) -> None:
-        """Upsert logic branch if existing parquet files already present."""
-        tmpdir = self._local_tempdir(self.root_path.parent)
-        base_cols = self.columns
-        all_cols = ", ".join(DuckTable._quote_ident(c) for c in base_cols)
-        key_expr = ", ".join(DuckTable._quote_ident(k) for k in keys)
-        temp_name = f"newdata_{uuid.uuid4().hex[:6]}"
-        self.con.register(temp_name, df)
-        parts_tbl: Optional[str] = None
+    @contextmanager
+    def _incoming(self, df: _FrameLike) -> Iterator[Union[_FrameLike, str]]:
+        """Prepare incoming rows for the write paths, which scan them repeatedly.
 
-        try:
-            if not partition_by:
-                out_path = tmpdir / "data_0.parquet"
-                sql = f"""
-                    COPY (
-                        SELECT {all_cols} FROM (
-                            SELECT *, ROW_NUMBER() OVER (PARTITION BY {key_expr} ORDER BY is_new DESC) AS rn
-                            FROM (
-                                SELECT {all_cols}, 0 as is_new FROM {DuckTable._quote_ident(self.view_name)}
-                                UNION ALL
-                                SELECT {all_cols}, 1 as is_new FROM {DuckTable._quote_ident(temp_name)}
-                            )
-                        ) WHERE rn=1
-                    ) TO '{out_path}' (FORMAT 'parquet', COMPRESSION 'zstd')
-                """
-                self.con.execute(sql)
-                dst = self.root_path / "data_0.parquet"
-                if dst.exists():
-                    dst.unlink()
-                shutil.move(str(out_path), str(dst))
+        Streams (RecordBatchReader, iterables of record batches) are loaded
+        into a temp table and polars LazyFrames are collected; DataFrames,
+        Arrow tables and polars frames are passed through to be registered
+        zero-copy.
+        """
+        if type(df).__name__ == "LazyFrame":
+            df = df.collect()
+        stream = DuckTable._as_stream(df)
+        if stream is None:
+            yield df
+            return
+        with ExitStack() as stack:
+            with self._source(stream) as src:
+                name = stack.enter_context(self._temp_table(f"SELECT * FROM {src}"))
+            yield name
+
+    @contextmanager
+    def _partitioned(
+        self, df: Union[_FrameLike, str], partition_by: Optional[list]
+    ) -> Iterator[Tuple[Union[_FrameLike, str], Optional[List[str]]]]:
+        """Resolve partition transforms in `partition_by` for a write.
+
+        Yields the incoming rows with the derived partition columns added (as
+        a temp view, without copying) and the partition column names. Derived
+        columns already present, e.g. in rows read back from the table, are
+        recomputed.
+        """
+        transforms = [p for p in partition_by or [] if isinstance(p, PartitionTransform)]
+        if not transforms:
+            yield df, partition_by
+            return
+        names = [p.name if isinstance(p, PartitionTransform) else p for p in partition_by]
+        existing = set(self._source_columns(df))
+        with self._source(df) as src:
+            stale = [t.name for t in transforms if t.name in existing]
+            exclude = (
+                f" EXCLUDE ({', '.join(DuckTable._quote_ident(n) for n in stale)})"
+                if stale
+                else ""
+            )
+            exprs = ", ".join(
+                f"{t.sql()} AS {DuckTable._quote_ident(t.name)}" for t in transforms
+            )
+            view = f"incoming_{uuid.uuid4().hex[:8]}"
+            self._cursor().execute(
+                f"CREATE TEMP VIEW {view} AS SELECT *{exclude}, {exprs} FROM {src}"
+            )
+            try:
+                yield view, names
+            finally:
+                self._cursor().execute(f"DROP VIEW IF EXISTS {view}")
+
+    @contextmanager
+    def _source(self, df: Union[_FrameLike, str]) -> Iterator[str]:
+        """Yield a quoted relation name holding incoming rows.
+
+        DataFrames, Arrow and polars data are registered on the cursor for
+        the duration of the block; strings name a relation that already
+        exists on the cursor (e.g. a temp table from _incoming).
+        """
+        if isinstance(df, str):
+            yield DuckTable._quote_ident(df)
+            return
+        reg_name = f"incoming_{uuid.uuid4().hex[:8]}"
+        self._cursor().register(reg_name, df)
+        try:
+            yield DuckTable._quote_ident(reg_name)
+        finally:
+            try:
+                self._cursor().unregister(reg_name)
+            except Exception:
+                pass
+
+    def _source_columns(self, df: Union[_FrameLike, str]) -> List[str]:
+        """Column names of incoming rows."""
+        if isinstance(df, pd.DataFrame):
+            return list(df.columns)
+        with self._source(df) as src:
+            return [r[0] for r in self._cursor().execute(f"DESCRIBE {src}").fetchall()]
+
+    def _has_duplicate_keys(self, df: Union[_FrameLike, str], keys: list) -> bool:
+        """Check whether incoming rows contain duplicate keys."""
+        if isinstance(df, pd.DataFrame):
+            return bool(df.duplicated(subset=keys).any())
+        key_expr = ", ".join(DuckTable._quote_ident(k) for k in keys)
+        with self._source(df) as src:
+            return bool(
+                self._cursor().execute(
+                    f"SELECT 1 FROM {src} GROUP BY {key_expr} HAVING COUNT(*) > 1 LIMIT 1"
+                ).fetchall()
+            )
+
+    @staticmethod
+    def _local_tempdir(target_dir, prefix="__parquet_rewrite_"):
+        """Generate a temporary directory for atomic operations under target_dir."""
+        tmpdir = Path(target_dir) / f"{prefix}{uuid.uuid4().hex[:8]}"
+        tmpdir.mkdir(exist_ok=True, parents=True)
+        return tmpdir
+
+    def _parquet_files(self) -> List[Path]:
+        """List all parquet files under the dataset path, sorted."""
+        with _phase(self.con, "glob", table=self.view_name):
+            return sorted(
+                f
+                for f in self.root_path.rglob("*.parquet")
+                if not self._is_staging(f.relative_to(self.root_path))
+            )
+
+    def _partition_of(self, path: Path) -> str:
+        """Relative partition directory of a parquet file ('' for the root)."""
+        rel = Path(path).parent.relative_to(self.root_path).as_posix()
+        return "" if rel == "." else rel
+
+    def _parquet_files_exist(self) -> bool:
+        """Check if there are any parquet files under the dataset path."""
+        with _phase(self.con, "glob", table=self.view_name):
+            for f in self.root_path.rglob("*.parquet"):
+                if not self._is_staging(f.relative_to(self.root_path)):
+                    return True
+            return False
+
+    def _scan_sql(self) -> str:
+        """Table function scanning all parquet files of the dataset."""
+        return f"parquet_scan('{self.scan_pattern}', HIVE_PARTITIONING=1)"
+
+    def _scan_columns(self) -> List[str]:
+        """Columns of the parquet files currently on disk.
+
+        Writers read the schema here rather than from the view, which may
+        predate files written by other processes since the last refresh.
+        """
+        rows = self._cursor().execute(f"DESCRIBE SELECT * FROM {self._scan_sql()}").fetchall()
+        return [r[0] for r in rows]
+
+    def _create_or_replace_view(self):
+        """Create or replace the DuckDB view for current dataset."""
+        if self._hot is not None:
+            self._sync_hot()
+            return
+        view_ident = DuckTable._quote_ident(self.view_name)
+        sql = f"CREATE OR REPLACE VIEW {view_ident} AS SELECT * FROM {self._scan_sql()}"
+        self._cursor().execute(sql)
+
+    @staticmethod
+    def _partition_predicate(
+        partitions: Sequence[str], types: Optional[Dict[str, str]] = None
+    ) -> str:
+        """SQL predicate matching rows of the given relative hive partitions.
+
+        With the column `types`, values are compared as typed constants, which
+        is much cheaper per row than comparing the columns as strings.
+        """
+        types = types or {}
+        terms = []
+        for rel in partitions:
+            conds = []
+            for seg in rel.split("/"):
+                col, val = seg.split("=", 1)
+                val = unquote(val)
+                col_ident = DuckTable._quote_ident(col)
+                if val in ("NULL", "__HIVE_DEFAULT_PARTITION__"):
+                    conds.append(f"{col_ident} IS NULL")
+                elif col in types:
+                    conds.append(
+                        f"{col_ident} IS NOT DISTINCT FROM "
+                        f"CAST({DuckTable._quote_literal(val)} AS {types[col]})"
+                    )
+                else:
+                    conds.append(
+                        f"CAST({col_ident} AS VARCHAR) IS NOT DISTINCT FROM "
+                        f"{DuckTable._quote_literal(val)}"
+                    )
+            terms.append("(" + " AND ".join(conds) + ")")
+        return " OR ".join(terms) if terms else "FALSE"
+
+    def _partition_transforms(self) -> List[PartitionTransform]:
+        """Partition transforms recorded in the table directory (cached)."""
+        key = ("partition_transforms",)
+        if key not in self._cache:
+            path = self.root_path / DuckTable._LAYOUT_FILE
+            transforms = []
+            if path.exists():
+                layout = json.loads(path.read_text())
+                transforms = [PartitionTransform.from_dict(t) for t in layout["transforms"]]
+            self._cache[key] = transforms
+        return self._cache[key]
+
+    @staticmethod
+    def _write_layout(directory: Path, transforms: List[PartitionTransform]) -> None:
+        """Record the partition transforms of a table directory."""
+        path = Path(directory) / DuckTable._LAYOUT_FILE
+        tmp = path.with_name(f"{path.name}.{uuid.uuid4().hex[:8]}")
+        tmp.write_text(json.dumps({"transforms": [t.to_dict() for t in transforms]}))
+        tmp.replace(path)
+
+    def _column_types(self) -> Dict[str, str]:
+        """Column name -> DuckDB type of the view (cached)."""
+        key = ("column_types",)
+        if key not in self._cache:
+            view_ident = DuckTable._quote_ident(self.view_name)
+            try:
+                rows = self._cursor().execute(f"DESCRIBE {view_ident}").fetchall()
+            except duckdb.CatalogException:
+                rows = []
+            self._cache[key] = {r[0]: r[1] for r in rows}
+        return self._cache[key]
+
+    # Comparison of `column op value` -> the same with the operands swapped.
+    _FLIPPED = {
+        "COMPARE_EQUAL": "COMPARE_EQUAL",
+        "COMPARE_LESSTHAN": "COMPARE_GREATERTHAN",
+        "COMPARE_GREATERTHAN": "COMPARE_LESSTHAN",
+        "COMPARE_LESSTHANOREQUALTO": "COMPARE_GREATERTHANOREQUALTO",
+        "COMPARE_GREATERTHANOREQUALTO": "COMPARE_LESSTHANOREQUALTO",
+    }
+
+    def _prune_where(self, where: Optional[str], params: Optional[Sequence[Any]]) -> Optional[str]:
+        """Add partition filters implied by predicates on transform sources.
+
+        Top-level AND terms comparing a source column of a partition
+        transform to constants or bind parameters (=, IN, <, <=, >, >=,
+        BETWEEN) are mirrored on the partition column, e.g. `ts BETWEEN a AND
+        b` adds `ts_month BETWEEN month(a) AND month(b)`, which DuckDB uses to
+        skip partition directories. The added filters are implied by the
+        original predicate, so results are unchanged; anything not
+        understood is left alone.
+        """
+        transforms = self._partition_transforms()
+        if not where or not transforms:
+            return where
+        types = self._column_types()
+        by_source: Dict[str, List[PartitionTransform]] = {}
+        for t in transforms:
+            if t.name in types and t.source in types:
+                by_source.setdefault(t.source, []).append(t)
+        if not by_source:
+            return where
+        try:
+            filters = self._partition_filters(where, list(params or []), by_source, types)
+        except (duckdb.Error, IndexError, ValueError):
+            # e.g. named $parameters or too few bind parameters
+            return where
+        if not filters:
+            return where
+        return f"({where}) AND " + " AND ".join(filters)
+
+    def _partition_filters(
+        self,
+        where: str,
+        params: List[Any],
+        by_source: Dict[str, List[PartitionTransform]],
+        types: Dict[str, str],
+    ) -> List[str]:
+        """Partition filters for _prune_where(), from DuckDB's parse tree of `where`."""
+        cur = self._cursor()
+        tree = json.loads(
+            cur.execute(
+                "SELECT json_serialize_sql(?)", [f"SELECT * FROM t WHERE {where}"]
+            ).fetchone()[0]
+        )
+        if tree.get("error"):
+            return []
+
+        def conjuncts(node: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+            if node.get("type") == "CONJUNCTION_AND":
+                for child in node["children"]:
+                    yield from conjuncts(child)
+            else:
+                yield node
+
+        def source(node: Dict[str, Any]) -> Optional[str]:
+            if node.get("class") == "COLUMN_REF" and len(node["column_names"]) == 1:
+                name = node["column_names"][0]
+                return name if name in by_source else None
+            return None
+
+        def is_value(node: Dict[str, Any]) -> bool:
+            if node.get("class") == "CAST":
+                return is_value(node["child"])
+            return node.get("class") in ("CONSTANT", "PARAMETER")
+
+        # (source column, comparison, value nodes)
+        terms: List[Tuple[str, str, List[Dict[str, Any]]]] = []
+        for node in conjuncts(tree["statements"][0]["node"]["where_clause"]):
+            kind = node.get("type")
+            if kind in DuckTable._FLIPPED:
+                left, right = node["left"], node["right"]
+                if source(left) and is_value(right):
+                    terms.append((source(left), kind, [right]))
+                elif source(right) and is_value(left):
+                    terms.append((source(right), DuckTable._FLIPPED[kind], [left]))
+            elif kind == "COMPARE_BETWEEN":
+                if source(node["input"]) and is_value(node["lower"]) and is_value(node["upper"]):
+                    terms.append((source(node["input"]), kind, [node["lower"], node["upper"]]))
+            elif kind == "COMPARE_IN":
+                col, values = node["children"][0], node["children"][1:]
+                if source(col) and values and all(is_value(v) for v in values):
+                    terms.append((source(col), kind, values))
+        if not terms:
+            return []
+
+        # Evaluate the transforms of all values in one query.
+        template = json.loads(
+            cur.execute("SELECT json_serialize_sql('SELECT 1')").fetchone()[0]
+        )
+        exprs: List[str] = []
+        bind: List[Any] = []
+        plan: List[Tuple[PartitionTransform, str, int, int]] = []
+        for col, kind, values in terms:
+            for t in by_source[col]:
+                if kind not in ("COMPARE_EQUAL", "COMPARE_IN") and not t.monotonic:
+                    continue
+                start = len(exprs)
+                for value in values:
+                    if value.get("class") == "PARAMETER":
+                        bind.append(params[int(value["identifier"]) - 1])
+                        operand = f"${len(bind)}"  # may appear twice in t.sql()
+                    else:
+                        template["statements"][0]["node"]["select_list"] = [value]
+                        operand = cur.execute(
+                            "SELECT json_deserialize_sql(?)", [json.dumps(template)]
+                        ).fetchone()[0][len("SELECT ") :]
+                    exprs.append(t.sql(f"CAST({operand} AS {types[col]})"))
+                plan.append((t, kind, start, len(exprs)))
+        if not exprs:
+            return []
+        row = cur.execute(f"SELECT {', '.join(exprs)}", bind).fetchone()
+
+        def literal(value: Any) -> str:
+            if value is None:
+                return "NULL"
+            if isinstance(value, int):
+                return str(value)
+            return f"CAST({DuckTable._quote_literal(str(value))} AS DATE)"  # day()
+
+        filters = []
+        for t, kind, start, stop in plan:
+            ident = DuckTable._quote_ident(t.name)
+            values = [literal(v) for v in row[start:stop]]
+            if kind == "COMPARE_EQUAL":
+                filters.append(f"{ident} = {values[0]}")
+            elif kind == "COMPARE_IN":
+                filters.append(f"{ident} IN ({', '.join(values)})")
+            elif kind in ("COMPARE_GREATERTHAN", "COMPARE_GREATERTHANOREQUALTO"):
+                filters.append(f"{ident} >= {values[0]}")
+            elif kind in ("COMPARE_LESSTHAN", "COMPARE_LESSTHANOREQUALTO"):
+                filters.append(f"{ident} <= {values[0]}")
+            elif kind == "COMPARE_BETWEEN":
+                filters.append(f"{ident} BETWEEN {values[0]} AND {values[1]}")
+        return filters
+
+    @staticmethod
+    def _partition_sort_key(value: str) -> tuple:
+        """Order partition values numerically where possible."""
+        value = unquote(value)
+        try:
+            return (0, float(value), value)
+        except ValueError:
+            return (1, 0.0, value)
+
+    def _hot_signatures(self) -> Dict[str, tuple]:
+        """Pick the hot partitions and fingerprint their files."""
+        files = [f for f in self._parquet_files() if self._partition_of(f)]
+        if self._hot["partitions"] is not None:
+            parts = [p.strip("/") for p in self._hot["partitions"]]
+        else:
+            firsts = {self._partition_of(f).split("/")[0] for f in files}
+            parts = sorted(
+                firsts,
+                key=lambda p: self._partition_sort_key(p.split("=", 1)[1]),
+                reverse=True,
+            )[: int(self._hot["recent"])]
+        sigs: Dict[str, list] = {}
+        for f in files:
+            rel = self._partition_of(f)
+            for p in parts:
+                if rel == p or rel.startswith(p + "/"):
+                    st = f.stat()
+                    sigs.setdefault(p, []).append((str(f), st.st_size, st.st_mtime_ns))
+        return {p: tuple(sorted(v)) for p, v in sigs.items()}
+
+    def _sync_hot(self) -> None:
+        """Bring the hot table in line with the files and rebuild the view.
+
+        Only partitions whose files changed since the last sync are reloaded.
+        The hot table and the view are swapped in one transaction, so readers
+        never see a partition twice or not at all.
+        """
+        with _phase(self.con, "hot_sync", table=self.view_name):
+            with self._write_lock:
+                cur = self._cursor()
+                scan = self._scan_sql()
+                hot_ident = DuckTable._quote_ident(self._hot_table)
+                view_ident = DuckTable._quote_ident(self.view_name)
+                sigs = self._hot_signatures()
+                parts = sorted(sigs)
+                types = {
+                    r[0]: r[1] for r in cur.execute(f"DESCRIBE SELECT * FROM {scan}").fetchall()
+                }
+
+                def _pred(ps: Sequence[str]) -> str:
+                    return self._partition_predicate(ps, types)
+
+                def _apply(incremental: bool) -> None:
+                    cur.execute("BEGIN TRANSACTION")
+                    try:
+                        if incremental:
+                            old = self._hot_sigs
+                            stale = [p for p in old if sigs.get(p) != old[p]]
+                            fresh = [p for p in parts if old.get(p) != sigs[p]]
+                            if stale:
+                                cur.execute(
+                                    f"DELETE FROM {hot_ident} "
+                                    f"WHERE {_pred(stale)}"
+                                )
+                            if fresh:
+                                cur.execute(
+                                    f"INSERT INTO {hot_ident} BY NAME SELECT * FROM {scan} "
+                                    f"WHERE {_pred(fresh)}"
+                                )
+                        else:
+                            cur.execute(
+                                f"CREATE OR REPLACE TABLE {hot_ident} AS SELECT * FROM {scan} "
+                                f"WHERE {_pred(parts)}"
+                            )
+                        cur.execute(
+                            f"CREATE OR REPLACE VIEW {view_ident} AS "
+                            f"SELECT * FROM {hot_ident} UNION ALL "
+                            f"SELECT * FROM {scan} WHERE NOT ({_pred(parts)})"
+                        )
+                        cur.execute("COMMIT")
+                    except Exception:
+                        cur.execute("ROLLBACK")
+                        raise
+
+                try:
+                    _apply(incremental=self._hot_sigs is not None)
+                except duckdb.Error:
+                    if self._hot_sigs is None:
+                        raise
+                    # e.g. the schema changed: reload the hot tier from scratch
+                    _apply(incremental=False)
+                self._hot_sigs = sigs
+
+    def _invalidate_caches(self):
+        """Start a new table version and drop caches bound to the old one."""
+        self._version += 1
+        self._cache.clear()
+
+    def _pivot_domain(self, columns: str, where: Optional[str] = None) -> List[str]:
+        """Return the distinct (VARCHAR-cast) values of a pivot column.
+
+        The result is cached together with the path, size and mtime of every
+        parquet file, so repeated pivots over the same universe only pay the
+        discovery scan once, while files written by other processes
+        invalidate it.
+        """
+        key = ("pivot_domain", columns, where)
+        listing = []
+        for f in self._parquet_files():
+            try:
+                st = f.stat()
+            except FileNotFoundError:  # replaced by a concurrent writer
+                continue
+            listing.append((str(f), st.st_size, st.st_mtime_ns))
+        files = tuple(listing)
+        cached = self._cache.get(key)
+        if cached is None or cached[0] != files:
+            col_ident = DuckTable._quote_ident(columns)
+            sql = (
+                f"SELECT DISTINCT CAST({col_ident} AS VARCHAR) AS v "
+                f"FROM {DuckTable._quote_ident(self.view_name)} "
+                f"WHERE {col_ident} IS NOT NULL"
+            )
+            if where:
+                sql += f" AND ({where})"
+            sql += " ORDER BY v"
+            values = [row[0] for row in self._cursor().execute(sql).fetchall()]
+            self._cache[key] = cached = (files, values)
+        return cached[1]
+
+    def _copy_select_to_dir(
+        self,
+        select_sql: str,
+        target_dir: str,
+        partition_by: Optional[List[str]] = None,
+        params: Optional[Sequence[Any]] = None,
+        compression: str = "zstd",
+    ):
+        """Dump SELECT query result to parquet files under target_dir."""
+        opts = ["FORMAT 'parquet'"]
+        if compression:
+            opts.append(f"COMPRESSION '{compression}'")
+        if partition_by:
+            cols = ", ".join(DuckTable._quote_ident(c) for c in partition_by)
+            opts.append(f"PARTITION_BY ({cols})")
+        options_sql = ", ".join(opts)
+        sql = f"COPY ({select_sql}) TO '{target_dir}' ({options_sql})"
+        self._execute_write(sql, params)
+
+    def _copy_df_to_dir(
+        self,
+        df: Union[_FrameLike, str],
+        target: str,
+        partition_by: Optional[List[str]] = None,
+        compression: str = "zstd",
+    ):
+        """Write incoming rows into partitioned parquet files."""
+        opts = ["FORMAT 'parquet'"]
+        if compression:
+            opts.append(f"COMPRESSION '{compression}'")
+        if partition_by:
+            cols = ", ".join(DuckTable._quote_ident(c) for c in partition_by)
+            opts.append(f"PARTITION_BY ({cols})")
+        options_sql = ", ".join(opts)
+        with self._source(df) as src:
+            if partition_by:
+                sql = f"COPY (SELECT * FROM {src}) TO '{target}' ({options_sql})"
             else:
-                parts_tbl = f"parts_{uuid.uuid4().hex[:6]}"
-                affected = df[partition_by].drop_duplicates()
-                self.con.register(parts_tbl, affected)
+                sql = (
+                    f"COPY (SELECT * FROM {src}) "
+                    f"TO '{target}/data_0.parquet' ({options_sql})"
+                )
+            self._execute_write(sql)
+
+    def _atomic_replace_dir(self, new_dir: Union[Path, str], old_dir: Union[Path, str]):
+        """Replace a directory by another one, keeping the old one recoverable.
+
+        The old directory is first renamed into a ``__parquet_trash_*``
+        staging directory (outside the table tree) that records its original
+        location, so a crash between the two renames can be undone by
+        vacuum()/recovery instead of losing the data.
+        """
+        new_dir = Path(new_dir)
+        old_dir = Path(old_dir)
+        trash = None
+        if old_dir.exists():
+            trash = self._staging_dir("__parquet_trash_")
+            (trash / "target").write_text(str(old_dir))
+            old_dir.replace(trash / "data")
+        new_dir.replace(old_dir)
+        if trash is not None:
+            shutil.rmtree(trash, ignore_errors=True)
+
+    @staticmethod
+    def _is_staging(path: Path) -> bool:
+        """Check whether a path is (inside) a staging directory."""
+        return any(part.startswith(DuckTable._STAGING_PREFIXES) for part in Path(path).parts)
+
+    @staticmethod
+    def _restore_trash(trash: Path) -> Optional[str]:
+        """Undo an interrupted directory swap, then delete the trash dir.
+
+        Returns:
+            Optional[str]: The restored path, if the original was missing.
+        """
+        restored = None
+        target_file, data = trash / "target", trash / "data"
+        if target_file.exists() and data.exists():
+            target = Path(target_file.read_text())
+            if not target.exists():
+                target.parent.mkdir(parents=True, exist_ok=True)
+                data.replace(target)
+                restored = str(target)
+        shutil.rmtree(trash, ignore_errors=True)
+        return restored
+
+    # ----------------- Upsert Internal Logic -----------------
+    #
+    # Writes happen in two phases: _stage_* writes the new files into a
+    # staging directory outside the table tree without touching the table,
+    # and _commit_staged moves them into place. Batches stage every table
+    # first and only commit once all of them succeeded.
+
+    def _stage_create(
+        self, df: Union[_FrameLike, str], partition_by: Optional[list]
+    ) -> Dict[str, Any]:
+        """Stage the initial content of a table that has no parquet files."""
+        tmpdir = self._staging_dir()
+        try:
+            self._copy_df_to_dir(
+                df,
+                target=str(tmpdir),
+                partition_by=partition_by,
+            )
+        except Exception:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+            raise
+        return {"kind": "create", "tmpdir": tmpdir}
+
+    def _stage_merge(
+        self, df: Union[_FrameLike, str], keys: list, partition_by: Optional[list]
+    ) -> Dict[str, Any]:
+        """Stage the merged content of partitions touched by an upsert.
+
+        Existing rows whose keys are not in df are kept and all incoming rows
+        are added. The anti-join is a hash join on df, which DuckDB spills to
+        temp_directory when it outgrows memory_limit.
+        """
+        base_cols = self._scan_columns()
+        tmpdir = self._staging_dir()
+        all_cols = ", ".join(DuckTable._quote_ident(c) for c in base_cols)
+        old_cols = ", ".join(f"e.{DuckTable._quote_ident(c)}" for c in base_cols)
+        key_match = " AND ".join(
+            f"e.{k} IS NOT DISTINCT FROM n.{k}"
+            for k in (DuckTable._quote_ident(k) for k in keys)
+        )
+
+        try:
+            with self._source(df) as src:
+                if not partition_by:
+                    # Snapshot root-level files read by the merge; they are all
+                    # superseded by the merged data_0.parquet.
+                    obsolete = sorted(self.root_path.glob("*.parquet"))
+                    out_path = tmpdir / "data_0.parquet"
+                    sql = f"""
+                        COPY (
+                            SELECT {old_cols} FROM {self._scan_sql()} AS e
+                            ANTI JOIN {src} AS n ON {key_match}
+                            UNION ALL
+                            SELECT {all_cols} FROM {src}
+                        ) TO '{out_path}' (FORMAT 'parquet', COMPRESSION 'zstd')
+                    """
+                    self._execute_write(sql)
+                    return {"kind": "file", "tmpdir": tmpdir, "obsolete": obsolete}
+
                 part_cols_ident = ", ".join(
                     DuckTable._quote_ident(c) for c in partition_by
                 )
                 partition_by_clause = f"PARTITION_BY ({part_cols_ident})"
                 old_sql = (
-                    f"SELECT {all_cols}, 0 AS is_new "
-                    f"FROM {DuckTable._quote_ident(self.view_name)} AS e "
-                    f"JOIN {DuckTable._quote_ident(parts_tbl)} AS p USING ({part_cols_ident})"
+                    f"SELECT {old_cols} "
+                    f"FROM {self._scan_sql()} AS e "
+                    f"JOIN (SELECT DISTINCT {part_cols_ident} FROM {src}) AS p "
+                    f"USING ({part_cols_ident}) "
+                    f"ANTI JOIN {src} AS n ON {key_match}"
                 )
                 sql = f"""
                     COPY (
-                        SELECT {all_cols} FROM (
-                            SELECT *, ROW_NUMBER() OVER (PARTITION BY {key_expr} ORDER BY is_new DESC) AS rn
-                            FROM (
-                                {old_sql}
-                                UNION ALL
-                                SELECT {all_cols}, 1 as is_new FROM {DuckTable._quote_ident(temp_name)}
-                            )
-                        ) WHERE rn=1
+                        {old_sql}
+                        UNION ALL
+                        SELECT {all_cols} FROM {src}
                     ) TO '{tmpdir}'
                       (FORMAT 'parquet', COMPRESSION 'zstd', {partition_by_clause})
                 """
-                self.con.execute(sql)
-
-                # move each partition subdir from tmpdir -> root_path
-                subdirs = [d.name for d in tmpdir.iterdir() if d.is_dir()]
-                for subdir in subdirs:
-                    src = tmpdir / subdir
-                    dst = self.root_path / subdir
-                    if dst.exists():
-                        if dst.is_dir():
-                            shutil.rmtree(str(dst))
-                        else:
-                            dst.unlink()
-                    dst.parent.mkdir(parents=True, exist_ok=True)
-                    shutil.move(str(src), str(dst))
-        finally:
+                self._execute_write(sql)
+                return {"kind": "partitions", "tmpdir": tmpdir, "depth": len(partition_by)}
+        except Exception:
+            shutil.rmtree(str(tmpdir), ignore_errors=True)
+            raise
+
+    def _stage_upsert(
+        self, df: Union[_FrameLike, str], keys: list, partition_by: Optional[list]
+    ) -> Dict[str, Any]:
+        """Stage an upsert, creating the table if it has no files yet."""
+        with self._partitioned(df, partition_by) as (df, names):
+            if self._has_duplicate_keys(df, keys):
+                raise ValueError("Incoming rows contain duplicate keys.")
+            if not self._parquet_files_exist():
+                staged = self._stage_create(df, names)
+            else:
+                staged = self._stage_merge(df, keys, names)
+        staged["layout"] = [p for p in partition_by or [] if isinstance(p, PartitionTransform)]
+        return staged
+
+    def _stage_append(
+        self, df: Union[_FrameLike, str], partition_by: Optional[list]
+    ) -> Dict[str, Any]:
+        """Stage new files holding incoming rows, without reading existing data."""
+        with self._partitioned(df, partition_by) as (data, names):
+            staged = self._stage_append_files(data, names)
+        staged["layout"] = [p for p in partition_by or [] if isinstance(p, PartitionTransform)]
+        return staged
+
+    def _stage_append_files(
+        self, df: Union[_FrameLike, str], partition_by: Optional[List[str]]
+    ) -> Dict[str, Any]:
+        """Write incoming rows as new files into a staging directory."""
+        cols = self._source_columns(df)
+        if self._parquet_files_exist():
+            table_cols = self._scan_columns()
+            if set(cols) != set(table_cols):
+                raise ValueError(
+                    "DataFrame columns do not match the table columns: "
+                    f"{sorted(cols)} != {sorted(table_cols)}"
+                )
+            cols = table_cols
+        tmpdir = self._staging_dir()
+        try:
+            with self._source(df) as src:
+                select_sql = (
+                    f"SELECT {', '.join(DuckTable._quote_ident(c) for c in cols)} FROM {src}"
+                )
+                if partition_by:
+                    part_cols = ", ".join(DuckTable._quote_ident(c) for c in partition_by)
+                    target = str(tmpdir)
+                    opts = f"PARTITION_BY ({part_cols}), FILENAME_PATTERN 'data_{{uuid}}'"
+                else:
+                    target = str(tmpdir / f"data_{uuid.uuid4().hex[:8]}.parquet")
+                    opts = ""
+                self._execute_write(
+                    f"COPY ({select_sql}) TO '{target}' "
+                    f"(FORMAT 'parquet', COMPRESSION 'zstd'{', ' + opts if opts else ''})"
+                )
+        except Exception:
+            shutil.rmtree(str(tmpdir), ignore_errors=True)
+            raise
+        return {"kind": "append", "tmpdir": tmpdir}
+
+    def _commit_staged(self, staged: Dict[str, Any]) -> None:
+        """Move staged files into the table and drop the staging directory."""
+        with _phase(self.con, "commit", table=self.view_name):
+            tmpdir: Path = staged["tmpdir"]
             try:
-                self.con.unregister(temp_name)
-            except Exception:
-                pass
-            if parts_tbl is not None:
-                try:
-                    self.con.unregister(parts_tbl)
-                except Exception:
-                    pass
-            if tmpdir.exists():
-                shutil.rmtree(str(tmpdir), ignore_errors=True)
-            self.refresh()
+                kind = staged["kind"]
+                if _hooks:
+                    self._record_files(
+                        list(tmpdir.rglob("*.parquet")), self._staged_replaces(staged)
+                    )
+                layout = staged.get("layout")
+                if kind == "create":
+                    # The layout is swapped in with the files it describes.
+                    if layout:
+                        self._write_layout(tmpdir, layout)
+                    self._atomic_replace_dir(tmpdir, self.root_path)
+                elif kind == "file":
+                    (tmpdir / "data_0.parquet").replace(self.root_path / "data_0.parquet")
+                    for f in staged["obsolete"]:
+                        if f.name != "data_0.parquet":
+                            f.unlink(missing_ok=True)
+                elif kind == "partitions":
+                    # swap each leaf partition dir from tmpdir -> root_path
+                    leaf_glob = "/".join(["*"] * staged["depth"])
+                    for src in [d for d in tmpdir.glob(leaf_glob) if d.is_dir()]:
+                        dst = self.root_path / src.relative_to(tmpdir)
+                        dst.parent.mkdir(parents=True, exist_ok=True)
+                        self._atomic_replace_dir(src, dst)
+                elif kind == "append":
+                    for src in sorted(tmpdir.rglob("*.parquet")):
+                        dst = self.root_path / src.relative_to(tmpdir)
+                        dst.parent.mkdir(parents=True, exist_ok=True)
+                        src.replace(dst)
+                if kind != "create" and layout and layout != self._partition_transforms():
+                    self._write_layout(self.root_path, layout)
+            finally:
+                self._discard_staged(staged)
+
+    def _staged_replaces(self, staged: Dict[str, Any]) -> List[Path]:
+        """Existing parquet files a staged write is about to replace."""
+        tmpdir: Path = staged["tmpdir"]
+        kind = staged["kind"]
+        if kind == "create":
+            return self._parquet_files()
+        if kind == "file":
+            return list(staged["obsolete"])
+        if kind == "partitions":
+            leaf_glob = "/".join(["*"] * staged["depth"])
+            return [
+                f
+                for src in tmpdir.glob(leaf_glob)
+                if src.is_dir()
+                for f in (self.root_path / src.relative_to(tmpdir)).glob("*.parquet")
+            ]
+        return []
+
+    @staticmethod
+    def _discard_staged(staged: Dict[str, Any]) -> None:
+        """Remove the staging directory of a staged write."""
+        tmpdir: Path = staged["tmpdir"]
+        if tmpdir.exists():
+            shutil.rmtree(str(tmpdir), ignore_errors=True)
 
     # ----------------- Context/Resource Management -----------------
 
@@ -330,10 +2008,15 @@ class DuckTable:
                 pass
 
     def drop(self):
-        """Drop the underlying DuckDB view, if it exists."""
+        """Drop the underlying DuckDB view (and hot table), if it exists."""
         view_ident = DuckTable._quote_ident(self.view_name)
         try:
-            self.con.execute(f"DROP VIEW IF EXISTS {view_ident}")
+            self._cursor().execute(f"DROP VIEW IF EXISTS {view_ident}")
+            if self._hot_sigs is not None:
+                self._cursor().execute(
+                    f"DROP TABLE IF EXISTS {DuckTable._quote_ident(self._hot_table)}"
+                )
+                self._hot_sigs = None
         except Exception:
             pass
 
@@ -360,11 +2043,65 @@ class DuckTable:
 
     def refresh(self):
         """Refresh DuckDB view after manual file changes."""
-        if self._parquet_files_exist():
-            self._create_or_replace_view()
+        with _phase(self.con, "refresh", table=self.view_name):
+            self._invalidate_caches()
+            if self._parquet_files_exist():
+                self._create_or_replace_view()
+            else:
+                # If no parquet files, it's fine to just drop the view.
+                self.drop()
+
+    def set_hot(
+        self,
+        recent: Optional[int] = None,
+        partitions: Optional[List[str]] = None,
+    ) -> List[str]:
+        """Keep partitions materialized in a native DuckDB table (hot tier).
+
+        The hot partitions are copied into a DuckDB table (in the attached
+        database file, if any) and the view becomes a UNION ALL of that table
+        and a parquet scan of the remaining (cold) partitions, so queries on
+        hot partitions skip parquet decoding. refresh() (and thus every write
+        through this instance) reloads the partitions whose files changed and,
+        with `recent`, moves the window forward. Writes by other processes are
+        only picked up on refresh().
+
+        Examples:
+            >>> dt.set_hot(recent=5)  # the 5 latest trade_date partitions
+            ['trade_date=2025-01-06', 'trade_date=2025-01-03', ...]
+            >>> dt.set_hot()  # disable
+
+        Args:
+            recent: Number of most recent first-level partitions to keep hot,
+                ordered by partition value (numerically where possible).
+            partitions: Explicit relative partition paths to keep hot, e.g.
+                ["trade_date=2025-01-06"]. Takes precedence over `recent`.
+
+        Returns:
+            List[str]: The hot partitions. Empty when the hot tier is disabled.
+        """
+        if recent is None and partitions is None:
+            self._hot = None
+            if self._hot_sigs is not None:
+                self._cursor().execute(
+                    f"DROP TABLE IF EXISTS {DuckTable._quote_ident(self._hot_table)}"
+                )
+                self._hot_sigs = None
         else:
-            # If no parquet files, it's fine to just drop the view.
-            self.drop()
+            self._hot = {"recent": recent, "partitions": partitions}
+            self._hot_sigs = None
+        self.refresh()
+        return self.hot_partitions
+
+    @property
+    def hot_partitions(self) -> List[str]:
+        """Partitions currently materialized in the hot tier."""
+        return sorted(self._hot_sigs or {})
+
+    @property
+    def partition_transforms(self) -> List[PartitionTransform]:
+        """Partition transforms the table was written with, see month() etc."""
+        return list(self._partition_transforms())
 
     def execute(
         self, sql: str, params: Optional[Sequence[Any]] = None
@@ -378,10 +2115,18 @@ class DuckTable:
         Returns:
             duckdb.DuckDBPyRelation: The DuckDB relation containing query results.
         """
-        return self.con.execute(sql, params or [])
+        return self._cursor().execute(sql, params or [])
 
     sql = execute
 
+    def _fetch_df(
+        self, sql: str, params: Optional[Sequence[Any]] = None, operation: str = "query"
+    ) -> pd.DataFrame:
+        """Run a query and fetch it as a DataFrame, see _fetch_df()."""
+        return _fetch_df(
+            self.con, self._cursor(), sql, params, table=self.view_name, operation=operation
+        )
+
     def query(self, sql: str, params: Optional[Sequence[Any]] = None) -> pd.DataFrame:
         """Execute a raw SQL query and return results as a pandas DataFrame.
 
@@ -392,13 +2137,13 @@ class DuckTable:
         Returns:
             pd.DataFrame: Query results as a pandas DataFrame.
         """
-        return self.execute(sql, params=params).df()
+        return self._fetch_df(sql, params=params)
 
     @property
     def schema(self) -> pd.DataFrame:
         """Get the schema (column info) of current parquet dataset."""
         view_ident = DuckTable._quote_ident(self.view_name)
-        return self.con.execute(f"DESCRIBE {view_ident}").df()
+        return self._cursor().execute(f"DESCRIBE {view_ident}").df()
 
     @property
     def columns(self) -> List[str]:
@@ -438,6 +2183,32 @@ class DuckTable:
         Returns:
             pd.DataFrame: Query results as a pandas DataFrame.
         """
+        sql, bind_params = self._select_sql(
+            columns=columns,
+            where=where,
+            params=params,
+            group_by=group_by,
+            having=having,
+            order_by=order_by,
+            limit=limit,
+            offset=offset,
+            distinct=distinct,
+        )
+        return self._fetch_df(sql, bind_params, operation="select")
+
+    def _select_sql(
+        self,
+        columns: Union[str, List[str]] = "*",
+        where: Optional[str] = None,
+        params: Optional[Sequence[Any]] = None,
+        group_by: Optional[Union[str, List[str]]] = None,
+        having: Optional[str] = None,
+        order_by: Optional[Union[str, List[str]]] = None,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+        distinct: bool = False,
+    ) -> Tuple[str, List[Any]]:
+        """Build the SQL and bind parameters of select()."""
         view_ident = DuckTable._quote_ident(self.view_name)
         col_sql = columns if isinstance(columns, str) else ", ".join(columns)
         sql_parts: List[str] = ["SELECT"]
@@ -448,7 +2219,7 @@ class DuckTable:
         bind_params = list(params or [])
         if where:
             sql_parts.append("WHERE")
-            sql_parts.append(where)
+            sql_parts.append(self._prune_where(where, bind_params))
         if group_by:
             group_sql = group_by if isinstance(group_by, str) else ", ".join(group_by)
             sql_parts.append("GROUP BY " + group_sql)
@@ -461,8 +2232,178 @@ class DuckTable:
             sql_parts.append(f"LIMIT {int(limit)}")
         if offset is not None:
             sql_parts.append(f"OFFSET {int(offset)}")
-        final = " ".join(sql_parts)
-        return self.execute(final, bind_params).df()
+        return " ".join(sql_parts), bind_params
+
+    def select_pages(
+        self,
+        order_by: Union[str, List[str]],
+        page_size: int = 10_000,
+        columns: Union[str, List[str]] = "*",
+        where: Optional[str] = None,
+        params: Optional[Sequence[Any]] = None,
+        after: Optional[Sequence[Any]] = None,
+    ) -> Iterator[pd.DataFrame]:
+        """Iterate over the dataset in pages using keyset pagination.
+
+        Instead of LIMIT/OFFSET, each page seeks past the last key of the
+        previous page with `WHERE (k1, k2, ...) > (last values)`, so every
+        page costs about the same regardless of its position. The leading
+        key is also bounded with `k1 >= last` to let DuckDB prune partitions
+        and row groups.
+
+        Args:
+            order_by: Key column(s) defining page order. Together they must
+                uniquely identify a row.
+            page_size: Number of rows per page.
+            columns: Column list or "*" for all columns. Key columns missing
+                from the list are appended.
+            where: Optional WHERE clause string.
+            params: Optional sequence of bind parameters for WHERE.
+            after: Optional key values to resume after (e.g. the keys of the
+                last row of a previously returned page).
+
+        Yields:
+            pd.DataFrame: One page of results, in key order.
+        """
+        keys = [order_by] if isinstance(order_by, str) else list(order_by)
+        if not keys:
+            raise ValueError("select_pages requires at least one key column.")
+        if columns != "*":
+            columns = [columns] if isinstance(columns, str) else list(columns)
+            columns = columns + [k for k in keys if k not in columns]
+            col_sql = ", ".join(columns)
+        else:
+            col_sql = "*"
+        key_idents = [DuckTable._quote_ident(k) for k in keys]
+        view_ident = DuckTable._quote_ident(self.view_name)
+        order_sql = ", ".join(key_idents)
+        where = self._prune_where(where, params)
+
+        last = list(after) if after is not None else None
+        while True:
+            filters: List[str] = [f"({where})"] if where else []
+            bind_params = list(params or [])
+            if last is not None:
+                filters.append(f"{key_idents[0]} >= ?")
+                bind_params.append(last[0])
+                disjuncts = []
+                for i, ident in enumerate(key_idents):
+                    terms = [f"{k} = ?" for k in key_idents[:i]] + [f"{ident} > ?"]
+                    disjuncts.append("(" + " AND ".join(terms) + ")")
+                    bind_params.extend(last[: i + 1])
+                filters.append("(" + " OR ".join(disjuncts) + ")")
+            sql = f"SELECT {col_sql} FROM {view_ident}"
+            if filters:
+                sql += " WHERE " + " AND ".join(filters)
+            sql += f" ORDER BY {order_sql} LIMIT {int(page_size)}"
+            page = self._fetch_df(sql, bind_params)
+            if page.empty:
+                return
+            yield page
+            if len(page) < page_size:
+                return
+            last = [page[k].iloc[-1] for k in keys]
+            last = [v.item() if hasattr(v, "item") else v for v in last]
+
+    def _sample_sql(
+        self,
+        columns: Union[str, List[str]] = "*",
+        n: Optional[int] = None,
+        fraction: Optional[float] = None,
+        method: str = "system",
+        seed: Optional[int] = None,
+        where: Optional[str] = None,
+        params: Optional[Sequence[Any]] = None,
+        files: Optional[Union[int, float]] = None,
+    ) -> str:
+        """Build the SELECT statement used by sample() and describe()."""
+        if n is not None and fraction is not None:
+            raise ValueError("Pass either n or fraction, not both.")
+        if method not in ("system", "bernoulli", "reservoir"):
+            raise ValueError("method must be 'system', 'bernoulli' or 'reservoir'")
+
+        source = DuckTable._quote_ident(self.view_name)
+        all_files = self._parquet_files() if files is not None else []
+        if all_files:
+            k = int(files) if files >= 1 else int(round(len(all_files) * files))
+            k = min(max(k, 1), len(all_files))
+            picked = sorted(random.Random(seed).sample(all_files, k))
+            file_list = ", ".join(DuckTable._quote_literal(str(f)) for f in picked)
+            source = f"parquet_scan([{file_list}], HIVE_PARTITIONING=1)"
+
+        col_sql = columns if isinstance(columns, str) else ", ".join(columns)
+        sql = f"SELECT {col_sql} FROM {source}"
+        if where:
+            # USING SAMPLE binds to the FROM clause, so sample the filtered
+            # rows rather than filtering a sample of the whole table.
+            sql = f"SELECT * FROM ({sql} WHERE {self._prune_where(where, params)})"
+        if n is not None:
+            sql += f" USING SAMPLE reservoir({int(n)} ROWS)"
+            if seed is not None:
+                sql += f" REPEATABLE ({int(seed)})"
+        elif fraction is not None:
+            opts = method if seed is None else f"{method}, {int(seed)}"
+            sql += f" USING SAMPLE {float(fraction) * 100} PERCENT ({opts})"
+        return sql
+
+    def sample(
+        self,
+        n: Optional[int] = None,
+        fraction: Optional[float] = None,
+        method: str = "system",
+        seed: Optional[int] = None,
+        columns: Union[str, List[str]] = "*",
+        where: Optional[str] = None,
+        params: Optional[Sequence[Any]] = None,
+        files: Optional[Union[int, float]] = None,
+    ) -> pd.DataFrame:
+        """Return a random sample of the dataset.
+
+        Sampling is pushed into DuckDB with USING SAMPLE. With `files`, only a
+        random subset of the parquet files is opened at all, which keeps
+        peeks at very large tables cheap.
+
+        Args:
+            n: Number of rows to sample (always reservoir sampling).
+            fraction: Fraction of rows to sample, between 0 and 1.
+            method: 'system' (vector-level, fastest), 'bernoulli' (row-level)
+                or 'reservoir'. Used with `fraction`.
+            seed: Optional seed for reproducible samples.
+            columns: Column list or "*" for all columns.
+            where: Optional WHERE clause applied before sampling.
+            params: Optional sequence of bind parameters for WHERE.
+            files: Number (>= 1) or fraction (< 1) of parquet files to read.
+                Ignored when the table has no files yet.
+
+        Returns:
+            pd.DataFrame: Sampled rows.
+        """
+        sql = self._sample_sql(columns, n, fraction, method, seed, where, params, files)
+        return self._fetch_df(sql, params)
+
+    def describe(
+        self,
+        n: Optional[int] = None,
+        fraction: Optional[float] = None,
+        method: str = "system",
+        seed: Optional[int] = None,
+        columns: Union[str, List[str]] = "*",
+        where: Optional[str] = None,
+        params: Optional[Sequence[Any]] = None,
+        files: Optional[Union[int, float]] = None,
+    ) -> pd.DataFrame:
+        """Summary statistics per column, optionally approximated on a sample.
+
+        Without sampling arguments this runs DuckDB SUMMARIZE over the whole
+        dataset; with `n`, `fraction` or `files` the statistics are computed on
+        the corresponding sample (see sample()).
+
+        Returns:
+            pd.DataFrame: One row per column with min, max, approx_unique,
+                avg, std, quartiles, count and null_percentage.
+        """
+        sql = self._sample_sql(columns, n, fraction, method, seed, where, params, files)
+        return self._fetch_df(f"SUMMARIZE {sql}", params)
 
     def dpivot(
         self,
@@ -486,10 +2427,14 @@ class DuckTable:
             aggfunc: Aggregation function to use (default 'first').
             where: Optional WHERE clause to filter before pivoting.
             on_in: Optional list of values to include in IN clause for columns.
+                If omitted, the distinct values are discovered once and cached
+                until the parquet files change, including writes by other
+                processes.
             group_by: Optional GROUP BY columns.
             order_by: Optional ORDER BY columns.
             limit: Optional row limit.
-            fill_value: Value to use for missing cells after pivot.
+            fill_value: Value to use for missing cells, applied in SQL via
+                COALESCE.
 
         Returns:
             pd.DataFrame: Pivoted DataFrame.
@@ -504,19 +2449,31 @@ class DuckTable:
             f"FROM {DuckTable._quote_ident(self.view_name)}"
         )
         if where:
-            sel_sql += f" WHERE {where}"
+            sel_sql += f" WHERE {self._prune_where(where, None)}"
 
         pivot_on = DuckTable._quote_ident(columns)
         if on_in:
             in_vals = []
             for v in on_in:
                 if isinstance(v, str):
-                    in_vals.append(f"'{v}'")
+                    in_vals.append(DuckTable._quote_literal(v))
                 else:
                     in_vals.append(str(v))
+        else:
+            in_vals = [
+                DuckTable._quote_literal(v) for v in self._pivot_domain(columns, where)
+            ]
+        if in_vals:
             pivot_on += f" IN ({', '.join(in_vals)})"
 
         pivot_using = f"{aggfunc}({DuckTable._quote_ident(values)})"
+        if fill_value is not None:
+            fill_sql = (
+                DuckTable._quote_literal(fill_value)
+                if isinstance(fill_value, str)
+                else str(fill_value)
+            )
+            pivot_using = f"COALESCE({pivot_using}, {fill_sql})"
 
         sql_lines = [
             f"PIVOT ({sel_sql})",
@@ -539,10 +2496,7 @@ class DuckTable:
             sql_lines.append(f"LIMIT {int(limit)}")
 
         sql = "\n".join(sql_lines)
-        df = self.execute(sql).df()
-        if fill_value is not None:
-            df = df.fillna(fill_value)
-        return df
+        return self._fetch_df(sql)
 
     def ppivot(
         self,
@@ -603,27 +2557,696 @@ class DuckTable:
             **kwargs,
         )
 
-    def upsert(self, df: pd.DataFrame, keys: list, partition_by: Optional[list] = None) -> None:
-        """Upsert rows from DataFrame according to primary keys, overwrite existing rows."""
-        if df.duplicated(subset=keys).any():
-            raise ValueError("DataFrame contains duplicate rows based on keys.")
-        if not self._parquet_files_exist():
-            self._upsert_no_exist(df, partition_by)
-        else:
-            self._upsert_existing(df, keys, partition_by)
-
-    def compact(
+    @staticmethod
+    def _expand_rolling_spec(
+        spec: Optional[Dict[str, Sequence[Any]]],
+        columns: Optional[Union[str, List[str]]],
+        windows: Optional[Sequence[int]],
+        funcs: Optional[Union[str, List[str]]],
+    ) -> Dict[str, tuple]:
+        """Normalize rolling arguments into {name: (func, column, window)}."""
+        out: Dict[str, tuple] = {}
+        for name, item in (spec or {}).items():
+            func, col, window = item
+            out[name] = (func, col, int(window))
+        if columns is not None:
+            cols = [columns] if isinstance(columns, str) else list(columns)
+            fns = [funcs] if isinstance(funcs, str) else list(funcs or ["mean"])
+            for col in cols:
+                for fn in fns:
+                    for w in windows or []:
+                        out[f"{col}_{fn}_{int(w)}"] = (fn, col, int(w))
+        if not out:
+            raise ValueError("rolling requires a spec or columns/windows/funcs.")
+        for func, _, window in out.values():
+            if func != "zscore" and func not in DuckTable._ROLLING_FUNCS:
+                raise ValueError(f"Unsupported rolling function: {func}")
+            if window < 1:
+                raise ValueError("Rolling windows must be positive.")
+        return out
+
+    def rolling(
+        self,
+        on: str,
+        by: Optional[Union[str, List[str]]] = None,
+        spec: Optional[Dict[str, Sequence[Any]]] = None,
+        columns: Optional[Union[str, List[str]]] = None,
+        windows: Optional[Sequence[int]] = None,
+        funcs: Optional[Union[str, List[str]]] = None,
+        min_periods: Optional[int] = None,
+        where: Optional[str] = None,
+        start: Any = None,
+        keep: Optional[List[str]] = None,
+    ) -> pd.DataFrame:
+        """Compute rolling-window features with DuckDB window functions.
+
+        All features are compiled into a single SELECT with one named window
+        per distinct window length, so the data is scanned once. Windows are
+        row based (the last `window` rows per `by` group ordered by `on`),
+        matching pandas' `groupby().rolling(window)`.
+
+        Args:
+            on: Ordering column (e.g. trade_date).
+            by: Optional grouping column(s) (e.g. symbol).
+            spec: Mapping of output name to (func, column, window), e.g.
+                {"ret_mean_5": ("mean", "ret", 5)}.
+            columns: Alternative to spec: value column(s) to expand.
+            windows: Window lengths combined with columns and funcs.
+            funcs: Function name(s) combined with columns and windows.
+                Supported: mean, std, var, sum, min, max, median, count, zscore.
+            min_periods: Minimum observations for a non-null result. Defaults
+                to the window length.
+            where: Optional WHERE clause applied before windowing.
+            start: If given, only rows with `on >= start` are returned. Input
+                rows are read from far enough back to fill the largest window,
+                assuming all groups share the same `on` calendar.
+            keep: Extra columns to carry through unchanged.
+
+        Returns:
+            pd.DataFrame: `by`, `on`, kept columns and one column per feature.
+        """
+        features = DuckTable._expand_rolling_spec(spec, columns, windows, funcs)
+        by_cols = [by] if isinstance(by, str) else list(by or [])
+        on_ident = DuckTable._quote_ident(on)
+        view_ident = DuckTable._quote_ident(self.view_name)
+
+        filters: List[str] = [f"({self._prune_where(where, None)})"] if where else []
+        params: List[Any] = []
+        if start is not None:
+            max_window = max(w for _, _, w in features.values())
+            lookback_sql = (
+                f"SELECT min(v) FROM (SELECT DISTINCT {on_ident} AS v FROM {view_ident} "
+                f"WHERE {' AND '.join(filters + [f'{on_ident} < ?'])} "
+                f"ORDER BY v DESC LIMIT {max_window - 1})"
+            )
+            lookback = self._cursor().execute(lookback_sql, [start]).fetchone()[0]
+            filters.append(f"{on_ident} >= ?")
+            params.append(start if lookback is None else lookback)
+
+        partition_sql = ", ".join(DuckTable._quote_ident(c) for c in by_cols)
+        window_defs = []
+        for w in sorted({w for _, _, w in features.values()}):
+            clause = f"PARTITION BY {partition_sql} " if by_cols else ""
+            window_defs.append(
+                f"w{w} AS ({clause}ORDER BY {on_ident} "
+                f"ROWS BETWEEN {w - 1} PRECEDING AND CURRENT ROW)"
+            )
+
+        exprs = []
+        for name, (func, col, w) in features.items():
+            col_ident = DuckTable._quote_ident(col)
+            if func == "zscore":
+                expr = (
+                    f"({col_ident} - avg({col_ident}) OVER w{w}) "
+                    f"/ NULLIF(stddev_samp({col_ident}) OVER w{w}, 0)"
+                )
+            else:
+                expr = f"{DuckTable._ROLLING_FUNCS[func]}({col_ident}) OVER w{w}"
+            periods = w if min_periods is None else min(int(min_periods), w)
+            expr = f"CASE WHEN count({col_ident}) OVER w{w} >= {periods} THEN {expr} END"
+            exprs.append(f"{expr} AS {DuckTable._quote_ident(name)}")
+
+        base_cols = [DuckTable._quote_ident(c) for c in by_cols + [on] + list(keep or [])]
+        sql = (
+            f"SELECT {', '.join(base_cols + exprs)} FROM {view_ident}"
+            + (f" WHERE {' AND '.join(filters)}" if filters else "")
+            + f" WINDOW {', '.join(window_defs)}"
+        )
+        if start is not None:
+            sql = f"SELECT * FROM ({sql}) WHERE {on_ident} >= ?"
+            params.append(start)
+        order_sql = ", ".join(DuckTable._quote_ident(c) for c in by_cols + [on])
+        sql += f" ORDER BY {order_sql}"
+        return self._fetch_df(sql, params)
+
+    def upsert(self, df: _FrameLike, keys: list, partition_by: Optional[list] = None) -> None:
+        """Upsert rows according to primary keys, overwriting existing rows.
+
+        Args:
+            df: Rows to upsert: a pandas DataFrame, pyarrow Table or
+                RecordBatchReader, an iterable of record batches, or a polars
+                DataFrame. Arrow and polars data is written without converting
+                it to pandas; key and partition checks run in SQL.
+            keys (list): Primary key column names for deduplication.
+            partition_by (Optional[list]): Partition columns for Hive-style
+                partitioning, or transforms such as month("ts") and
+                bucket(16, "symbol") deriving them on write.
+
+        Peak memory and spill of the write are reported in `last_write`:
+        `operation`, `seconds`, `peak_memory_bytes`, `peak_spill_bytes` and
+        `spilled`. Wrap the call in resource_limits() to cap its memory.
+
+        Raises:
+            ValueError: If df contains duplicate rows based on keys.
+        """
+        with self._operation_cursor(), self._incoming(df) as data:
+            self._upsert(data, keys, partition_by)
+
+    def _upsert(
+        self,
+        df: Union[_FrameLike, str],
+        keys: list,
+        partition_by: Optional[list],
+        operation: str = "upsert",
+    ) -> None:
+        """Lock, stage and commit an upsert of incoming rows."""
+        with self._write_lock, self._write_report(operation):
+            partitions = None
+            if partition_by and self._parquet_files_exist():
+                with self._partitioned(df, partition_by) as (data, names):
+                    partitions = self._affected_partitions(data, names)
+            try:
+                with self._file_locks(partitions):
+                    staged = self._stage_upsert(df, keys, partition_by)
+                    self._commit_staged(staged)
+            finally:
+                self.refresh()
+
+    @staticmethod
+    def _option_sql(value: Any) -> str:
+        """Render a reader option value as a DuckDB literal."""
+        if isinstance(value, bool):
+            return "true" if value else "false"
+        if isinstance(value, (int, float)):
+            return repr(value)
+        if isinstance(value, dict):
+            items = ", ".join(
+                f"{DuckTable._quote_literal(k)}: {DuckTable._option_sql(v)}"
+                for k, v in value.items()
+            )
+            return "{" + items + "}"
+        if isinstance(value, (list, tuple)):
+            return "[" + ", ".join(DuckTable._option_sql(v) for v in value) + "]"
+        return DuckTable._quote_literal(value)
+
+    @staticmethod
+    def _read_files_sql(
+        paths: Union[str, Path, Sequence[Union[str, Path]]],
+        format: Optional[str] = None,
+        read_options: Optional[Dict[str, Any]] = None,
+    ) -> str:
+        """Build the DuckDB table function call reading source files."""
+        if isinstance(paths, (str, Path)):
+            paths = [paths]
+        paths = [str(p) for p in paths]
+        if not paths:
+            raise ValueError("No source files given.")
+        if format is None:
+            formats = set()
+            for p in paths:
+                suffixes = [x.lower() for x in Path(p).suffixes]
+                while suffixes and suffixes[-1] in (".gz", ".zst"):
+                    suffixes.pop()
+                ext = suffixes[-1] if suffixes else ""
+                formats.add(DuckTable._FILE_FORMATS.get(ext))
+            if len(formats) != 1 or None in formats:
+                raise ValueError(
+                    f"Cannot infer a single file format from {paths}; pass format=..."
+                )
+            format = formats.pop()
+        if format not in DuckTable._FILE_READERS:
+            raise ValueError(
+                f"Unsupported format {format!r}; use one of {sorted(DuckTable._FILE_READERS)}"
+            )
+        args = ["[" + ", ".join(DuckTable._quote_literal(p) for p in paths) + "]"]
+        for k, v in (read_options or {}).items():
+            args.append(f"{k} = {DuckTable._option_sql(v)}")
+        return f"{DuckTable._FILE_READERS[format]}({', '.join(args)})"
+
+    def upsert_from_files(
+        self,
+        paths: Union[str, Path, Sequence[Union[str, Path]]],
+        keys: list,
+        partition_by: Optional[list] = None,
+        format: Optional[str] = None,
+        read_options: Optional[Dict[str, Any]] = None,
+    ) -> int:
+        """Upsert rows read from CSV/JSON/Parquet files, without going through pandas.
+
+        The files are loaded by DuckDB's (parallel) readers into a temporary
+        table, which then feeds the same merge/COPY pipeline as upsert().
+
+        Examples:
+            >>> dt.upsert_from_files(
+            ...     "/dumps/quotes_2025-01-*.csv.gz",
+            ...     keys=["symbol", "ts"],
+            ...     partition_by=["trade_date"],
+            ...     read_options={"timestampformat": "%Y-%m-%d %H:%M:%S"},
+            ... )
+
+        Args:
+            paths: File path, glob pattern, or list of them.
+            keys (list): Primary key column names for deduplication.
+            partition_by (Optional[list]): Partition columns for Hive-style
+                partitioning, or transforms such as month("ts") and
+                bucket(16, "symbol") deriving them on write.
+            format (Optional[str]): 'csv', 'json' or 'parquet'. Inferred from
+                the file extensions if None.
+            read_options (Optional[Dict[str, Any]]): Extra named parameters of
+                the DuckDB reader, e.g. {"delim": "|", "header": True} for
+                read_csv_auto.
+
+        Returns:
+            int: Number of rows ingested.
+
+        Raises:
+            ValueError: If the format cannot be determined or the files
+                contain duplicate rows based on keys.
+        """
+        reader_sql = self._read_files_sql(paths, format, read_options)
+        with self._operation_cursor(), self._temp_table(f"SELECT * FROM {reader_sql}") as name:
+            rows = self._cursor().execute(f"SELECT COUNT(*) FROM {name}").fetchone()[0]
+            if rows:
+                self._upsert(name, keys, partition_by, operation="upsert_from_files")
+        return int(rows)
+
+    def append(self, df: _FrameLike, partition_by: Optional[list] = None) -> None:
+        """Append rows as new parquet files, without deduplication.
+
+        Unlike upsert, existing data is neither read nor rewritten, which makes
+        append the cheap path for insert-only data.
+
+        Args:
+            df: Rows to append, in any form accepted by upsert(). Columns must
+                match the table.
+            partition_by (Optional[list]): Partition columns for Hive-style
+                partitioning, or transforms such as month("ts") and
+                bucket(16, "symbol") deriving them on write.
+        """
+        with self._write_lock, self._write_report("append"), self._operation_cursor(), \
+                self._incoming(df) as data:
+            try:
+                # New uniquely named files only: no partition locks needed.
+                with self._file_locks([]):
+                    staged = self._stage_append(data, partition_by)
+                    self._commit_staged(staged)
+            finally:
+                self.refresh()
+
+    def writer(
+        self,
+        keys: Optional[List[str]] = None,
+        partition_by: Optional[List[str]] = None,
+        flush_rows: Optional[int] = 100_000,
+        flush_interval: Optional[float] = 5.0,
+    ) -> "DuckWriter":
+        """Create a write buffer for high-frequency small batches.
+
+        Batches written to the buffer are merged in memory and written to the
+        table in one upsert (or append, without keys) per flush, instead of
+        one partition rewrite per batch.
+
+        Examples:
+            >>> with dt.writer(keys=["symbol", "ts"], partition_by=["trade_date"]) as w:
+            ...     for batch in feed:
+            ...         w.write(batch)
+
+        Args:
+            keys: Primary key columns; the last buffered row per key wins.
+                If None, rows are appended without deduplication.
+            partition_by: Partition columns for Hive-style partitioning.
+            flush_rows: Flush once this many rows are buffered; None disables
+                the row threshold.
+            flush_interval: Flush every this many seconds in a background
+                thread; None disables periodic flushes.
+
+        Returns:
+            DuckWriter: The buffer, to be closed (or used as a context
+                manager) to flush the remaining rows.
+        """
+        return DuckWriter(
+            self,
+            keys=keys,
+            partition_by=partition_by,
+            flush_rows=flush_rows,
+            flush_interval=flush_interval,
+        )
+
+    def profiler(self) -> ContextManager["DuckProfile"]:
+        """Profile the calls made inside a block.
+
+        Phases of every operation on this table's database (from any
+        thread) are recorded together with DuckDB's JSON profile of each
+        query and COPY statement; see DuckProfile.
+
+        Examples:
+            >>> with dt.profiler() as prof:
+            ...     df = dt.select(where="ds = '2025-01-01'")
+            >>> prof.summary()
+
+        Returns:
+            A context manager yielding the DuckProfile being filled.
+        """
+        return DuckProfile._observe(self.con)
+
+    @contextmanager
+    def resource_limits(
+        self,
+        memory_limit: Optional[Union[str, int]] = None,
+        max_temp_directory_size: Optional[Union[str, int]] = None,
+        threads: Optional[int] = None,
+    ) -> Iterator["DuckTable"]:
+        """Override memory, spill and thread limits for the operations in a block.
+
+        Examples:
+            >>> with dt.resource_limits(memory_limit="2GB", threads=0):
+            ...     dt.upsert(big_df, keys=["id"], partition_by=["ds"])
+            >>> dt.last_write["spilled"]
+
+        Args:
+            memory_limit: DuckDB memory limit inside the block, e.g. '2GB'
+                (ints are bytes). Larger operations spill to disk.
+            max_temp_directory_size: Cap on spilled data inside the block.
+            threads: DuckDB threads inside the block; 0 uses all CPUs
+                available to the process.
+
+        Notes:
+            DuckDB applies these settings to the whole database, so queries
+            running concurrently on the same database see them too; scopes
+            are serialized. temp_directory cannot change once DuckDB has
+            spilled and is only set when opening the table. To cap
+            compaction alone, use compact(memory_limit=...).
+        """
+        settings = self._resource_settings(
+            memory_limit=memory_limit,
+            max_temp_directory_size=max_temp_directory_size,
+            threads=threads,
+        )
+        base = {**self.resources, "threads": str(self.threads)}
+        with self._resource_scope(self._cursor(), settings, base):
+            yield self
+
+    def stats(self, small_file_size: int = 32 * 1024**2) -> Dict[str, Any]:
+        """Collect table statistics from parquet footers, without reading data.
+
+        Row counts and column min/max come from `parquet_metadata`, byte sizes
+        from the file system. The result is cached until the next refresh().
+
+        Args:
+            small_file_size (int): Files below this many bytes are counted as
+                small files.
+
+        Returns:
+            Dict[str, Any]: A dictionary with keys:
+                - version: table version the statistics belong to.
+                - num_files, num_rows, num_bytes, num_small_files: totals.
+                - files: DataFrame with one row per file (file, partition,
+                  num_rows, num_row_groups, num_bytes).
+                - partitions: DataFrame with one row per partition directory
+                  (partition, num_files, num_rows, num_bytes, num_small_files).
+                - columns: DataFrame with per-column min, max and null_count.
+        """
+        key = ("stats", int(small_file_size))
+        if key in self._cache:
+            return self._cache[key]
+
+        files = self._parquet_files()
+        file_df = pd.DataFrame(
+            {
+                "file": [str(f) for f in files],
+                "partition": [self._partition_of(f) for f in files],
+                "num_bytes": [f.stat().st_size for f in files],
+            }
+        )
+        col_df = pd.DataFrame(columns=["column", "min", "max", "null_count"])
+        if files:
+            file_list = ", ".join(DuckTable._quote_literal(str(f)) for f in files)
+            meta = self._cursor().execute(
+                "SELECT file_name, row_group_id, row_group_num_rows, path_in_schema, "
+                "stats_min_value, stats_max_value, stats_null_count "
+                f"FROM parquet_metadata([{file_list}])"
+            ).df()
+            row_groups = meta.drop_duplicates(["file_name", "row_group_id"])
+            per_file = row_groups.groupby("file_name").agg(
+                num_rows=("row_group_num_rows", "sum"),
+                num_row_groups=("row_group_id", "count"),
+            )
+            file_df = file_df.join(per_file, on="file")
+
+            # Aggregate min/max with the column's real type, not as strings.
+            meta_name = f"meta_{uuid.uuid4().hex[:8]}"
+            self._cursor().register(meta_name, meta)
+            try:
+                parts = []
+                for name, dtype in self._cursor().execute(
+                    f"SELECT column_name, column_type FROM (DESCRIBE "
+                    f"{DuckTable._quote_ident(self.view_name)})"
+                ).fetchall():
+                    parts.append(
+                        f"SELECT {DuckTable._quote_literal(name)} AS column, "
+                        f"CAST(min(TRY_CAST(stats_min_value AS {dtype})) AS VARCHAR) AS min, "
+                        f"CAST(max(TRY_CAST(stats_max_value AS {dtype})) AS VARCHAR) AS max, "
+                        f"sum(stats_null_count) AS null_count "
+                        f"FROM {meta_name} WHERE path_in_schema = {DuckTable._quote_literal(name)} "
+                        "HAVING count(*) > 0"
+                    )
+                col_df = self._cursor().execute(" UNION ALL ".join(parts)).df()
+            finally:
+                self._cursor().unregister(meta_name)
+        else:
+            file_df["num_rows"] = pd.Series(dtype="int64")
+            file_df["num_row_groups"] = pd.Series(dtype="int64")
+
+        file_df["small"] = file_df["num_bytes"] < small_file_size
+        part_df = (
+            file_df.groupby("partition")
+            .agg(
+                num_files=("file", "count"),
+                num_rows=("num_rows", "sum"),
+                num_bytes=("num_bytes", "sum"),
+                num_small_files=("small", "sum"),
+            )
+            .reset_index()
+        )
+        result = {
+            "version": self._version,
+            "num_files": len(file_df),
+            "num_rows": int(file_df["num_rows"].sum()),
+            "num_bytes": int(file_df["num_bytes"].sum()),
+            "num_small_files": int(file_df["small"].sum()),
+            "files": file_df.drop(columns="small"),
+            "partitions": part_df,
+            "columns": col_df,
+        }
+        self._cache[key] = result
+        return result
+
+    def plan_compaction(
+        self,
+        target_file_size: int = 128 * 1024**2,
+        small_file_size: Optional[int] = None,
+        min_files: int = 2,
+    ) -> List[Dict[str, Any]]:
+        """Plan which small files to merge, without touching any data.
+
+        Files at or above `small_file_size` are considered well sized and left
+        alone. In each partition directory the remaining small files are
+        bin-packed (first-fit decreasing) into groups of at most
+        `target_file_size` bytes; every group of two or more files becomes one
+        output file.
+
+        Args:
+            target_file_size (int): Desired size in bytes of compacted files.
+            small_file_size (Optional[int]): Files below this size are
+                candidates. Defaults to half of `target_file_size`.
+            min_files (int): Minimum number of small files a partition must
+                hold before it is compacted.
+
+        Returns:
+            List[Dict[str, Any]]: One entry per partition to compact, with keys
+                `partition` (relative path), `bins` (lists of file paths to
+                merge), `num_files` and `num_bytes` (files/bytes to rewrite).
+        """
+        if small_file_size is None:
+            small_file_size = target_file_size // 2
+
+        plan: List[Dict[str, Any]] = []
+        for part_dir in sorted(p for p in self.root_path.rglob("*") if p.is_dir()):
+            if any(p.is_dir() for p in part_dir.iterdir()):
+                # Only leaf partitions are swapped as a whole by compaction.
+                continue
+            sizes = {
+                f: f.stat().st_size
+                for f in part_dir.glob("*.parquet")
+                if f.stat().st_size < small_file_size
+            }
+            if len(sizes) < max(2, int(min_files)):
+                continue
+            bins: List[List[Path]] = []
+            loads: List[int] = []
+            for f in sorted(sizes, key=lambda x: sizes[x], reverse=True):
+                for i, load in enumerate(loads):
+                    if load + sizes[f] <= target_file_size:
+                        bins[i].append(f)
+                        loads[i] += sizes[f]
+                        break
+                else:
+                    bins.append([f])
+                    loads.append(sizes[f])
+            bins = [sorted(b) for b in bins if len(b) > 1]
+            if not bins:
+                continue
+            plan.append(
+                {
+                    "partition": part_dir.relative_to(self.root_path).as_posix(),
+                    "bins": bins,
+                    "num_files": sum(len(b) for b in bins),
+                    "num_bytes": sum(sizes[f] for b in bins for f in b),
+                }
+            )
+        return plan
+
+    def _compact_partition(
+        self,
+        entry: Dict[str, Any],
+        compression: str = "zstd",
+        engine: str = "pyarrow",
+        lock_timeout: Optional[float] = -1,
+        memory_limit: Optional[Union[str, int]] = None,
+    ) -> str:
+        """Rewrite the bins of one compaction plan entry.
+
+        Each bin is merged into a new file written outside the table tree,
+        then the partition is swapped for a staged copy holding the merged
+        files instead of their sources, so readers never see rows twice and
+        a crash never loses them. The swap is two renames, so a concurrent
+        reader may briefly find the partition missing. The partition's write
+        lock is held meanwhile (waiting up to `lock_timeout`, defaulting to
+        the table's). With `memory_limit`, the duckdb engine runs on a private
+        DuckDB instance capped at that limit.
+        """
+        part_dir = self.root_path / entry["partition"]
+        partition = self._normalize_partition(entry["partition"])
+        # The staging directory only exists while the lock is held, so a
+        # vacuum() in another process never takes it for an orphan.
+        with self._file_locks([partition], timeout=lock_timeout):
+            tmpdir = self._staging_dir("__compact_")
+            con = None
+            try:
+                if engine == "duckdb":
+                    con = self._compaction_connection(tmpdir, memory_limit)
+                self._compact_bins(part_dir, entry["bins"], tmpdir, con, compression, engine)
+            finally:
+                if con is not None:
+                    con.close()
+                if tmpdir.exists():
+                    shutil.rmtree(tmpdir, ignore_errors=True)
+        return entry["partition"]
+
+    def _compaction_connection(
+        self, tmpdir: Path, memory_limit: Optional[Union[str, int]]
+    ) -> duckdb.DuckDBPyConnection:
+        """Connection rewriting files for compaction and repartition().
+
+        These only read and write parquet files, so a memory cap is
+        enforced on a private in-memory DuckDB instance (spilling inside the
+        staging directory) without lowering the limit of the shared database.
+        """
+        if memory_limit is None:
+            return self.con.cursor()
+        settings = self._resource_settings(memory_limit=memory_limit)
+        max_temp = self.con.execute(
+            "SELECT current_setting('max_temp_directory_size')"
+        ).fetchone()[0]
+        config = {
+            "threads": self.threads,
+            "temp_directory": str(tmpdir / "spill"),
+            "max_temp_directory_size": max_temp,
+            **settings,
+        }
+        return duckdb.connect(config=config)
+
+    def _compact_bins(
+        self,
+        part_dir: Path,
+        bins: List[List[Path]],
+        tmpdir: Path,
+        con: Optional[duckdb.DuckDBPyConnection],
+        compression: str,
+        engine: str,
+    ) -> None:
+        """Merge each bin of files into one new file and swap in part_dir.
+
+        The new partition is assembled in tmpdir from the merged files and
+        hard links to the files left alone, then replaces part_dir with
+        _atomic_replace_dir(), as upserts replace the partitions they touch.
+        """
+        merged: List[Path] = []
+        written: List[Path] = []
+        for files in bins:
+            if not all(Path(f).exists() for f in files):
+                # A concurrent writer replaced the partition since planning.
+                continue
+            out_path = tmpdir / f"data_{uuid.uuid4().hex[:8]}.parquet"
+            if engine == "duckdb":
+                file_list = ", ".join(DuckTable._quote_literal(str(f)) for f in files)
+                self._execute_write(
+                    f"COPY (SELECT * FROM read_parquet([{file_list}], "
+                    "hive_partitioning=false, union_by_name=true)) "
+                    f"TO '{out_path}' (FORMAT 'parquet', COMPRESSION '{compression}')",
+                    con=con,
+                )
+            else:
+                with _phase(self.con, "rewrite", table=self.view_name, engine=engine):
+                    dfs = [pd.read_parquet(f, engine=engine) for f in files]
+                    df = pd.concat(dfs, ignore_index=True)
+                    df.to_parquet(
+                        out_path, engine=engine, compression=compression, index=False
+                    )
+                self._write_log.append({"rows_written": len(df)})
+            merged.extend(Path(f) for f in files)
+            written.append(out_path)
+        if not written:
+            return
+
+        with _phase(self.con, "commit", table=self.view_name):
+            self._record_files(written, merged)
+            staged = tmpdir / "partition"
+            staged.mkdir()
+            for f in written:
+                f.replace(staged / f.name)
+            skip = {f.name for f in merged}
+            for f in part_dir.iterdir():
+                if f.name in skip or not f.is_file():
+                    continue
+                try:
+                    os.link(f, staged / f.name)
+                except OSError:
+                    shutil.copy2(f, staged / f.name)
+            self._atomic_replace_dir(staged, part_dir)
+
+    def compact(
         self,
         compression: str = "zstd",
         max_workers: int = 8,
         engine: str = "pyarrow",
+        target_file_size: int = 128 * 1024**2,
+        small_file_size: Optional[int] = None,
+        min_files: int = 2,
+        dry_run: bool = False,
+        memory_limit: Optional[Union[str, int]] = None,
     ) -> List[str]:
-        """Compact partition directories with multiple parquet files into single parquet files.
+        """Merge small parquet files inside partition directories.
+
+        Targets are chosen by plan_compaction(): only files smaller than
+        `small_file_size` are rewritten, bin-packed toward `target_file_size`,
+        so partitions made of a few large files are left untouched.
 
         Args:
             compression (str): Compression codec to use ('zstd', 'snappy', 'gzip', etc.).
             max_workers (int): Maximum number of parallel workers for compaction.
-            engine (str): Parquet engine to use ('pyarrow' or 'fastparquet').
+            engine (str): Engine used to rewrite files ('pyarrow', 'fastparquet'
+                or 'duckdb').
+            target_file_size (int): Desired size in bytes of compacted files.
+            small_file_size (Optional[int]): Files below this size are
+                candidates. Defaults to half of `target_file_size`.
+            min_files (int): Minimum number of small files per partition.
+            dry_run (bool): If True, only return the partitions that would be
+                compacted. Use plan_compaction() for byte estimates.
+            memory_limit (Optional[Union[str, int]]): Memory cap of the duckdb
+                engine, e.g. '1GB', enforced on a private DuckDB instance so
+                it does not lower the limit of interactive queries. Peak
+                memory and spill are reported in `last_write`.
 
         Returns:
             List[str]: List of relative partition paths that were compacted.
@@ -631,54 +3254,353 @@ class DuckTable:
         if not self.root_path.exists():
             return []
 
-        targets: List[Path] = []
-        for part_dir in (p for p in self.root_path.rglob("*") if p.is_dir()):
-            if len(list(part_dir.glob("*.parquet"))) > 1:
-                targets.append(part_dir)
-
-        max_workers = min(int(max_workers), max(1, len(targets)))
+        with self._write_lock:
+            plan = self.plan_compaction(
+                target_file_size=target_file_size,
+                small_file_size=small_file_size,
+                min_files=min_files,
+            )
+            if dry_run or not plan:
+                return [entry["partition"] for entry in plan]
+
+            max_workers = min(int(max_workers), max(1, len(plan)))
+
+            compacted: List[str] = []
+            errors: List[Exception] = []
+            report = self._write_report("compact")
+            with report, ThreadPoolExecutor(max_workers=max_workers) as ex:
+                futs = [
+                    ex.submit(
+                        self._compact_partition,
+                        entry,
+                        compression,
+                        engine,
+                        memory_limit=memory_limit,
+                    )
+                    for entry in plan
+                ]
+                for fut in as_completed(futs):
+                    try:
+                        compacted.append(fut.result())
+                    except Exception as e:
+                        errors.append(e)
+
+            if errors:
+                raise RuntimeError(
+                    f"compact failed for {len(errors)} partitions"
+                ) from errors[0]
 
-        def _compact_one(part_dir: Path) -> str:
-            parquet_files = sorted(part_dir.glob("*.parquet"))
-            if len(parquet_files) <= 1:
-                return str(part_dir.relative_to(self.root_path))
+            self.refresh()
+            return compacted
 
-            tmpdir = self._local_tempdir(part_dir.parent, prefix="__compact_")
-            try:
-                dfs = [pd.read_parquet(p, engine=engine) for p in parquet_files]
-                df = pd.concat(dfs, ignore_index=True)
+    def _matching_partitions(
+        self, where: str, params: Optional[Sequence[Any]] = None
+    ) -> List[str]:
+        """Leaf partitions whose partition values satisfy `where`.
 
-                out_path = tmpdir / "data_0.parquet"
-                df.to_parquet(
-                    out_path, engine=engine, compression=compression, index=False
+        The predicate is evaluated on one row per partition directory holding
+        the typed partition values, so no parquet file is read.
+        """
+        rels = sorted({self._partition_of(f) for f in self._parquet_files()})
+        if not rels:
+            return []
+        if "" in rels:
+            raise ValueError(f"{self.root_path} holds unpartitioned parquet files")
+        columns = [seg.split("=", 1)[0] for seg in rels[0].split("/")]
+        if any([seg.split("=", 1)[0] for seg in rel.split("/")] != columns for rel in rels):
+            raise ValueError(f"{self.root_path} has inconsistent partition directories")
+
+        cur = self._cursor()
+        types = {
+            r[0]: r[1]
+            for r in cur.execute(f"DESCRIBE SELECT * FROM {self._scan_sql()}").fetchall()
+        }
+        rows = []
+        for rel in rels:
+            values = [DuckTable._quote_literal(rel)]
+            for seg, col in zip(rel.split("/"), columns):
+                val = unquote(seg.split("=", 1)[1])
+                literal = (
+                    "NULL"
+                    if val in ("NULL", "__HIVE_DEFAULT_PARTITION__")
+                    else DuckTable._quote_literal(val)
                 )
+                values.append(f"CAST({literal} AS {types.get(col, 'VARCHAR')})")
+            rows.append(f"({', '.join(values)})")
+        names = ", ".join(DuckTable._quote_ident(c) for c in ["__partition"] + columns)
+        sql = (
+            f"SELECT __partition FROM (VALUES {', '.join(rows)}) AS p({names}) "
+            f"WHERE {where}"
+        )
+        try:
+            return [r[0] for r in cur.execute(sql, params).fetchall()]
+        except duckdb.BinderException as e:
+            raise ValueError(
+                f"where may only reference the partition columns {columns}: {e}"
+            ) from e
 
-                new_part = tmpdir / "newpart"
-                new_part.mkdir(parents=True, exist_ok=True)
-                shutil.move(str(out_path), str(new_part / "data_0.parquet"))
-                self._atomic_replace_dir(new_part, part_dir)
-                return str(part_dir.relative_to(self.root_path))
-            finally:
-                if tmpdir.exists():
-                    shutil.rmtree(tmpdir, ignore_errors=True)
+    def drop_partitions(
+        self,
+        where: str,
+        params: Optional[Sequence[Any]] = None,
+        dry_run: bool = False,
+    ) -> List[str]:
+        """Delete whole partition directories matching a predicate.
 
-        compacted: List[str] = []
-        errors: List[Exception] = []
-        with ThreadPoolExecutor(max_workers=max_workers) as ex:
-            futs = [ex.submit(_compact_one, p) for p in targets]
-            for fut in as_completed(futs):
+        Expiring data this way is a metadata operation: the matching
+        directories are moved out of the table tree (so each partition
+        disappears atomically for readers) and deleted, without reading or
+        rewriting any parquet file. The view is refreshed once afterwards.
+
+        Examples:
+            >>> dt.drop_partitions("trade_date < current_date - INTERVAL 2 YEAR")
+            ['trade_date=2023-01-03', 'trade_date=2023-01-04', ...]
+
+        Args:
+            where (str): SQL predicate over the partition columns only, e.g.
+                "trade_date < ?". Other columns are rejected.
+            params (Optional[Sequence[Any]]): Bind parameters for `where`.
+            dry_run (bool): If True, only return the partitions that would be
+                dropped.
+
+        Returns:
+            List[str]: Relative paths of the dropped partition directories.
+
+        Raises:
+            ValueError: If the table is not partitioned or `where` references
+                non-partition columns.
+        """
+        with self._write_lock:
+            partitions = self._matching_partitions(where, params)
+            if dry_run or not partitions:
+                return partitions
+            with self._write_report("drop_partitions"):
+                locks = [self._normalize_partition(p) for p in partitions]
+                tmpdir = None
                 try:
-                    compacted.append(fut.result())
-                except Exception as e:
-                    errors.append(e)
+                    with self._file_locks(locks):
+                        tmpdir = self._staging_dir()
+                        if _hooks:
+                            self._record_files(
+                                [],
+                                [
+                                    f
+                                    for p in partitions
+                                    for f in (self.root_path / p).glob("*.parquet")
+                                ],
+                            )
+                        for i, rel in enumerate(partitions):
+                            part_dir = self.root_path / rel
+                            if part_dir.exists():
+                                part_dir.replace(tmpdir / str(i))
+                            # Remove parent directories left empty.
+                            parent = part_dir.parent
+                            while (
+                                parent != self.root_path
+                                and parent.exists()
+                                and not any(parent.iterdir())
+                            ):
+                                parent.rmdir()
+                                parent = parent.parent
+                finally:
+                    if tmpdir is not None:
+                        shutil.rmtree(tmpdir, ignore_errors=True)
+                    self.refresh()
+            return partitions
+
+    def repartition(
+        self,
+        partition_by: Optional[List[str]] = None,
+        derive: Optional[Dict[str, str]] = None,
+        order_by: Optional[Union[str, List[str]]] = None,
+        compression: str = "zstd",
+        memory_limit: Optional[Union[str, int]] = None,
+    ) -> List[str]:
+        """Rewrite the whole table under a new partition scheme.
 
-        if errors:
-            raise RuntimeError(
-                f"compact failed for {len(errors)} partitions"
-            ) from errors[0]
+        The table is streamed by a single COPY into the new layout, written
+        by DuckDB's parallel writers into a staging directory next to the
+        table, and the table directory is then swapped for it atomically, so
+        readers see either the old or the new layout, never a mix. The table
+        lock is held exclusively meanwhile.
 
-        self.refresh()
-        return compacted
+        Examples:
+            >>> dt.repartition(["trade_date"])  # was partitioned by symbol
+            >>> dt.repartition(
+            ...     ["month"], derive={"month": "strftime(trade_date, '%Y-%m')"}
+            ... )  # daily -> monthly partitions
+            >>> dt.repartition([month("ts"), bucket(16, "symbol")])
+
+        Args:
+            partition_by (Optional[List[str]]): New partition columns or
+                transforms (see month()); None or [] writes an unpartitioned
+                table. Pass the same columns to later upserts and appends.
+            derive (Optional[Dict[str, str]]): New columns to add, as name ->
+                SQL expression over the existing columns, e.g. to partition
+                by a coarser period.
+            order_by (Optional[Union[str, List[str]]]): Sort rows before
+                writing, e.g. by the key columns, for better pruning within
+                partitions. Sorting spills to disk past the memory limit.
+            compression (str): Compression codec of the new files.
+            memory_limit (Optional[Union[str, int]]): Memory cap of the
+                rewrite, e.g. '2GB', enforced on a private DuckDB instance
+                as in compact(). Peak memory and spill are reported in
+                `last_write`.
+
+        Returns:
+            List[str]: Relative paths of the new partition directories.
+
+        Raises:
+            ValueError: If a partition column does not exist.
+        """
+        transforms = [p for p in partition_by or [] if isinstance(p, PartitionTransform)]
+        partition_by = [
+            p.name if isinstance(p, PartitionTransform) else p for p in partition_by or []
+        ]
+        derive = dict(derive or {})
+        derive.update({t.name: t.sql() for t in transforms})
+        with self._write_lock, self._operation_cursor():
+            if not self._parquet_files_exist():
+                return []
+            scan = self._scan_sql()
+            columns = [
+                r[0]
+                for r in self._cursor().execute(f"DESCRIBE SELECT * FROM {scan}").fetchall()
+            ]
+            missing = [c for c in partition_by if c not in columns and c not in derive]
+            missing += [t.source for t in transforms if t.source not in columns]
+            if missing:
+                raise ValueError(f"Unknown partition columns: {missing}")
+
+            # Drop the derived columns of the old layout and recompute any
+            # column derived again.
+            old = {t.name for t in self._partition_transforms()} - set(partition_by)
+            stale = [c for c in columns if c in old or c in derive]
+            exclude = (
+                f" EXCLUDE ({', '.join(DuckTable._quote_ident(c) for c in stale)})"
+                if stale
+                else ""
+            )
+            exprs = "".join(
+                f", {expr} AS {DuckTable._quote_ident(name)}" for name, expr in derive.items()
+            )
+            select_sql = f"SELECT *{exclude}{exprs} FROM {scan}"
+            if order_by:
+                order = order_by if isinstance(order_by, str) else ", ".join(order_by)
+                select_sql += f" ORDER BY {order}"
+
+            with self._write_report("repartition"), self._file_locks(None):
+                tmpdir = self._staging_dir()
+                con = self._compaction_connection(tmpdir, memory_limit)
+                try:
+                    target = tmpdir / "data"
+                    if partition_by:
+                        cols = ", ".join(DuckTable._quote_ident(c) for c in partition_by)
+                        opts = f"PARTITION_BY ({cols})"
+                    else:
+                        target.mkdir()
+                        target = target / "data_0.parquet"
+                        opts = ""
+                    sql = (
+                        f"COPY ({select_sql}) TO {DuckTable._quote_literal(str(target))} "
+                        f"(FORMAT 'parquet', COMPRESSION '{compression}'"
+                        f"{', ' + opts if opts else ''})"
+                    )
+                    self._execute_write(sql, con=con)
+                    self._commit_staged(
+                        {"kind": "create", "tmpdir": tmpdir / "data", "layout": transforms}
+                    )
+                finally:
+                    con.close()
+                    shutil.rmtree(tmpdir, ignore_errors=True)
+                    self.refresh()
+            return sorted(
+                {self._partition_of(f) for f in self._parquet_files()} - {""}
+            )
+
+    def vacuum(self, older_than: float = 3600.0) -> List[str]:
+        """Remove staging directories left behind by interrupted writes.
+
+        When the table's exclusive write lock can be taken without waiting
+        (i.e. no writer is active in any process), staging directories inside
+        the table tree are removed (current writers stage outside the tree,
+        and such leftovers would otherwise be matched by the view's
+        ``**/*.parquet`` glob), and this table's own staging directories next
+        to it are cleaned up, rolling back interrupted directory swaps
+        (``__parquet_trash_*``) whose original location is missing. Staging
+        directories of unknown owners are only removed once older than
+        `older_than` seconds. If the lock file cannot be created, e.g. on a
+        read-only dataset, nothing is touched.
+
+        Args:
+            older_than (float): Minimum age in seconds of a staging directory
+                of unknown owner before it is considered orphaned.
+
+        Returns:
+            List[str]: Paths of the removed (or restored) directories.
+        """
+        started = time.perf_counter()
+        removed: List[str] = []
+        with ExitStack() as stack:
+            try:
+                stack.enter_context(self._file_locks(None, timeout=0))
+            except TimeoutError:
+                # A writer is active; only touch directories of unknown owners.
+                removed.extend(self._vacuum_unlocked(older_than, owned=False))
+            except OSError:
+                # The lock file cannot be created, e.g. on a read-only
+                # dataset, which no interrupted write can have touched.
+                return removed
+            else:
+                with self._write_lock:
+                    removed.extend(self._vacuum_unlocked(older_than))
+        if removed:
+            self.refresh()
+        if _hooks:
+            event = {
+                "operation": "vacuum",
+                "seconds": time.perf_counter() - started,
+                "removed": len(removed),
+            }
+            _emit(event, self.view_name, None)
+        return removed
+
+    def _vacuum_unlocked(self, older_than: float, owned: bool = True) -> List[str]:
+        """Vacuum pass; `owned` requires holding the exclusive table lock."""
+        cutoff = time.time() - older_than
+        removed: List[str] = []
+        if owned:
+            inside = [
+                p
+                for p in self.root_path.rglob("*")
+                if p.is_dir() and p.name.startswith(DuckTable._STAGING_PREFIXES)
+            ]
+            for path in inside:
+                shutil.rmtree(path, ignore_errors=True)
+                removed.append(str(path))
+
+        if not self.root_path.parent.exists():
+            return removed
+        for path in self.root_path.parent.iterdir():
+            if not (path.is_dir() and path.name.startswith(DuckTable._STAGING_PREFIXES)):
+                continue
+            if self._owns_staging(path):
+                if not owned:
+                    continue
+            else:
+                try:
+                    if path.stat().st_mtime > cutoff:
+                        continue
+                except FileNotFoundError:
+                    continue
+                target = path / "target"
+                if target.exists():
+                    # Trash of another table is restored by that table.
+                    owner = Path(target.read_text())
+                    if owner != self.root_path and self.root_path not in owner.parents:
+                        continue
+            removed.append(DuckTable._restore_trash(path) or str(path))
+        return removed
 
 
 class DuckPQ:
@@ -700,6 +3622,9 @@ class DuckPQ:
             - None: use in-memory DuckDB (":memory:").
         config: Extra DuckDB connection config, merged into duckdb.connect.
         threads: Number of DuckDB threads to set via "SET threads=...".
+        resources: DuckDB memory/spill settings applied on open
+            (memory_limit, temp_directory, max_temp_directory_size).
+        retention: Table -> predicate selecting expired partitions.
 
     Examples:
         >>> db = DuckPQ(root_path="database", database="duckpq.duckdb", threads=4)
@@ -736,12 +3661,34 @@ class DuckPQ:
 
     """
 
+    # Default policy of run_maintenance()/start_maintenance()
+    _MAINTENANCE_POLICY: Dict[str, Any] = {
+        "interval": 300.0,
+        "tables": None,
+        "compact": True,
+        "target_file_size": 128 * 1024**2,
+        "small_file_size": None,
+        "min_files": 2,
+        "compression": "zstd",
+        "engine": "duckdb",
+        "max_bytes_per_second": None,
+        "stats": True,
+        "vacuum": True,
+        "vacuum_older_than": 3600.0,
+        "memory_limit": None,
+        "retention": True,
+    }
+
     def __init__(
         self,
         root_path: Union[str, Path],
         database: Optional[Union[str, duckdb.DuckDBPyConnection]] = None,
         config: Optional[Dict[str, Any]] = None,
         threads: Optional[int] = None,
+        memory_limit: Optional[Union[str, int]] = None,
+        temp_directory: Optional[str] = None,
+        max_temp_directory_size: Optional[Union[str, int]] = None,
+        retention: Optional[Dict[str, str]] = None,
     ):
         """Initialize DuckPQ.
 
@@ -755,9 +3702,31 @@ class DuckPQ:
                 - None: use in-memory DuckDB (":memory:").
             config: Extra DuckDB connection config, merged into duckdb.connect.
             threads: Number of DuckDB threads to set via "SET threads=...".
+                Defaults to the CPUs available to the process (affinity mask
+                and cgroup quota); an external connection keeps its setting.
+            memory_limit: DuckDB memory limit, e.g. '8GB' (ints are bytes).
+                Operations exceeding it spill to temp_directory instead of
+                growing the process.
+            temp_directory: Directory DuckDB spills to.
+            max_temp_directory_size: Cap on the spilled data; operations
+                exceeding it fail instead of filling the disk.
+            retention: Table -> predicate over its partition columns selecting
+                expired partitions, see set_retention().
         """
         self.root_path = Path(root_path).resolve()
         self.root_path.mkdir(parents=True, exist_ok=True)
+        self.resources = {
+            name: str(value)
+            for name, value in (config or {}).items()
+            if name in DuckTable._RESOURCE_SETTINGS
+        }
+        self.resources.update(
+            DuckTable._resource_settings(
+                memory_limit=memory_limit,
+                temp_directory=temp_directory,
+                max_temp_directory_size=max_temp_directory_size,
+            )
+        )
 
         # Set up DuckDB connection
         if isinstance(database, duckdb.DuckDBPyConnection):
@@ -765,20 +3734,30 @@ class DuckPQ:
             self._own_connection = False
         else:
             db_path = database or ":memory:"
-            cfg: Dict[str, Any] = dict(config or {})
-            if threads is not None:
-                cfg["threads"] = int(threads)
+            cfg: Dict[str, Any] = {**(config or {}), **self.resources}
+            cfg["threads"] = int(threads or cfg.get("threads") or _available_cpus())
             self.con = duckdb.connect(database=db_path, config=cfg)
             self._own_connection = True
-            if threads is not None:
-                try:
-                    self.con.execute(f"SET threads={int(threads)}")
-                except Exception:
-                    # Ignore inability to set threads
-                    pass
+        if threads is not None:
+            try:
+                self.con.execute(f"SET threads={int(threads)}")
+            except Exception:
+                # Ignore inability to set threads
+                pass
+        self.threads = int(self.con.execute("SELECT current_setting('threads')").fetchone()[0])
+        DuckTable._apply_resources(self.con, self.resources)
 
         # Table name -> DuckTable
         self.tables: Dict[str, DuckTable] = {}
+        self._tables_lock = threading.RLock()
+
+        # Table name -> predicate selecting expired partitions
+        self.retention: Dict[str, str] = dict(retention or {})
+
+        # Background maintenance state, see start_maintenance()
+        self._maintenance_thread: Optional[threading.Thread] = None
+        self._maintenance_stop = threading.Event()
+        self.maintenance_report: Dict[str, Any] = {}
 
     # ------------------------------------------------------------------ #
     # Internal helpers
@@ -796,18 +3775,51 @@ class DuckPQ:
         Returns:
             DuckTable instance for the table.
         """
-        if table in self.tables:
-            return self.tables[table]
+        with self._tables_lock:
+            if table in self.tables:
+                return self.tables[table]
 
-        root_path = self.root_path / table
-        dp = DuckTable(
-            root_path=str(root_path),
-            name=table,
-            create=True,
-            database=self.con,
-        )
-        self.tables[table] = dp
-        return dp
+            root_path = self.root_path / table
+            dp = DuckTable(
+                root_path=str(root_path),
+                name=table,
+                create=True,
+                database=self.con,
+                **self.resources,
+            )
+            self.tables[table] = dp
+            return dp
+
+    def _cursor(self) -> duckdb.DuckDBPyConnection:
+        """Return the connection for SQL, or the cursor of an AsyncDuckPQ task."""
+        cur = _TaskContext.current(self.con)
+        return self.con if cur is None else cur
+
+    def _relation_ident(self, name: str) -> str:
+        """Quote a table/view name, registering table directories on demand."""
+        if name not in self.tables and (self.root_path / name).is_dir():
+            self.register(name)
+        return DuckTable._quote_ident(name)
+
+    @staticmethod
+    def _tolerance_sql(tolerance: Any) -> str:
+        """Render an as-of tolerance as a DuckDB expression."""
+        if isinstance(tolerance, (pd.Timedelta, timedelta)):
+            micros = int(pd.Timedelta(tolerance) / pd.Timedelta(microseconds=1))
+            return f"to_microseconds({micros})"
+        if isinstance(tolerance, str):
+            return f"INTERVAL {DuckTable._quote_literal(tolerance)}"
+        return str(tolerance)
+
+    def _fetch_chunks(self, sql: str, batch_size: int) -> Iterator[pd.DataFrame]:
+        """Execute sql and yield the result as pandas chunks."""
+        vectors = max(1, int(batch_size) // 2048)
+        result = self._cursor().execute(sql)
+        while True:
+            chunk = result.fetch_df_chunk(vectors)
+            if chunk.empty:
+                break
+            yield chunk
 
     # ------------------------------------------------------------------ #
     # Public API: register DuckTable for further operations
@@ -822,7 +3834,12 @@ class DuckPQ:
         """
         tables = []
         for path in self.root_path.iterdir():
-            if path.is_dir() and path.name not in self.tables:
+            if (
+                path.is_dir()
+                and path.name not in self.tables
+                and not path.name.startswith(DuckTable._STAGING_PREFIXES)
+                and not path.name.startswith(".")
+            ):
                 tables.append(path.name)
         return tables
 
@@ -836,48 +3853,56 @@ class DuckPQ:
             name (Optional[str]): Specific table name to register. If None,
                 registers all subdirectories.
         """
-        if name is not None:
-            dp = self._get_or_create_table(name)
-            self.tables[name] = dp
-            return
-
-        for p in self.root_path.iterdir():
-            if not p.is_dir():
-                continue
-            table_name = p.name
-            if table_name in self.tables:
-                continue
-            dp = DuckTable(
-                root_path=str(p),
-                name=table_name,
-                create=False,
-                database=self.con,
-            )
-            self.tables[table_name] = dp
+        with _phase(self.con, "register", table=name):
+            if name is not None:
+                dp = self._get_or_create_table(name)
+                self.tables[name] = dp
+                return
+
+            with self._tables_lock:
+                for p in self.root_path.iterdir():
+                    if not p.is_dir() or p.name.startswith(DuckTable._STAGING_PREFIXES + (".",)):
+                        continue
+                    table_name = p.name
+                    if table_name in self.tables:
+                        continue
+                    dp = DuckTable(
+                        root_path=str(p),
+                        name=table_name,
+                        create=False,
+                        database=self.con,
+                        **self.resources,
+                    )
+                    self.tables[table_name] = dp
 
     def attach(
         self,
         name: str,
-        df: pd.DataFrame,
+        df: _FrameLike,
         replace: bool = True,
         materialize: bool = False,
     ) -> None:
-        """Register a pandas DataFrame as a DuckDB relation.
+        """Register a DataFrame or Arrow data as a DuckDB relation.
 
-        This method exposes a pandas DataFrame to the underlying DuckDB
-        connection, allowing it to be queried using SQL. Depending on
-        `materialize`, the DataFrame can be registered as:
+        This method exposes a pandas DataFrame, pyarrow Table or polars
+        DataFrame to the underlying DuckDB connection (zero-copy for Arrow
+        and polars), allowing it to be queried using SQL. Depending on
+        `materialize`, the data can be registered as:
 
         - a DuckDB view / relation (via `con.register`), or
         - a temporary DuckDB table (via `CREATE TEMP TABLE AS`).
 
+        Streams (pyarrow RecordBatchReader, iterables of record batches) can
+        only be scanned once and are therefore always materialized.
+
         The registered object lives within the lifetime of the DuckDB
         connection and does not persist to disk unless explicitly copied
         out later.
 
         Args:
             name: Name of the DuckDB view or table to register.
-            df: pandas DataFrame to expose to DuckDB.
+            df: pandas DataFrame, pyarrow Table / RecordBatchReader, iterable
+                of record batches or polars DataFrame to expose to DuckDB.
             replace: Whether to drop an existing view or table with
                 the same name before registration.
             materialize: If True, create a temporary DuckDB table
@@ -897,6 +3922,12 @@ class DuckPQ:
                 # Ignore failures caused by missing objects
                 pass
 
+        if type(df).__name__ == "LazyFrame":
+            df = df.collect()
+        stream = DuckTable._as_stream(df)
+        if stream is not None:
+            df, materialize = stream, True
+
         if materialize:
             # Register DataFrame under a temporary name, then materialize
             # it into a DuckDB TEMP TABLE.
@@ -919,18 +3950,20 @@ class DuckPQ:
     def upsert(
         self,
         table: str,
-        df: pd.DataFrame,
+        df: _FrameLike,
         keys: List[str],
         partition_by: Optional[List[str]] = None,
     ) -> None:
-        """Upsert rows from a DataFrame into a Parquet-backed table.
+        """Upsert rows into a Parquet-backed table.
 
         This will create the table directory under root_dir if it does not
-        exist yet. Internally it delegates to DuckTable.upsert_from_df.
+        exist yet. Internally it delegates to DuckTable.upsert.
 
         Args:
             table: Logical table name (directory name and view name).
-            df: Input pandas DataFrame to upsert.
+            df: Input rows: pandas DataFrame, pyarrow Table or
+                RecordBatchReader, iterable of record batches, or polars
+                DataFrame.
             keys: Primary key column names used to deduplicate and upsert.
             partition_by: Optional list of partition columns used to create
                 Hive-style partitions under the table directory.
@@ -938,63 +3971,366 @@ class DuckPQ:
         dp = self._get_or_create_table(table)
         dp.upsert(df=df, keys=keys, partition_by=partition_by)
 
-    def select(
+    def upsert_from_files(
         self,
         table: str,
-        columns: Union[str, List[str]] = "*",
-        where: Optional[str] = None,
-        params: Optional[Sequence[Any]] = None,
-        group_by: Optional[Union[str, List[str]]] = None,
-        having: Optional[str] = None,
-        order_by: Optional[Union[str, List[str]]] = None,
-        limit: Optional[int] = None,
-        offset: Optional[int] = None,
-        distinct: bool = False,
-    ) -> pd.DataFrame:
-        """Select from a Parquet-backed table via DuckTable.
+        paths: Union[str, Path, Sequence[Union[str, Path]]],
+        keys: List[str],
+        partition_by: Optional[List[str]] = None,
+        format: Optional[str] = None,
+        read_options: Optional[Dict[str, Any]] = None,
+    ) -> int:
+        """Upsert rows read from CSV/JSON/Parquet files into a table.
+
+        See DuckTable.upsert_from_files; the data is read by DuckDB and never
+        materialized in pandas.
 
         Args:
-            table: Table name to query.
-            columns: Column list or "*" for all columns.
-            where: Optional WHERE clause string.
-            params: Optional sequence of bind parameters for WHERE.
-            group_by: Optional GROUP BY columns or expression.
-            having: Optional HAVING clause.
-            order_by: Optional ORDER BY columns or expression.
-            limit: Optional row limit.
-            offset: Optional row offset.
-            distinct: Whether to select DISTINCT.
+            table: Logical table name (directory name and view name).
+            paths: File path, glob pattern, or list of them.
+            keys: Primary key column names used to deduplicate and upsert.
+            partition_by: Optional list of partition columns.
+            format: 'csv', 'json' or 'parquet'; inferred from extensions if None.
+            read_options: Extra named parameters of the DuckDB reader.
 
         Returns:
-            pandas.DataFrame with query results.
+            int: Number of rows ingested.
         """
         dp = self._get_or_create_table(table)
-        return dp.select(
-            columns=columns,
-            where=where,
-            params=params,
-            group_by=group_by,
-            having=having,
-            order_by=order_by,
-            limit=limit,
-            offset=offset,
-            distinct=distinct,
+        return dp.upsert_from_files(
+            paths,
+            keys=keys,
+            partition_by=partition_by,
+            format=format,
+            read_options=read_options,
         )
 
-    def compact(
+    def append(
         self,
         table: str,
-        compression: str = "zstd",
-        max_workers: int = 8,
-        engine: str = "pyarrow",
+        df: _FrameLike,
+        partition_by: Optional[List[str]] = None,
+    ) -> None:
+        """Append rows into a Parquet-backed table.
+
+        Args:
+            table: Logical table name (directory name and view name).
+            df: Input rows, in any form accepted by upsert().
+            partition_by: Optional list of partition columns.
+        """
+        dp = self._get_or_create_table(table)
+        dp.append(df=df, partition_by=partition_by)
+
+    def set_hot(
+        self,
+        table: str,
+        recent: Optional[int] = None,
+        partitions: Optional[List[str]] = None,
     ) -> List[str]:
-        """Compact partition directories of a Parquet-backed table into single parquet files.
+        """Keep partitions of a table materialized in DuckDB; see DuckTable.set_hot.
+
+        With a database file (`database="..."`), the hot tables live in that
+        file; otherwise in memory.
+
+        Args:
+            table: Table name.
+            recent: Number of most recent first-level partitions to keep hot.
+            partitions: Explicit relative partition paths to keep hot.
+
+        Returns:
+            List[str]: The hot partitions.
+        """
+        dp = self._get_or_create_table(table)
+        return dp.set_hot(recent=recent, partitions=partitions)
+
+    def writer(
+        self,
+        table: str,
+        keys: Optional[List[str]] = None,
+        partition_by: Optional[List[str]] = None,
+        flush_rows: Optional[int] = 100_000,
+        flush_interval: Optional[float] = 5.0,
+    ) -> "DuckWriter":
+        """Create a write buffer for a table; see DuckTable.writer.
+
+        Args:
+            table: Logical table name (directory name and view name).
+            keys: Primary key columns; None to append without deduplication.
+            partition_by: Optional list of partition columns.
+            flush_rows: Row threshold triggering a flush.
+            flush_interval: Seconds between background flushes.
+
+        Returns:
+            DuckWriter: The buffer.
+        """
+        dp = self._get_or_create_table(table)
+        return dp.writer(
+            keys=keys,
+            partition_by=partition_by,
+            flush_rows=flush_rows,
+            flush_interval=flush_interval,
+        )
+
+    def profiler(self) -> ContextManager["DuckProfile"]:
+        """Profile the calls made inside a block; see DuckTable.profiler().
+
+        Examples:
+            >>> with db.profiler() as prof:
+            ...     db.upsert("quotes_min", df, keys=["symbol", "ts"])
+            >>> prof.summary()
+        """
+        return DuckProfile._observe(self.con)
+
+    @contextmanager
+    def resource_limits(
+        self,
+        memory_limit: Optional[Union[str, int]] = None,
+        max_temp_directory_size: Optional[Union[str, int]] = None,
+        threads: Optional[int] = None,
+    ) -> Iterator["DuckPQ"]:
+        """Override memory, spill and thread limits for the operations in a block.
+
+        See DuckTable.resource_limits(); the settings apply to the whole
+        database while the block runs.
+
+        Examples:
+            >>> with db.resource_limits(memory_limit="2GB"):
+            ...     db.upsert("quotes_min", big_df, keys=["symbol", "ts"])
+        """
+        settings = DuckTable._resource_settings(
+            memory_limit=memory_limit,
+            max_temp_directory_size=max_temp_directory_size,
+            threads=threads,
+        )
+        base = {**self.resources, "threads": str(self.threads)}
+        with DuckTable._resource_scope(self._cursor(), settings, base):
+            yield self
+
+    def batch(self, max_workers: int = 4) -> "DuckBatch":
+        """Start a multi-table write batch.
+
+        Writes recorded on the batch are staged for all tables (independent
+        tables concurrently) and only moved into place once every table
+        staged successfully; views are refreshed once at the end.
+
+        Examples:
+            >>> with db.batch() as b:
+            ...     b.upsert("quotes", df_quotes, keys=["symbol", "ts"])
+            ...     b.append("trades", df_trades, partition_by=["trade_date"])
+
+        Args:
+            max_workers: Maximum number of tables staged concurrently.
+
+        Returns:
+            DuckBatch: The batch, to be used as a context manager.
+        """
+        return DuckBatch(self, max_workers=max_workers)
+
+    def select(
+        self,
+        table: str,
+        columns: Union[str, List[str]] = "*",
+        where: Optional[str] = None,
+        params: Optional[Sequence[Any]] = None,
+        group_by: Optional[Union[str, List[str]]] = None,
+        having: Optional[str] = None,
+        order_by: Optional[Union[str, List[str]]] = None,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+        distinct: bool = False,
+    ) -> pd.DataFrame:
+        """Select from a Parquet-backed table via DuckTable.
+
+        Args:
+            table: Table name to query.
+            columns: Column list or "*" for all columns.
+            where: Optional WHERE clause string.
+            params: Optional sequence of bind parameters for WHERE.
+            group_by: Optional GROUP BY columns or expression.
+            having: Optional HAVING clause.
+            order_by: Optional ORDER BY columns or expression.
+            limit: Optional row limit.
+            offset: Optional row offset.
+            distinct: Whether to select DISTINCT.
+
+        Returns:
+            pandas.DataFrame with query results.
+        """
+        dp = self._get_or_create_table(table)
+        return dp.select(
+            columns=columns,
+            where=where,
+            params=params,
+            group_by=group_by,
+            having=having,
+            order_by=order_by,
+            limit=limit,
+            offset=offset,
+            distinct=distinct,
+        )
+
+    def select_pages(
+        self,
+        table: str,
+        order_by: Union[str, List[str]],
+        page_size: int = 10_000,
+        columns: Union[str, List[str]] = "*",
+        where: Optional[str] = None,
+        params: Optional[Sequence[Any]] = None,
+        after: Optional[Sequence[Any]] = None,
+    ) -> Iterator[pd.DataFrame]:
+        """Iterate over a Parquet-backed table page by page via keyset seeks.
+
+        Args:
+            table: Table name to query.
+            order_by: Key column(s) defining page order; must be unique.
+            page_size: Number of rows per page.
+            columns: Column list or "*" for all columns.
+            where: Optional WHERE clause string.
+            params: Optional sequence of bind parameters for WHERE.
+            after: Optional key values to resume after.
+
+        Returns:
+            Iterator over pandas.DataFrame pages.
+        """
+        dp = self._get_or_create_table(table)
+        return dp.select_pages(
+            order_by=order_by,
+            page_size=page_size,
+            columns=columns,
+            where=where,
+            params=params,
+            after=after,
+        )
+
+    def sample(
+        self,
+        table: str,
+        n: Optional[int] = None,
+        fraction: Optional[float] = None,
+        method: str = "system",
+        seed: Optional[int] = None,
+        columns: Union[str, List[str]] = "*",
+        where: Optional[str] = None,
+        params: Optional[Sequence[Any]] = None,
+        files: Optional[Union[int, float]] = None,
+    ) -> pd.DataFrame:
+        """Return a random sample of a Parquet-backed table via DuckTable.
+
+        Args:
+            table: Table name to sample.
+            n: Number of rows to sample.
+            fraction: Fraction of rows to sample.
+            method: 'system', 'bernoulli' or 'reservoir'.
+            seed: Optional seed for reproducible samples.
+            columns: Column list or "*" for all columns.
+            where: Optional WHERE clause applied before sampling.
+            params: Optional sequence of bind parameters for WHERE.
+            files: Number or fraction of parquet files to read.
+
+        Returns:
+            pandas.DataFrame with sampled rows.
+        """
+        dp = self._get_or_create_table(table)
+        return dp.sample(
+            n=n,
+            fraction=fraction,
+            method=method,
+            seed=seed,
+            columns=columns,
+            where=where,
+            params=params,
+            files=files,
+        )
+
+    def stats(
+        self,
+        table: Optional[str] = None,
+        small_file_size: int = 32 * 1024**2,
+    ) -> Union[Dict[str, Any], pd.DataFrame]:
+        """Footer-based statistics for one table or a summary of all tables.
+
+        Args:
+            table: Table name. If None, every table directory is registered
+                and summarized.
+            small_file_size: Files below this many bytes count as small.
+
+        Returns:
+            The DuckTable.stats() dictionary for a single table, otherwise a
+            DataFrame with num_files, num_rows, num_bytes and num_small_files
+            per table.
+        """
+        if table is not None:
+            return self._get_or_create_table(table).stats(small_file_size)
+        self.register()
+        rows = []
+        for name, dp in self.tables.items():
+            st = dp.stats(small_file_size)
+            rows.append(
+                {
+                    "table": name,
+                    "num_files": st["num_files"],
+                    "num_rows": st["num_rows"],
+                    "num_bytes": st["num_bytes"],
+                    "num_small_files": st["num_small_files"],
+                }
+            )
+        return pd.DataFrame(
+            rows,
+            columns=["table", "num_files", "num_rows", "num_bytes", "num_small_files"],
+        )
+
+    def plan_compaction(
+        self,
+        table: str,
+        target_file_size: int = 128 * 1024**2,
+        small_file_size: Optional[int] = None,
+        min_files: int = 2,
+    ) -> List[Dict[str, Any]]:
+        """Plan compaction of a Parquet-backed table without rewriting anything.
+
+        Args:
+            table (str): Name of the table to plan.
+            target_file_size (int): Desired size in bytes of compacted files.
+            small_file_size (Optional[int]): Files below this size are candidates.
+            min_files (int): Minimum number of small files per partition.
+
+        Returns:
+            List[Dict[str, Any]]: Plan entries, see DuckTable.plan_compaction.
+        """
+        dp = self._get_or_create_table(table)
+        return dp.plan_compaction(
+            target_file_size=target_file_size,
+            small_file_size=small_file_size,
+            min_files=min_files,
+        )
+
+    def compact(
+        self,
+        table: str,
+        compression: str = "zstd",
+        max_workers: int = 8,
+        engine: str = "pyarrow",
+        target_file_size: int = 128 * 1024**2,
+        small_file_size: Optional[int] = None,
+        min_files: int = 2,
+        dry_run: bool = False,
+        memory_limit: Optional[Union[str, int]] = None,
+    ) -> List[str]:
+        """Merge small parquet files of a Parquet-backed table.
 
         Args:
             table (str): Name of the table to compact.
             compression (str): Compression codec to use ('zstd', 'snappy', 'gzip', etc.).
             max_workers (int): Maximum number of parallel workers for compaction.
-            engine (str): Parquet engine to use ('pyarrow' or 'fastparquet').
+            engine (str): Engine used to rewrite files ('pyarrow', 'fastparquet'
+                or 'duckdb').
+            target_file_size (int): Desired size in bytes of compacted files.
+            small_file_size (Optional[int]): Files below this size are candidates.
+            min_files (int): Minimum number of small files per partition.
+            dry_run (bool): If True, only return the partitions that would be compacted.
+            memory_limit (Optional[Union[str, int]]): Memory cap of the duckdb
+                engine, enforced on a private DuckDB instance.
 
         Returns:
             List[str]: List of relative partition paths that were compacted.
@@ -1004,7 +4340,545 @@ class DuckPQ:
             compression=compression,
             max_workers=max_workers,
             engine=engine,
+            target_file_size=target_file_size,
+            small_file_size=small_file_size,
+            min_files=min_files,
+            dry_run=dry_run,
+            memory_limit=memory_limit,
+        )
+
+    def drop_partitions(
+        self,
+        table: str,
+        where: str,
+        params: Optional[Sequence[Any]] = None,
+        dry_run: bool = False,
+    ) -> List[str]:
+        """Delete whole partitions of a table; see DuckTable.drop_partitions.
+
+        Args:
+            table (str): Name of the table.
+            where (str): SQL predicate over the partition columns only.
+            params (Optional[Sequence[Any]]): Bind parameters for `where`.
+            dry_run (bool): If True, only return the partitions to drop.
+
+        Returns:
+            List[str]: Relative paths of the dropped partition directories.
+        """
+        dp = self._get_or_create_table(table)
+        return dp.drop_partitions(where, params=params, dry_run=dry_run)
+
+    def repartition(
+        self,
+        table: str,
+        partition_by: Optional[List[str]] = None,
+        derive: Optional[Dict[str, str]] = None,
+        order_by: Optional[Union[str, List[str]]] = None,
+        compression: str = "zstd",
+        memory_limit: Optional[Union[str, int]] = None,
+    ) -> List[str]:
+        """Rewrite a table under a new partition scheme; see DuckTable.repartition.
+
+        Args:
+            table (str): Name of the table.
+            partition_by (Optional[List[str]]): New partition columns.
+            derive (Optional[Dict[str, str]]): New columns as name -> SQL
+                expression.
+            order_by (Optional[Union[str, List[str]]]): Sort rows before writing.
+            compression (str): Compression codec of the new files.
+            memory_limit (Optional[Union[str, int]]): Memory cap of the rewrite.
+
+        Returns:
+            List[str]: Relative paths of the new partition directories.
+        """
+        dp = self._get_or_create_table(table)
+        return dp.repartition(
+            partition_by,
+            derive=derive,
+            order_by=order_by,
+            compression=compression,
+            memory_limit=memory_limit,
+        )
+
+    def set_retention(
+        self,
+        table: str,
+        keep: Optional[Union[str, int]] = None,
+        column: Optional[str] = None,
+        where: Optional[str] = None,
+    ) -> None:
+        """Declare which partitions of a table expire.
+
+        The policy is enforced by apply_retention() and by maintenance passes
+        (run_maintenance()/start_maintenance()), which drop the expired
+        partitions with drop_partitions(), never rewriting files.
+
+        Examples:
+            >>> db.set_retention("ticks", keep="2 years", column="trade_date")
+            >>> db.set_retention("snapshots", where="snap_date < DATE '2024-01-01'")
+            >>> db.set_retention("ticks")  # keep everything
+
+        Args:
+            table (str): Name of the table.
+            keep (Optional[Union[str, int]]): Age of the data to keep, as a
+                DuckDB interval such as '2 years' or '90 days', or a number
+                of days. Partitions whose `column` is older than
+                current_date - keep expire.
+            column (Optional[str]): Partition column holding the date,
+                required with `keep`.
+            where (Optional[str]): Predicate over the partition columns
+                selecting the expired partitions, evaluated at each run
+                (e.g. with current_date), instead of `keep`.
+        """
+        if keep is not None and where is not None:
+            raise ValueError("Pass either keep or where, not both")
+        if keep is not None:
+            if column is None:
+                raise ValueError("column is required with keep")
+            interval = f"{int(keep)} days" if isinstance(keep, int) else str(keep)
+            where = (
+                f"{DuckTable._quote_ident(column)} < "
+                f"current_date - INTERVAL {DuckTable._quote_literal(interval)}"
+            )
+        if where is None:
+            self.retention.pop(table, None)
+        else:
+            self.retention[table] = where
+
+    def apply_retention(
+        self, tables: Optional[List[str]] = None, dry_run: bool = False
+    ) -> Dict[str, List[str]]:
+        """Drop the expired partitions of tables with a retention policy.
+
+        Args:
+            tables (Optional[List[str]]): Tables to enforce; defaults to all
+                tables with a policy (see set_retention()).
+            dry_run (bool): If True, only report the partitions to drop.
+
+        Returns:
+            Dict[str, List[str]]: Table -> dropped partitions, for tables
+                where any partition expired.
+        """
+        dropped: Dict[str, List[str]] = {}
+        for name in tables or list(self.retention):
+            where = self.retention.get(name)
+            if where is None or not (self.root_path / name).is_dir():
+                continue
+            parts = self.drop_partitions(name, where, dry_run=dry_run)
+            if parts:
+                dropped[name] = parts
+        return dropped
+
+    # ------------------------------------------------------------------ #
+    # Public API: cross-table operations
+    # ------------------------------------------------------------------ #
+
+    def compute_factors(
+        self,
+        source: str,
+        target: str,
+        on: str,
+        by: Optional[Union[str, List[str]]] = None,
+        spec: Optional[Dict[str, Sequence[Any]]] = None,
+        columns: Optional[Union[str, List[str]]] = None,
+        windows: Optional[Sequence[int]] = None,
+        funcs: Optional[Union[str, List[str]]] = None,
+        min_periods: Optional[int] = None,
+        where: Optional[str] = None,
+        partition_by: Optional[List[str]] = None,
+        start: Any = None,
+        incremental: bool = True,
+    ) -> int:
+        """Compute rolling factors from one table and upsert them into another.
+
+        The factor spec is compiled by DuckTable.rolling into one windowed
+        scan of `source`; the result is written to `target` through the
+        regular upsert path keyed on `by` + `on`.
+
+        Args:
+            source: Source table name.
+            target: Target table name (created if missing).
+            on: Ordering column (e.g. trade_date).
+            by: Optional grouping column(s) (e.g. symbol).
+            spec: Mapping of output name to (func, column, window).
+            columns: Alternative to spec: value column(s) to expand.
+            windows: Window lengths combined with columns and funcs.
+            funcs: Function name(s) combined with columns and windows.
+            min_periods: Minimum observations for a non-null result.
+            where: Optional WHERE clause applied to the source.
+            partition_by: Partition columns for the target table. They must be
+                among `by` + `on`.
+            start: Only compute rows with `on >= start`.
+            incremental: If True and `start` is not given, only compute `on`
+                values newer than the latest one already in `target`.
+
+        Returns:
+            int: Number of rows written.
+        """
+        src = self._get_or_create_table(source)
+        by_cols = [by] if isinstance(by, str) else list(by or [])
+        on_ident = DuckTable._quote_ident(on)
+        if start is None and incremental and (self.root_path / target).is_dir():
+            dst = self._get_or_create_table(target)
+            if not dst.empty:
+                latest = self._cursor().execute(
+                    f"SELECT max({on_ident}) FROM {DuckTable._quote_ident(dst.view_name)}"
+                ).fetchone()[0]
+                if latest is not None:
+                    start = self._cursor().execute(
+                        f"SELECT min({on_ident}) FROM "
+                        f"{DuckTable._quote_ident(src.view_name)} WHERE {on_ident} > ?",
+                        [latest],
+                    ).fetchone()[0]
+                    if start is None:
+                        return 0
+
+        df = src.rolling(
+            on=on,
+            by=by_cols,
+            spec=spec,
+            columns=columns,
+            windows=windows,
+            funcs=funcs,
+            min_periods=min_periods,
+            where=where,
+            start=start,
+        )
+        if df.empty:
+            return 0
+        self.upsert(target, df, keys=by_cols + [on], partition_by=partition_by)
+        return len(df)
+
+    def asof_join(
+        self,
+        left: str,
+        right: str,
+        on: str,
+        by: Optional[Union[str, List[str]]] = None,
+        tolerance: Any = None,
+        columns: Optional[List[str]] = None,
+        where: Optional[str] = None,
+        how: str = "inner",
+        suffix: str = "_right",
+        max_by_values: int = 1024,
+        stream: bool = False,
+        batch_size: int = 100_000,
+    ) -> Union[pd.DataFrame, Iterator[pd.DataFrame]]:
+        """Point-in-time join: match each left row with the latest right row.
+
+        For every row of `left`, the right row with the greatest `on` value
+        that is less than or equal to the left `on` value (within the same
+        `by` group) is attached. Before joining, literal filters derived from
+        the left side are pushed down on `right`: `on <= max(left.on)`, plus
+        `on >= min(left.on) - tolerance` when a tolerance is given, and, for a
+        single `by` column with at most `max_by_values` values, `by IN (...)`.
+        Right partitions are only skipped when `right` is partitioned by a
+        filtered column; otherwise DuckDB can skip row groups using the
+        parquet min/max statistics.
+
+        Args:
+            left: Left table or view name (e.g. trades).
+            right: Right table or view name (e.g. quotes).
+            on: Time column present in both tables.
+            by: Optional column(s) that must match exactly (e.g. symbol).
+            tolerance: Optional maximum distance between left and right `on`
+                values. Accepts a number, an interval string such as
+                '5 minutes', or a timedelta.
+            columns: Right columns to attach. Defaults to all right columns
+                except `on` and `by`.
+            where: Optional filter applied to the left table.
+            how: 'inner' drops unmatched left rows, 'left' keeps them.
+            suffix: Suffix for right columns whose names clash with left ones.
+            max_by_values: Upper bound on distinct `by` values inlined into
+                the right-side filter.
+            stream: If True, return an iterator of DataFrame chunks instead of
+                a single DataFrame. Consume it before issuing other queries on
+                the same connection.
+            batch_size: Approximate number of rows per streamed chunk.
+
+        Returns:
+            Union[pd.DataFrame, Iterator[pd.DataFrame]]: Joined rows.
+        """
+        if how not in ("inner", "left"):
+            raise ValueError("how must be 'inner' or 'left'")
+        by_cols = [by] if isinstance(by, str) else list(by or [])
+        left_ident = self._relation_ident(left)
+        right_ident = self._relation_ident(right)
+        on_ident = DuckTable._quote_ident(on)
+
+        left_sql = f"SELECT * FROM {left_ident}"
+        if where:
+            left_sql += f" WHERE {where}"
+
+        # Range of the left side, rendered as typed literals for pushdown.
+        lo, hi, on_type = self._cursor().execute(
+            f"SELECT CAST(min({on_ident}) AS VARCHAR), "
+            f"CAST(max({on_ident}) AS VARCHAR), "
+            f"typeof(min({on_ident})) FROM ({left_sql})"
+        ).fetchone()
+        right_filters: List[str] = []
+        if hi is None:
+            right_filters.append("FALSE")
+        else:
+            right_filters.append(
+                f"{on_ident} <= CAST({DuckTable._quote_literal(hi)} AS {on_type})"
+            )
+            if tolerance is not None:
+                right_filters.append(
+                    f"{on_ident} >= CAST({DuckTable._quote_literal(lo)} AS {on_type}) "
+                    f"- {self._tolerance_sql(tolerance)}"
+                )
+        if len(by_cols) == 1 and hi is not None:
+            by_ident = DuckTable._quote_ident(by_cols[0])
+            by_values = self._cursor().execute(
+                f"SELECT DISTINCT CAST({by_ident} AS VARCHAR) FROM ({left_sql}) "
+                f"WHERE {by_ident} IS NOT NULL LIMIT {int(max_by_values) + 1}"
+            ).fetchall()
+            if len(by_values) <= max_by_values:
+                in_list = ", ".join(DuckTable._quote_literal(v[0]) for v in by_values)
+                right_filters.append(f"{by_ident} IN ({in_list or 'NULL'})")
+        right_sql = f"SELECT * FROM {right_ident} WHERE " + " AND ".join(right_filters)
+
+        left_cols = [
+            r[0] for r in self._cursor().execute(f"DESCRIBE {left_ident}").fetchall()
+        ]
+        if columns is None:
+            columns = [
+                r[0]
+                for r in self._cursor().execute(f"DESCRIBE {right_ident}").fetchall()
+                if r[0] != on and r[0] not in by_cols
+            ]
+        within = None
+        if tolerance is not None:
+            within = f"l.{on_ident} - r.{on_ident} <= {self._tolerance_sql(tolerance)}"
+        right_exprs = []
+        for c in columns:
+            alias = c + suffix if c in left_cols else c
+            expr = f"r.{DuckTable._quote_ident(c)}"
+            if within is not None and how == "left":
+                expr = f"CASE WHEN {within} THEN {expr} END"
+            right_exprs.append(f"{expr} AS {DuckTable._quote_ident(alias)}")
+
+        conditions = [
+            f"l.{DuckTable._quote_ident(c)} = r.{DuckTable._quote_ident(c)}"
+            for c in by_cols
+        ]
+        conditions.append(f"l.{on_ident} >= r.{on_ident}")
+        join = "ASOF LEFT JOIN" if how == "left" else "ASOF JOIN"
+        sql = (
+            f"SELECT l.*{''.join(', ' + e for e in right_exprs)} "
+            f"FROM ({left_sql}) AS l {join} ({right_sql}) AS r "
+            f"ON {' AND '.join(conditions)}"
+        )
+        if within is not None and how == "inner":
+            sql += f" WHERE {within}"
+
+        if stream:
+            return self._fetch_chunks(sql, batch_size)
+        return _fetch_df(self.con, self._cursor(), sql)
+
+    # ------------------------------------------------------------------ #
+    # Public API: maintenance
+    # ------------------------------------------------------------------ #
+
+    def _maintenance_policy(self, policy: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Merge a user policy into the defaults and validate its keys."""
+        unknown = set(policy or {}) - set(self._MAINTENANCE_POLICY)
+        if unknown:
+            raise ValueError(f"Unknown maintenance policy keys: {sorted(unknown)}")
+        return {**self._MAINTENANCE_POLICY, **(policy or {})}
+
+    def _maintain_table(
+        self, dp: DuckTable, pol: Dict[str, Any], report: Dict[str, Any]
+    ) -> None:
+        """Run one maintenance pass over a single table."""
+        lock = dp._write_lock
+        if pol["vacuum"] and lock.acquire(blocking=False):
+            try:
+                report["vacuumed"].extend(dp.vacuum(pol["vacuum_older_than"]))
+            finally:
+                lock.release()
+
+        # Expire partitions before compacting, so they are not rewritten.
+        where = self.retention.get(dp.view_name)
+        if pol["retention"] and where is not None and not dp.empty:
+            if lock.acquire(blocking=False):
+                try:
+                    dropped = dp.drop_partitions(where)
+                finally:
+                    lock.release()
+                if dropped:
+                    report["dropped"][dp.view_name] = dropped
+            else:
+                report["skipped"].append(dp.view_name)
+
+        if pol["compact"]:
+            compacted = []
+            plan = dp.plan_compaction(
+                target_file_size=pol["target_file_size"],
+                small_file_size=pol["small_file_size"],
+                min_files=pol["min_files"],
+            )
+            for entry in plan:
+                if self._maintenance_stop.is_set():
+                    break
+                # Yield to foreground writes: skip the rest of this table.
+                if not lock.acquire(blocking=False):
+                    report["skipped"].append(dp.view_name)
+                    break
+                started = time.monotonic()
+                try:
+                    with dp._write_report("compact"):
+                        compacted.append(
+                            dp._compact_partition(
+                                entry,
+                                compression=pol["compression"],
+                                engine=pol["engine"],
+                                lock_timeout=0,
+                                memory_limit=pol["memory_limit"],
+                            )
+                        )
+                except TimeoutError:
+                    # Another process is writing this partition.
+                    report["skipped"].append(dp.view_name)
+                    continue
+                finally:
+                    lock.release()
+                if pol["max_bytes_per_second"]:
+                    delay = entry["num_bytes"] / pol["max_bytes_per_second"]
+                    delay -= time.monotonic() - started
+                    if delay > 0:
+                        self._maintenance_stop.wait(delay)
+            if compacted:
+                report["compacted"][dp.view_name] = compacted
+                if lock.acquire(blocking=False):
+                    try:
+                        dp.refresh()
+                    finally:
+                        lock.release()
+
+        if pol["stats"] and not dp.empty:
+            dp.stats()
+
+    def run_maintenance(self, policy: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Run a single maintenance pass over registered tables.
+
+        Each table is vacuumed (orphaned staging directories removed), its
+        expired partitions are dropped (see set_retention()), it is
+        compacted according to plan_compaction(), and its footer statistics
+        are refreshed. Tables whose write lock is held by a foreground write
+        are skipped for the rest of the pass.
+
+        Args:
+            policy: Overrides for the default policy. Keys:
+                - interval (float): Seconds between background passes.
+                - tables (Optional[List[str]]): Tables to maintain; defaults to
+                  all registered tables.
+                - compact (bool), target_file_size, small_file_size,
+                  min_files, compression, engine: compaction settings.
+                - max_bytes_per_second (Optional[float]): Throttle compaction
+                  I/O to roughly this rate.
+                - memory_limit (Optional[str]): Memory cap of compaction with
+                  the duckdb engine, independent of the database's limit.
+                - stats (bool): Refresh cached statistics.
+                - vacuum (bool), vacuum_older_than (float): Orphan cleanup.
+                - retention (bool): Enforce the retention policies.
+
+        Returns:
+            Dict[str, Any]: Report with `compacted` (table -> partitions),
+                `dropped` (table -> expired partitions), `skipped` tables,
+                `vacuumed` paths and `errors` (table -> message).
+        """
+        pol = self._maintenance_policy(policy)
+        report: Dict[str, Any] = {
+            "compacted": {},
+            "dropped": {},
+            "skipped": [],
+            "vacuumed": [],
+            "errors": {},
+        }
+        names = pol["tables"] or list(self.tables)
+        for name in names:
+            if self._maintenance_stop.is_set():
+                break
+            dp = self.tables.get(name)
+            if dp is None:
+                continue
+            try:
+                self._maintain_table(dp, pol, report)
+            except Exception as e:
+                report["errors"][name] = repr(e)
+        return report
+
+    def vacuum(self, older_than: float = 3600.0) -> List[str]:
+        """Remove orphaned staging directories across the whole database.
+
+        Every table directory is registered and vacuumed (see
+        DuckTable.vacuum), then staging directories left directly under the
+        root by tables that no longer exist are removed as well.
+
+        Args:
+            older_than: Minimum age in seconds of a staging directory before
+                it is considered orphaned.
+
+        Returns:
+            List[str]: Paths of the removed (or restored) directories.
+        """
+        self.register()
+        removed: List[str] = []
+        for dp in list(self.tables.values()):
+            removed.extend(dp.vacuum(older_than))
+        cutoff = time.time() - older_than
+        for path in self.root_path.iterdir():
+            if not (path.is_dir() and path.name.startswith(DuckTable._STAGING_PREFIXES)):
+                continue
+            if any(dp._owns_staging(path) for dp in self.tables.values()):
+                continue
+            try:
+                if path.stat().st_mtime > cutoff:
+                    continue
+            except FileNotFoundError:
+                continue
+            removed.append(DuckTable._restore_trash(path) or str(path))
+        return removed
+
+    def start_maintenance(self, policy: Optional[Dict[str, Any]] = None) -> None:
+        """Run maintenance passes periodically in a background thread.
+
+        All table directories are registered first; the background thread only
+        maintains registered tables and uses its own DuckDB cursor. The report
+        of the latest pass is kept in `maintenance_report`.
+
+        Args:
+            policy: Maintenance policy, see run_maintenance().
+        """
+        if self._maintenance_thread is not None and self._maintenance_thread.is_alive():
+            raise RuntimeError("Maintenance is already running.")
+        pol = self._maintenance_policy(policy)
+        self.register()
+        self._maintenance_stop.clear()
+
+        def _loop():
+            while not self._maintenance_stop.is_set():
+                self.maintenance_report = self.run_maintenance(pol)
+                self._maintenance_stop.wait(pol["interval"])
+
+        self._maintenance_thread = threading.Thread(
+            target=_loop, name="parquool-maintenance", daemon=True
         )
+        self._maintenance_thread.start()
+
+    def stop_maintenance(self, timeout: Optional[float] = None) -> None:
+        """Stop the background maintenance thread, if running.
+
+        Args:
+            timeout: Maximum seconds to wait for the current pass to finish.
+        """
+        self._maintenance_stop.set()
+        if self._maintenance_thread is not None:
+            self._maintenance_thread.join(timeout)
+            self._maintenance_thread = None
+        self._maintenance_stop.clear()
 
     # ------------------------------------------------------------------ #
     # Public API: connection-level SQL
@@ -1029,7 +4903,7 @@ class DuckPQ:
         Returns:
             the DuckDB relation.
         """
-        return self.con.execute(sql, params or [])
+        return self._cursor().execute(sql, params or [])
 
     # Alias for execute
     sql = execute
@@ -1044,7 +4918,7 @@ class DuckPQ:
         Returns:
             pd.DataFrame: Query results as a pandas DataFrame.
         """
-        return self.execute(sql, params=params).df()
+        return _fetch_df(self.con, self._cursor(), sql, params=params)
 
     # ------------------------------------------------------------------ #
     # Resource management
@@ -1056,6 +4930,7 @@ class DuckPQ:
         After calling close(), the DuckPQ instance should not be used for
         further operations.
         """
+        self.stop_maintenance()
         if getattr(self, "_own_connection", False):
             try:
                 self.con.close()
@@ -1077,3 +4952,661 @@ class DuckPQ:
 
     def __repr__(self):
         return self.__str__()
+
+
+class DuckBatch:
+    """Multi-table write batch created by DuckPQ.batch().
+
+    Operations are only recorded until commit(). On commit, operations of the
+    same table are coalesced (across upserts the last row per key wins, while
+    duplicate keys within one upsert raise as in DuckPQ.upsert; appends are
+    concatenated), every table is staged into a staging directory (tables in
+    parallel), and only if all of them succeeded are the staged files moved
+    into place. Within a table, upserts are applied before appends.
+
+    Attributes:
+        db (DuckPQ): The database the batch writes to.
+        max_workers (int): Maximum number of tables staged concurrently.
+    """
+
+    _ORDER = "__parquool_batch_order"
+
+    def __init__(self, db: DuckPQ, max_workers: int = 4):
+        """Initialize an empty batch.
+
+        Args:
+            db (DuckPQ): The database the batch writes to.
+            max_workers (int): Maximum number of tables staged concurrently.
+        """
+        self.db = db
+        self.max_workers = max_workers
+        self._ops: Dict[str, Dict[str, Any]] = {}
+
+    def _table_ops(self, table: str) -> Dict[str, Any]:
+        """Return the recorded operations of a table."""
+        return self._ops.setdefault(
+            table,
+            {"upserts": [], "keys": None, "upsert_partition_by": None,
+             "appends": [], "append_partition_by": None},
+        )
+
+    def upsert(
+        self,
+        table: str,
+        df: _FrameLike,
+        keys: List[str],
+        partition_by: Optional[List[str]] = None,
+    ) -> "DuckBatch":
+        """Record an upsert; see DuckPQ.upsert."""
+        ops = self._table_ops(table)
+        if ops["upserts"] and (
+            ops["keys"] != list(keys) or ops["upsert_partition_by"] != partition_by
+        ):
+            raise ValueError(
+                f"Upserts into {table} within one batch must use the same keys and partition_by."
+            )
+        ops["upserts"].append(df)
+        ops["keys"] = list(keys)
+        ops["upsert_partition_by"] = partition_by
+        return self
+
+    def append(
+        self,
+        table: str,
+        df: _FrameLike,
+        partition_by: Optional[List[str]] = None,
+    ) -> "DuckBatch":
+        """Record an append; see DuckPQ.append."""
+        ops = self._table_ops(table)
+        if ops["appends"] and ops["append_partition_by"] != partition_by:
+            raise ValueError(
+                f"Appends into {table} within one batch must use the same partition_by."
+            )
+        ops["appends"].append(df)
+        ops["append_partition_by"] = partition_by
+        return self
+
+    def rollback(self) -> None:
+        """Discard all recorded operations."""
+        self._ops.clear()
+
+    def commit(self) -> None:
+        """Stage all recorded operations, then move them into place together.
+
+        Staging is all-or-nothing, but the commit phase is not atomic across
+        tables: each staged write is moved into place in turn, so if one of
+        them fails, tables committed before it keep their new data while the
+        staged writes not yet committed are discarded.
+
+        Raises:
+            Exception: The first staging error, in which case nothing has been
+                written to any table, or the first commit error.
+        """
+        if not self._ops:
+            return
+        tables = {name: self.db._get_or_create_table(name) for name in sorted(self._ops)}
+        with ExitStack() as stack:
+            try:
+                for name in sorted(tables):
+                    stack.enter_context(tables[name]._write_lock)
+                    stack.enter_context(tables[name]._file_locks(None))
+                    stack.enter_context(tables[name]._write_report("batch"))
+                staged = self._stage_all(tables)
+                pending = [(name, item) for name in sorted(staged) for item in staged[name]]
+                try:
+                    while pending:
+                        name, item = pending.pop(0)
+                        tables[name]._commit_staged(item)
+                except BaseException:
+                    for _, item in pending:
+                        DuckTable._discard_staged(item)
+                    raise
+            finally:
+                for dp in tables.values():
+                    dp.refresh()
+                self._ops.clear()
+
+    def _stage_all(self, tables: Dict[str, DuckTable]) -> Dict[str, List[Dict[str, Any]]]:
+        """Stage every table concurrently; discard everything on failure."""
+
+        def _stage_table(name: str) -> List[Dict[str, Any]]:
+            with tables[name]._operation_cursor():
+                return _stage_ops(name)
+
+        def _stage_ops(name: str) -> List[Dict[str, Any]]:
+            dp, ops = tables[name], self._ops[name]
+            items: List[Dict[str, Any]] = []
+            try:
+                with ExitStack() as stack:
+                    columns = None
+                    if ops["upserts"]:
+                        data = self._combined(dp, stack, ops["upserts"], name, ops["keys"])
+                        columns = dp._source_columns(data)
+                        items.append(
+                            dp._stage_upsert(data, ops["keys"], ops["upsert_partition_by"])
+                        )
+                    if ops["appends"]:
+                        data = self._combined(dp, stack, ops["appends"], name)
+                        if items and items[0]["kind"] == "create":
+                            # The table only exists once the upsert is committed,
+                            # so align the appended columns with it here.
+                            if set(dp._source_columns(data)) != set(columns):
+                                raise ValueError(
+                                    f"Appended columns do not match upserted columns in {name}."
+                                )
+                            cols = ", ".join(DuckTable._quote_ident(c) for c in columns)
+                            with dp._source(data) as src:
+                                data = stack.enter_context(
+                                    dp._temp_table(f"SELECT {cols} FROM {src}")
+                                )
+                        items.append(dp._stage_append(data, ops["append_partition_by"]))
+            except Exception:
+                for item in items:
+                    DuckTable._discard_staged(item)
+                raise
+            return items
+
+        staged: Dict[str, List[Dict[str, Any]]] = {}
+        errors: List[Exception] = []
+        workers = min(int(self.max_workers), max(1, len(tables)))
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            futs = {ex.submit(_stage_table, name): name for name in tables}
+            for fut in as_completed(futs):
+                try:
+                    staged[futs[fut]] = fut.result()
+                except Exception as e:
+                    errors.append(e)
+        if errors:
+            for items in staged.values():
+                for item in items:
+                    DuckTable._discard_staged(item)
+            raise errors[0]
+        return staged
+
+    @staticmethod
+    def _combined(
+        dp: DuckTable,
+        stack: ExitStack,
+        frames: List[_FrameLike],
+        name: str,
+        keys: Optional[List[str]] = None,
+    ) -> Union[_FrameLike, str]:
+        """Incoming rows of the recorded writes of one table, kept in DuckDB.
+
+        A single frame is passed through as is. Several frames are combined
+        with UNION ALL BY NAME into a temp table; with `keys`, the row of the
+        latest frame wins per key. Relations stay registered until `stack`
+        is closed.
+
+        Raises:
+            ValueError: If a single frame contains duplicate keys.
+        """
+        datas = [stack.enter_context(dp._incoming(f)) for f in frames]
+        if keys:
+            # Like upsert(), each frame must have unique keys.
+            for data in datas:
+                if dp._has_duplicate_keys(data, keys):
+                    raise ValueError(f"Incoming rows for {name} contain duplicate keys.")
+        if len(datas) == 1:
+            return datas[0]
+        order = DuckBatch._ORDER
+        srcs = [stack.enter_context(dp._source(data)) for data in datas]
+        sql = " UNION ALL BY NAME ".join(
+            f"SELECT *, {i} AS {order} FROM {src}" for i, src in enumerate(srcs)
+        )
+        sql = f"SELECT * EXCLUDE ({order}) FROM ({sql})"
+        if keys:
+            key_expr = ", ".join(DuckTable._quote_ident(k) for k in keys)
+            sql += f" QUALIFY row_number() OVER (PARTITION BY {key_expr} ORDER BY {order} DESC) = 1"
+        return stack.enter_context(dp._temp_table(sql))
+
+    def __enter__(self) -> "DuckBatch":
+        """Enter context manager."""
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        """Commit on success, discard recorded operations on error."""
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
+
+
+class DuckWriter:
+    """Write buffer for high-frequency small batches, created by DuckTable.writer().
+
+    Batches are accumulated in an in-memory DuckDB table on a private
+    connection and written to the table in one merge per flush. With keys,
+    the last row per key wins within the buffer and the flush goes through
+    upsert(); without keys, rows are flushed through append(). A flush
+    happens when `flush_rows` rows are buffered, every `flush_interval`
+    seconds in a background thread, on flush(), and on close().
+
+    If a flush fails, the rows stay buffered and are retried by the next
+    flush; errors of background flushes are kept in `error` and raised by
+    the next write().
+
+    Attributes:
+        table (DuckTable): The table written to.
+        keys (Optional[List[str]]): Primary key columns; None to append.
+        partition_by (Optional[List[str]]): Partition columns.
+        flush_rows (Optional[int]): Row threshold triggering a flush.
+        flush_interval (Optional[float]): Seconds between background flushes.
+        rows_written (int): Rows flushed to the table so far.
+        flushes (int): Number of flushes so far.
+        error (Optional[BaseException]): Error of the last failed background
+            flush.
+    """
+
+    _BUFFER = "__parquool_buffer"
+    _SEQ = "__parquool_seq"
+
+    def __init__(
+        self,
+        table: DuckTable,
+        keys: Optional[List[str]] = None,
+        partition_by: Optional[List[str]] = None,
+        flush_rows: Optional[int] = 100_000,
+        flush_interval: Optional[float] = 5.0,
+    ):
+        """Initialize the buffer; see DuckTable.writer()."""
+        self.table = table
+        self.keys = list(keys) if keys else None
+        self.partition_by = partition_by
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.rows_written = 0
+        self.flushes = 0
+        self.error: Optional[BaseException] = None
+        self._con = duckdb.connect()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._rows = 0
+        self._seq = 0  # last sequence number; orders rows for "last wins"
+        self._created = False
+        self._closed = False
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        if flush_interval:
+            self._thread = threading.Thread(
+                target=self._loop, name="parquool-writer", daemon=True
+            )
+            self._thread.start()
+
+    def _loop(self) -> None:
+        """Flush every `flush_interval` seconds until the writer is closed."""
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                # Raised to the next write(); the rows stay buffered.
+                self.error = e
+
+    def _raise_error(self) -> None:
+        """Raise (and clear) the error of a failed background flush."""
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+    @property
+    def buffered_rows(self) -> int:
+        """Number of rows waiting to be flushed (before deduplication)."""
+        return self._rows
+
+    def write(self, df: _FrameLike) -> "DuckWriter":
+        """Buffer rows; flushes once `flush_rows` rows are buffered.
+
+        Args:
+            df: Rows in any form accepted by DuckTable.upsert(). Columns are
+                matched by name; later batches may omit columns.
+
+        Returns:
+            DuckWriter: self, for chaining.
+        """
+        if self._closed:
+            raise RuntimeError("Writer is closed.")
+        self._raise_error()
+        if type(df).__name__ == "LazyFrame":
+            df = df.collect()
+        stream = DuckTable._as_stream(df)
+        data = df if stream is None else stream
+        reg_name = f"incoming_{uuid.uuid4().hex[:8]}"
+        buf, seq = DuckWriter._BUFFER, DuckWriter._SEQ
+        with self._lock:
+            self._con.register(reg_name, data)
+            try:
+                select_sql = (
+                    f"SELECT *, {self._seq} + ROW_NUMBER() OVER () AS {seq} FROM {reg_name}"
+                )
+                if not self._created:
+                    sql = f"CREATE TABLE {buf} AS {select_sql}"
+                else:
+                    sql = f"INSERT INTO {buf} BY NAME {select_sql}"
+                n = self._con.execute(sql).fetchone()[0]
+                self._created = True
+            finally:
+                self._con.unregister(reg_name)
+            self._seq += n
+            self._rows += n
+            full = self.flush_rows is not None and self._rows >= self.flush_rows
+        if full:
+            self.flush()
+        return self
+
+    def flush(self) -> int:
+        """Write buffered rows to the table.
+
+        Returns:
+            int: Number of rows written (after deduplication).
+        """
+        with self._flush_lock:
+            buf, seq = DuckWriter._BUFFER, DuckWriter._SEQ
+            with self._lock:
+                # This flush retries whatever a failed background flush kept.
+                self.error = None
+                if self._rows == 0:
+                    return 0
+                sql = f"SELECT * FROM {buf}"
+                if self.keys:
+                    key_expr = ", ".join(DuckTable._quote_ident(k) for k in self.keys)
+                    sql += f" QUALIFY ROW_NUMBER() OVER (PARTITION BY {key_expr} ORDER BY {seq} DESC) = 1"
+                result = self._con.execute(sql + f" ORDER BY {seq}")
+                try:
+                    data = result.arrow()
+                    if hasattr(data, "read_all"):  # RecordBatchReader on newer duckdb
+                        data = data.read_all()
+                    out = data.drop_columns([seq])
+                except ImportError:  # no pyarrow
+                    data = result.df()
+                    out = data.drop(columns=[seq])
+                self._con.execute(f"DELETE FROM {buf}")
+                rows, self._rows = self._rows, 0
+            try:
+                if self.keys:
+                    self.table.upsert(out, keys=self.keys, partition_by=self.partition_by)
+                else:
+                    self.table.append(out, partition_by=self.partition_by)
+            except BaseException as e:
+                # Put the rows back in front of anything buffered meanwhile.
+                with self._lock:
+                    self._con.register("__parquool_restore", data)
+                    try:
+                        self._con.execute(
+                            f"INSERT INTO {buf} BY NAME SELECT * FROM __parquool_restore"
+                        )
+                    finally:
+                        self._con.unregister("__parquool_restore")
+                    self._rows += rows
+                raise
+            self.rows_written += len(out)
+            self.flushes += 1
+            return len(out)
+
+    def close(self) -> None:
+        """Stop the background flush thread, flush remaining rows and close.
+
+        The buffer is only closed once the final flush succeeded. If it
+        fails, the error is raised and the writer stays open with its rows
+        buffered (without background flushes), so flush() or close() can be
+        retried.
+        """
+        if self._closed:
+            return
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+        self._closed = True
+        self._con.close()
+
+    def __enter__(self) -> "DuckWriter":
+        """Enter context manager."""
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        """Flush buffered rows and stop the writer."""
+        self.close()
+
+
+class AsyncDuckPQ:
+    """Asyncio front-end for DuckPQ.
+
+    Every call runs on a managed thread pool with a private DuckDB cursor, so
+    the event loop is never blocked and concurrent tasks never share a
+    connection. Cancelling a read interrupts its running query. Writes are
+    atomic and keep running in the background when their caller is
+    cancelled.
+
+    Relations registered with DuckPQ.attach() live on the DuckPQ connection
+    only and are not visible from tasks; use table directories or regular
+    views instead.
+
+    Examples:
+        >>> async with AsyncDuckPQ("database") as adb:
+        ...     df = await adb.select("quotes_min", where="trade_date = ?", params=[d])
+        ...     await adb.upsert("quotes_min", df_new, keys=["symbol", "ts"])
+        ...     async for chunk in adb.iter_query("SELECT * FROM quotes_min"):
+        ...         handle(chunk)
+
+    Attributes:
+        db (DuckPQ): The wrapped database.
+        max_workers (int): Number of threads running DuckDB work.
+    """
+
+    def __init__(
+        self,
+        db: Union[DuckPQ, str, Path],
+        max_workers: int = 4,
+        **kwargs: Any,
+    ):
+        """Initialize the wrapper.
+
+        Args:
+            db: A DuckPQ instance to wrap (not closed by close()), or a root
+                path to open a new DuckPQ on.
+            max_workers: Number of threads running DuckDB work.
+            **kwargs: Passed to DuckPQ when db is a path.
+        """
+        if isinstance(db, DuckPQ):
+            self.db = db
+            self._own_db = False
+        else:
+            self.db = DuckPQ(db, **kwargs)
+            self._own_db = True
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="parquool-async"
+        )
+
+    async def _submit(
+        self,
+        ctx: _TaskContext,
+        func: Callable[..., Any],
+        *args: Any,
+        interrupt: bool = True,
+        close: bool = True,
+        **kwargs: Any,
+    ) -> Any:
+        """Run func on the pool with ctx bound; close ctx afterwards if close."""
+
+        def _call():
+            try:
+                with ctx.bind():
+                    return func(*args, **kwargs)
+            finally:
+                if close:
+                    ctx.close()
+
+        cf = self._executor.submit(_call)
+        fut = asyncio.wrap_future(cf)
+        fut.add_done_callback(lambda f: f.cancelled() or f.exception())
+        try:
+            return await asyncio.shield(fut)
+        except asyncio.CancelledError:
+            if cf.cancel():
+                ctx.close()
+            elif interrupt:
+                ctx.cancel()
+                await asyncio.wait([fut])
+            raise
+
+    async def run(
+        self, func: Callable[..., Any], *args: Any, interrupt: bool = True, **kwargs: Any
+    ) -> Any:
+        """Run any DuckPQ/DuckTable call on the pool with its own cursor.
+
+        Examples:
+            >>> stats = await adb.run(adb.db.stats, "quotes_min")
+
+        Args:
+            func: Callable to run, typically a bound DuckPQ or DuckTable method.
+            *args: Positional arguments of func.
+            interrupt: If True, cancellation interrupts the running query;
+                otherwise func runs to completion in the background.
+            **kwargs: Keyword arguments of func.
+
+        Returns:
+            Any: The result of func.
+        """
+        ctx = _TaskContext(self.db.con)
+        return await self._submit(ctx, func, *args, interrupt=interrupt, **kwargs)
+
+    async def query(self, sql: str, params: Optional[Sequence[Any]] = None) -> pd.DataFrame:
+        """Execute a SQL query and return results as a DataFrame; see DuckPQ.query."""
+        return await self.run(self.db.query, sql, params=params)
+
+    async def execute(self, sql: str, params: Optional[Sequence[Any]] = None) -> None:
+        """Execute a SQL statement, discarding its result; see DuckPQ.execute."""
+        await self.run(self.db.execute, sql, params=params)
+
+    async def select(
+        self,
+        table: str,
+        columns: Union[str, List[str]] = "*",
+        where: Optional[str] = None,
+        params: Optional[Sequence[Any]] = None,
+        group_by: Optional[Union[str, List[str]]] = None,
+        having: Optional[str] = None,
+        order_by: Optional[Union[str, List[str]]] = None,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+        distinct: bool = False,
+    ) -> pd.DataFrame:
+        """Select from a Parquet-backed table; see DuckPQ.select."""
+        return await self.run(
+            self.db.select,
+            table,
+            columns=columns,
+            where=where,
+            params=params,
+            group_by=group_by,
+            having=having,
+            order_by=order_by,
+            limit=limit,
+            offset=offset,
+            distinct=distinct,
+        )
+
+    async def upsert(
+        self,
+        table: str,
+        df: _FrameLike,
+        keys: List[str],
+        partition_by: Optional[List[str]] = None,
+    ) -> None:
+        """Upsert rows into a table; see DuckPQ.upsert."""
+        await self.run(
+            self.db.upsert, table, df, keys=keys, partition_by=partition_by, interrupt=False
+        )
+
+    async def append(
+        self,
+        table: str,
+        df: _FrameLike,
+        partition_by: Optional[List[str]] = None,
+    ) -> None:
+        """Append rows to a table; see DuckPQ.append."""
+        await self.run(self.db.append, table, df, partition_by=partition_by, interrupt=False)
+
+    async def iter_query(
+        self,
+        sql: str,
+        params: Optional[Sequence[Any]] = None,
+        batch_size: int = 100_000,
+    ) -> AsyncIterator[pd.DataFrame]:
+        """Stream the result of a SQL query as DataFrame chunks.
+
+        The query keeps one cursor for its whole lifetime; each chunk is
+        fetched on the pool. Leaving the loop early releases the cursor, and
+        cancellation interrupts the query.
+
+        Args:
+            sql: SQL query to execute.
+            params: Optional sequence of bind parameters.
+            batch_size: Approximate number of rows per chunk.
+
+        Yields:
+            pd.DataFrame: Consecutive chunks of the result.
+        """
+        ctx = _TaskContext(self.db.con)
+        vectors = max(1, int(batch_size) // 2048)
+        try:
+            result = await self._submit(ctx, self.db.execute, sql, params, close=False)
+            while True:
+                chunk = await self._submit(ctx, result.fetch_df_chunk, vectors, close=False)
+                if chunk.empty:
+                    break
+                yield chunk
+        finally:
+            ctx.close()
+
+    async def iter_select(
+        self,
+        table: str,
+        columns: Union[str, List[str]] = "*",
+        where: Optional[str] = None,
+        params: Optional[Sequence[Any]] = None,
+        order_by: Optional[Union[str, List[str]]] = None,
+        batch_size: int = 100_000,
+    ) -> AsyncIterator[pd.DataFrame]:
+        """Stream rows of a table as DataFrame chunks; see iter_query.
+
+        Args:
+            table: Table name to query.
+            columns: Column list or "*" for all columns.
+            where: Optional WHERE clause string.
+            params: Optional sequence of bind parameters for WHERE.
+            order_by: Optional ORDER BY columns or expression.
+            batch_size: Approximate number of rows per chunk.
+
+        Yields:
+            pd.DataFrame: Consecutive chunks of the result.
+        """
+        ctx = _TaskContext(self.db.con)
+        try:
+            ident = await self._submit(ctx, self.db._relation_ident, table, close=False)
+        finally:
+            ctx.close()
+        col_sql = columns if isinstance(columns, str) else ", ".join(columns)
+        sql = f"SELECT {col_sql} FROM {ident}"
+        if where:
+            sql += f" WHERE {where}"
+        if order_by:
+            sql += " ORDER BY " + (order_by if isinstance(order_by, str) else ", ".join(order_by))
+        async for chunk in self.iter_query(sql, params=params, batch_size=batch_size):
+            yield chunk
+
+    async def close(self) -> None:
+        """Wait for running tasks, shut down the pool and close an owned DuckPQ."""
+        await asyncio.get_running_loop().run_in_executor(None, self._executor.shutdown)
+        if self._own_db:
+            self.db.close()
+
+    async def __aenter__(self) -> "AsyncDuckPQ":
+        """Enter async context manager."""
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        """Exit async context manager and close the database."""
+        await self.close()
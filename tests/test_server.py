@@ -0,0 +1,36 @@
+import threading
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("pyarrow.flight")
+
+from parquool.storage import DuckPQ
+from parquool.server import DuckPQClient, DuckPQServer
+
+
+@pytest.fixture
+def served(tmp_path):
+    root = tmp_path / "db"
+    db = DuckPQ(root)
+    db.upsert("t", pd.DataFrame({"k": [1, 2], "v": [1.0, 2.0]}), keys=["k"])
+    server = DuckPQServer(db, port=0, log_level="WARNING")
+    thread = threading.Thread(target=server.serve, daemon=True)
+    thread.start()
+    try:
+        with DuckPQClient(f"grpc://127.0.0.1:{server.port}") as client:
+            yield tmp_path, client
+    finally:
+        server.shutdown()
+        db.close()
+
+
+def test_select_unknown_table_is_rejected(served):
+    tmp_path, client = served
+    before = sorted(p.relative_to(tmp_path) for p in tmp_path.rglob("*"))
+    for name in ["nope", "../escape", "t/../../escape", ".parquool_locks"]:
+        with pytest.raises(Exception, match="Unknown table"):
+            client.select(name)
+    after = sorted(p.relative_to(tmp_path) for p in tmp_path.rglob("*"))
+    assert after == before
+    assert client.select("t", order_by="k")["k"].tolist() == [1, 2]
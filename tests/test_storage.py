@@ -0,0 +1,58 @@
+import os
+import stat
+
+import pandas as pd
+import pytest
+
+from parquool.storage import DuckPQ, _FileLock
+
+
+def _set_read_only(root, read_only):
+    """Remove (or restore) write permission on root and everything below it."""
+    paths = [root] + [os.path.join(d, n) for d, ds, fs in os.walk(root) for n in ds + fs]
+    for path in paths:
+        mode = os.stat(path).st_mode
+        if read_only:
+            mode &= ~(stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH)
+        else:
+            mode |= stat.S_IWUSR
+        os.chmod(path, mode)
+
+
+def test_open_read_only_root(tmp_path, monkeypatch):
+    root = tmp_path / "db"
+    df = pd.DataFrame({"k": [1, 2], "p": [1, 2]})
+    with DuckPQ(root) as db:
+        db.upsert("t", df, keys=["k"], partition_by=["p"])
+    (root / ".parquool_locks").rename(tmp_path / "locks")
+
+    if os.geteuid() == 0:
+        # root ignores permission bits; fail lock creation like they would.
+        def acquire(self):
+            raise PermissionError(13, "Permission denied", str(self.path))
+
+        monkeypatch.setattr(_FileLock, "acquire", acquire)
+
+    _set_read_only(root, True)
+    try:
+        with DuckPQ(root) as db:
+            out = db.select("t", order_by="k")
+        assert out["k"].tolist() == [1, 2]
+        assert not (root / ".parquool_locks").exists()
+    finally:
+        _set_read_only(root, False)
+
+
+def test_batch_arrow_inputs(tmp_path):
+    pa = pytest.importorskip("pyarrow")
+    db = DuckPQ(str(tmp_path))
+    with db.batch() as b:
+        b.upsert("t", pa.table({"k": [1, 2], "v": ["a", "b"]}), keys=["k"])
+        b.upsert("t", pd.DataFrame({"v": ["B", "c"], "k": [2, 3]}), keys=["k"])
+        b.append("t", pa.table({"v": ["x"], "k": [9]}))
+    out = db.select("t").sort_values("k")
+    assert out[["k", "v"]].values.tolist() == [[1, "a"], [2, "B"], [3, "c"], [9, "x"]]
+
+    with pytest.raises(ValueError, match="duplicate keys"):
+        with db.batch() as b:
+            b.upsert("t", pa.table({"k": [5, 5], "v": ["a", "b"]}), keys=["k"])